@@ -1,5 +1,7 @@
 __version__ = (3, 0, 1)
 
+default_app_config = 'bookmarks.apps.BookmarksConfig'
+
 
 def get_version():
     return '.'.join(map(str, __version__))
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class BookmarksConfig(AppConfig):
+    name = 'bookmarks'
+
+    def ready(self):
+        from bookmarks import receivers  # noqa
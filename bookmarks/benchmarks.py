@@ -0,0 +1,276 @@
+import datetime
+import json
+import random
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.conf.urls import url
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.sites.models import Site
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from bookmarks import cache, get_version, views
+from bookmarks.bulk import add_bookmarks
+from bookmarks.models import Bookmark, BookmarkInstance
+from bookmarks.templatetags.bookmark_tags import show_bookmarks_tags
+
+"""
+Seed realistic volumes of bookmarks and measure the main code paths.
+
+`generate_data` is used by the `generate_bookmarks` command and
+`run_benchmarks` by the `benchmark_bookmarks` command, which writes the
+results as JSON so they can be compared between releases.
+"""
+
+BATCH_SIZE = 500
+# Bookmarks per request of the `add_batch` benchmark.
+ADD_BATCH_SIZE = 50
+
+# The views reverse each other, so serve them from a URLconf that doesn't
+# depend on the project's.
+urlpatterns = [
+    url(r'^$', views.bookmarks),
+    url(r'^your_bookmarks/$', views.your_bookmarks),
+    url(r'^add/$', views.add),
+    url(r'^add/quick/$', views.add_quick),
+    url(r'^(\d+)/delete/$', views.delete),
+]
+
+# The cache is cleared before every timed call, so the benchmarks get their
+# own rather than the project's.
+BENCHMARK_CACHE = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'bookmarks-benchmark',
+}
+
+# Minimal templates so the views can be timed without a project's templates.
+BENCHMARK_TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': [('django.template.loaders.locmem.Loader', {
+            'bookmarks/bookmarks.html': (
+                '{% for bookmark in bookmarks %}{{ bookmark.url }}'
+                '{% for tag, count in bookmark.tags_with_counts %}{{ tag }}{% endfor %}'
+                '{% endfor %}'
+            ),
+            'bookmarks/your_bookmarks.html': (
+                '{% for instance in bookmark_instances %}{{ instance.bookmark.url }}'
+                '{% for tag, count in instance.bookmark.tags_with_counts %}{{ tag }}{% endfor %}'
+                '{% endfor %}'
+            ),
+            'bookmarks/add.html': '{{ bookmark_form }}',
+            'bookmarks/tags.html': '{% for tag in bookmark_tags %}{{ tag }}{% endfor %}',
+        })],
+    },
+}]
+
+
+def generate_data(instances, user_count=None, url_count=None, tag_count=200,
+                  site_count=1, seed=0, prefix='bench', progress=None):
+    """
+    Create `instances` bookmark instances spread over `user_count` users and
+    `url_count` distinct URLs on the current site.
+
+    URL popularity is skewed so some bookmarks are saved by many users. With
+    `site_count` > 1, a tenth of the bookmarks are also put on extra sites.
+    Returns the created users.
+    """
+    rng = random.Random(seed)
+    user_count = user_count or max(10, instances // 100)
+    url_count = url_count or max(1, instances // 2)
+    tag_names = ['{}-tag-{}'.format(prefix, i) for i in range(tag_count)]
+    now = timezone.now()
+
+    User = get_user_model()
+    usernames = ['{}-user-{}'.format(prefix, i) for i in range(user_count)]
+    User.objects.bulk_create(User(username=username) for username in usernames)
+    user_list = list(User.objects.filter(username__in=usernames).order_by('pk'))
+
+    per_user, remainder = divmod(instances, user_count)
+    created = 0
+    for index, user in enumerate(user_list):
+        count = min(per_user + (1 if index < remainder else 0), url_count)
+        # Squaring the random number favours the low URL numbers.
+        urls = set()
+        while len(urls) < count:
+            urls.add(int(url_count * rng.random() ** 2))
+        entries = [{
+            'url': 'http://{}.example.com/{}'.format(prefix, url),
+            'description': '{} bookmark {}'.format(prefix, url),
+            'tags': rng.sample(tag_names, rng.randint(0, min(3, len(tag_names)))),
+            'saved': now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+        } for url in sorted(urls)]
+        for start in range(0, len(entries), BATCH_SIZE):
+            add_bookmarks(user, entries[start:start + BATCH_SIZE])
+        created += len(entries)
+        if progress is not None:
+            progress(created)
+
+    extra_sites = [
+        Site.objects.get_or_create(domain='{}-{}.example.com'.format(prefix, i), defaults={
+            'name': '{} {}'.format(prefix, i),
+        })[0]
+        for i in range(1, site_count)
+    ]
+    if extra_sites:
+        urls = ['http://{}.example.com/{}'.format(prefix, i) for i in range(0, url_count, 10)]
+        for bookmark in Bookmark.on_site.filter(url__in=urls):
+            bookmark.sites.add(*rng.sample(extra_sites, rng.randint(1, len(extra_sites))))
+
+    return user_list
+
+
+def benchmark_caches():
+    caches = dict(settings.CACHES)
+    caches[cache.CACHE_ALIAS] = BENCHMARK_CACHE
+    return caches
+
+
+def measure(function, repeat):
+    """
+    Call `function` `repeat` times with an empty cache and return timings in
+    milliseconds and the number of queries of the last call.
+    """
+    timings = []
+    with override_settings(CACHES=benchmark_caches()):
+        for _ in range(repeat):
+            cache.get_cache().clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.time()
+                function()
+                timings.append((time.time() - start) * 1000)
+    timings.sort()
+    return {
+        'median_ms': round(timings[len(timings) // 2], 3),
+        'min_ms': round(timings[0], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries': len(queries),
+    }
+
+
+def build_request(user, method='get', path='/', data=None):
+    request = getattr(RequestFactory(), method)(path, data or {})
+    request.user = user
+    request.session = {}
+    request._messages = CookieStorage(request)
+    return request
+
+
+def build_batch_request(user, urls):
+    body = json.dumps([{'url': url, 'tags': 'bench-tag-0 bench-new'} for url in urls])
+    request = RequestFactory().post('/', body, content_type='application/json')
+    request.user = user
+    return request
+
+
+def benchmark_index(repeat):
+    # The index reads each site's `ghtsite` slug.
+    if not apps.is_installed('ghtsite'):
+        return None
+    try:
+        from bookmarks.search_indexes import BookmarkIndex
+    except (ImportError, ImproperlyConfigured):
+        # Haystack missing, or installed without HAYSTACK_CONNECTIONS.
+        return None
+
+    def reindex():
+        # What update_index does per object besides rendering the document.
+        index = BookmarkIndex()
+        queryset = index.index_queryset().order_by('pk')
+        total = queryset.count()
+        for start in range(0, total, BATCH_SIZE):
+            for bookmark in queryset[start:start + BATCH_SIZE]:
+                bookmark.site_slugs()
+                u'{}'.format(bookmark.adder)
+
+    return measure(reindex, repeat)
+
+
+def benchmark_size(size, repeat=5, seed=0):
+    """Generate `size` instances, time every target and roll everything back."""
+    results = {}
+    with transaction.atomic():
+        User = get_user_model()
+        users = generate_data(size, seed=seed, site_count=3)
+        user = users[0]
+        bookmark = Bookmark.on_site.filter(saved_instances__user=user)[0]
+        new_urls = iter('http://bench-new.example.com/{}'.format(i) for i in range(repeat))
+
+        with override_settings(TEMPLATES=BENCHMARK_TEMPLATES, ROOT_URLCONF='bookmarks.benchmarks'):
+            results['bookmarks'] = measure(
+                lambda: views.bookmarks(build_request(user)), repeat)
+            results['bookmarks_popular'] = measure(
+                lambda: views.bookmarks(build_request(user, data={'order': 'popular'})), repeat)
+            results['your_bookmarks'] = measure(
+                lambda: views.your_bookmarks(build_request(user)), repeat)
+            results['add'] = measure(
+                lambda: views.add(build_request(user, 'post', data={
+                    'url': next(new_urls),
+                    'description': 'Benchmark',
+                    'tags': 'bench-tag-0 bench-new',
+                })),
+                repeat,
+            )
+            quick_urls = iter('http://bench-quick.example.com/{}'.format(i) for i in range(repeat))
+            token = views.bookmarklet_token(user)
+            results['add_quick'] = measure(
+                lambda: views.add_quick(build_request(user, 'post', data={
+                    'token': token,
+                    'url': next(quick_urls),
+                    'description': 'Benchmark',
+                    'tags': 'bench-tag-0 bench-new',
+                })),
+                repeat,
+            )
+            batch_urls = iter(
+                ['http://bench-batch.example.com/{}/{}'.format(i, j) for j in range(ADD_BATCH_SIZE)]
+                for i in range(repeat)
+            )
+            results['add_batch'] = measure(
+                lambda: views.add_batch(build_batch_request(user, next(batch_urls))),
+                repeat,
+            )
+
+            # Every call deletes one of these, so each one does the same work.
+            instances = iter([
+                BookmarkInstance.objects.create(
+                    bookmark=bookmark,
+                    user=User.objects.create(username='bench-delete-{}'.format(i)),
+                    description='Benchmark',
+                )
+                for i in range(repeat)
+            ])
+
+            def delete():
+                instance = next(instances)
+                views.delete(build_request(instance.user), instance.pk)
+
+            results['delete'] = measure(delete, repeat)
+            results['show_bookmarks_tags'] = measure(lambda: show_bookmarks_tags(20), repeat)
+
+        index = benchmark_index(repeat)
+        if index is not None:
+            results['index'] = index
+
+        transaction.set_rollback(True)
+    return results
+
+
+def run_benchmarks(sizes, repeat=5, seed=0, progress=None):
+    results = {
+        'version': get_version(),
+        'date': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'sizes': {},
+    }
+    for size in sizes:
+        results['sizes'][str(size)] = benchmark_size(size, repeat=repeat, seed=seed)
+        if progress is not None:
+            progress(size)
+    return results
@@ -0,0 +1,363 @@
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from tagging import settings as tagging_settings
+from tagging.models import Tag, TaggedItem
+from tagging.utils import parse_tag_input
+
+from bookmarks import cache, search
+from bookmarks.models import (
+    Bookmark, BookmarkInstance, SaveBucket, SearchQueueEntry, SiteBookmark,
+    SiteBookmarkInstance, SiteBookmarkTag, SiteTagCount,
+)
+from bookmarks.utils import canonicalize_url, hash_url, truncate_hour
+
+"""
+Add many bookmarks for a user with a fixed number of queries.
+
+Entries are dicts with a `url` and optionally `description`, `note`, `tags`
+and `saved`. The bulk path bypasses model `save()` and signals, so it keeps
+the denormalised data (`SiteBookmark`, `SiteBookmarkInstance`,
+`SiteTagCount`, `SiteBookmarkTag`, `SaveBucket`, `Bookmark.save_count`), the
+tagging tables, the search terms and the search queue up to date itself.
+"""
+
+ADDED = 'added'
+EXISTS = 'exists'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+
+# The limits the ModelForm enforces on the same fields.
+URL_MAX_LENGTH = Bookmark._meta.get_field('url').max_length
+TAGS_MAX_LENGTH = BookmarkInstance._meta.get_field('tags').max_length
+
+# Saving is retried when a concurrent request inserts the same bookmarks.
+SAVE_ATTEMPTS = 3
+
+QUEUED_SIGNAL_PROCESSOR = 'bookmarks.signal_processors.QueuedSignalProcessor'
+
+
+def tag_names(tags):
+    if isinstance(tags, (list, tuple)):
+        tags = ','.join(tags)
+    names = parse_tag_input(tags)
+    if tagging_settings.FORCE_LOWERCASE_TAGS:
+        names = sorted(set(name.lower() for name in names))
+    return names
+
+
+def tag_string(names):
+    """Render tag names the way `tagging.utils.edit_string_for_tags` does."""
+    names = ['"%s"' % name if ',' in name else name for name in names]
+    glue = ', ' if any(' ' in name for name in names) else ' '
+    return glue.join(names)
+
+
+def valid_tags(names):
+    if any(len(name) > tagging_settings.MAX_TAG_LENGTH for name in names):
+        return False
+    return len(tag_string(names)) <= TAGS_MAX_LENGTH
+
+
+def get_or_create_tags(names):
+    """Return a `{name: tag_id}` mapping, creating the missing tags."""
+    tags = dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = set(names) - set(tags)
+    if missing:
+        Tag.objects.bulk_create(Tag(name=name) for name in missing)
+        created = Tag.objects.filter(name__in=missing).values_list('name', 'pk')
+        tags.update(created)
+    return tags
+
+
+def search_queue_enabled():
+    """Whether bookmark changes are queued for the search backend."""
+    return getattr(settings, 'HAYSTACK_SIGNAL_PROCESSOR', None) == QUEUED_SIGNAL_PROCESSOR
+
+
+def site_ids_by_bookmark(bookmark_ids):
+    sites = {}
+    site_pairs = Bookmark.sites.through.objects.filter(bookmark_id__in=bookmark_ids)
+    for bookmark_id, site_id in site_pairs.values_list('bookmark_id', 'site_id'):
+        sites.setdefault(bookmark_id, []).append(site_id)
+    return sites
+
+
+def create_bookmarks(user, site, entries):
+    """
+    Create a bookmark on `site` for each `{url_hash: entry}` and return a
+    `{url_hash: bookmark_id}` mapping. The bookmarks are counted as saved
+    once, by the instance `create_instances` then creates.
+    """
+    now = timezone.now()
+    Bookmark.objects.bulk_create(
+        Bookmark(
+            url=entry['url'],
+            canonical_url=entry['canonical_url'],
+            url_hash=url_hash,
+            description=entry['description'],
+            note=entry['note'],
+            has_favicon=False,
+            adder=user,
+            added=entry['saved'],
+            save_count=1,
+            instances_changed=now,
+        )
+        for url_hash, entry in entries.items()
+    )
+
+    # bulk_create does not return primary keys, so find the new rows again:
+    # they are the latest ones for each hash that are on no site yet.
+    created = Bookmark.objects.filter(
+        url_hash__in=entries.keys(),
+        adder=user,
+        sites=None,
+    )
+    bookmark_ids = dict(created.order_by('pk').values_list('url_hash', 'pk'))
+
+    Bookmark.sites.through.objects.bulk_create(
+        Bookmark.sites.through(site_id=site.pk, bookmark_id=bookmark_id)
+        for bookmark_id in bookmark_ids.values()
+    )
+    SiteBookmark.objects.bulk_create(
+        SiteBookmark(site_id=site.pk, bookmark_id=bookmark_id, url_hash=url_hash)
+        for url_hash, bookmark_id in bookmark_ids.items()
+    )
+    return bookmark_ids
+
+
+def create_instances(user, entries, created_sites=None):
+    """
+    Save each `{bookmark_id: entry}` for `user` and return a
+    `{bookmark_id: instance_id}` mapping. `created_sites` maps the bookmarks
+    created in the same transaction to their site ids, which spares looking
+    up their sites and save buckets.
+    """
+    created_sites = created_sites or {}
+    BookmarkInstance.objects.bulk_create(
+        BookmarkInstance(
+            bookmark_id=bookmark_id,
+            user=user,
+            saved=entry['saved'],
+            description=entry['description'],
+            note=entry['note'],
+            tags=tag_string(entry['tags']),
+        )
+        for bookmark_id, entry in entries.items()
+    )
+    created = BookmarkInstance.objects.filter(user=user, bookmark__in=entries.keys())
+    instance_ids = dict(created.values_list('bookmark_id', 'pk'))
+    existing_ids = [bookmark_id for bookmark_id in instance_ids if bookmark_id not in created_sites]
+    if existing_ids:
+        Bookmark.objects.filter(pk__in=existing_ids).update(
+            save_count=F('save_count') + 1,
+            instances_changed=timezone.now(),
+        )
+    for new in (True, False):
+        SaveBucket.objects.add_many(Counter(
+            (bookmark_id, truncate_hour(entries[bookmark_id]['saved']))
+            for bookmark_id in instance_ids
+            if (bookmark_id in created_sites) == new
+        ), new=new)
+
+    sites = dict(created_sites)
+    if existing_ids:
+        sites.update(site_ids_by_bookmark(existing_ids))
+    SiteBookmarkInstance.objects.bulk_create(
+        SiteBookmarkInstance(site_id=site_id, instance_id=instance_id)
+        for bookmark_id, instance_id in instance_ids.items()
+        for site_id in sites.get(bookmark_id, [])
+    )
+
+    tags = get_or_create_tags(set(
+        name for entry in entries.values() for name in entry['tags']
+    ))
+    content_type = ContentType.objects.get_for_model(BookmarkInstance) if tags else None
+    tagged_items = []
+    tag_counts = Counter()
+    index_counts = Counter()
+    for bookmark_id, instance_id in instance_ids.items():
+        for name in entries[bookmark_id]['tags']:
+            tagged_items.append(TaggedItem(
+                tag_id=tags[name],
+                content_type=content_type,
+                object_id=instance_id,
+            ))
+            for site_id in sites.get(bookmark_id, []):
+                tag_counts[site_id, tags[name]] += 1
+                index_counts[site_id, bookmark_id, tags[name]] += 1
+    TaggedItem.objects.bulk_create(tagged_items)
+    cache.bump_sites(site_id for site_ids in sites.values() for site_id in site_ids)
+    cache.bump_user(user.pk)
+    for (site_id, tag_id), count in tag_counts.items():
+        SiteTagCount.objects.adjust([site_id], [tag_id], count)
+    SiteBookmarkTag.objects.add_many(index_counts)
+
+    return instance_ids
+
+
+def index_saved(unsaved, created_ids):
+    """
+    Reindex the bookmarks created or tagged by saving the `{bookmark_id:
+    entry}` of `unsaved`. `created_ids` are the bookmarks created.
+    """
+    retagged = set(bookmark_id for bookmark_id, entry in unsaved.items() if entry['tags'])
+    new = set(created_ids) - retagged
+    if new:
+        search.index_bookmarks(new, new=True)
+    if retagged:
+        search.index_bookmarks(retagged)
+    if search_queue_enabled() and (new or retagged):
+        SearchQueueEntry.objects.enqueue(new | retagged, SearchQueueEntry.UPDATE)
+
+
+def site_bookmark_ids(site, url_hashes):
+    """Return a `{url_hash: bookmark_id}` mapping of the bookmarks on `site`."""
+    site_bookmarks = SiteBookmark.objects.filter(site=site, url_hash__in=url_hashes)
+    return dict(site_bookmarks.values_list('url_hash', 'bookmark_id'))
+
+
+def saved_bookmark_ids(user, bookmark_ids):
+    """Return the ids of `bookmark_ids` already saved by `user`."""
+    saved = BookmarkInstance.objects.filter(user=user, bookmark__in=bookmark_ids)
+    return set(saved.values_list('bookmark_id', flat=True))
+
+
+def save_pending(user, site, pending):
+    """Save each `{url_hash: entry}` and set the status of its result."""
+    bookmark_ids = site_bookmark_ids(site, pending.keys())
+    missing = OrderedDict(
+        (url_hash, entry)
+        for url_hash, entry in pending.items()
+        if url_hash not in bookmark_ids
+    )
+    created_ids = {}
+    if missing:
+        created_ids = create_bookmarks(user, site, missing)
+        bookmark_ids.update(created_ids)
+
+    # Bookmarks created just now can't have been saved.
+    existing_ids = set(bookmark_ids.values()) - set(created_ids.values())
+    saved = saved_bookmark_ids(user, existing_ids) if existing_ids else set()
+    unsaved = OrderedDict()
+    for url_hash, entry in pending.items():
+        bookmark_id = bookmark_ids[url_hash]
+        if bookmark_id in saved:
+            entry['result'].update(status=EXISTS, instance=None)
+        else:
+            unsaved[bookmark_id] = entry
+
+    if unsaved:
+        created_sites = dict((bookmark_id, [site.pk]) for bookmark_id in created_ids.values())
+        instance_ids = create_instances(user, unsaved, created_sites)
+        for bookmark_id, entry in unsaved.items():
+            entry['result'].update(status=ADDED, instance=instance_ids[bookmark_id])
+    index_saved(unsaved, created_ids.values())
+
+
+def save_one(user, site, url_hash, entry):
+    """`save_pending` for a single entry, with single row lookups."""
+    site_bookmarks = SiteBookmark.objects.filter(site=site, url_hash=url_hash)
+    bookmark_id = site_bookmarks.values_list('bookmark_id', flat=True).first()
+    if bookmark_id is None:
+        bookmark_id = create_bookmarks(user, site, {url_hash: entry})[url_hash]
+        created_sites = {bookmark_id: [site.pk]}
+    elif BookmarkInstance.objects.filter(user=user, bookmark_id=bookmark_id).exists():
+        entry['result'].update(status=EXISTS, instance=None)
+        return
+    else:
+        created_sites = {}
+
+    instance_ids = create_instances(user, {bookmark_id: entry}, created_sites)
+    entry['result'].update(status=ADDED, instance=instance_ids[bookmark_id])
+    index_saved({bookmark_id: entry}, created_sites.keys())
+
+
+def save_with_retries(save, *args):
+    """Call `save` in a transaction, again if it races a concurrent save."""
+    attempts = SAVE_ATTEMPTS
+    while True:
+        try:
+            with cache.atomic():
+                save(*args)
+            return
+        except IntegrityError:
+            # A concurrent request saved some of the URLs since the lookup,
+            # so look them up again.
+            attempts -= 1
+            if not attempts:
+                raise
+
+
+def clean_entries(entries):
+    """
+    Validate `entries` and return a result dict per entry and a
+    `{url_hash: entry}` mapping of the entries to save.
+    """
+    now = timezone.now()
+    validate_url = URLValidator()
+
+    results = []
+    pending = OrderedDict()
+    for entry in entries:
+        url = (entry.get('url') or '').strip()
+        result = {'url': url, 'status': INVALID, 'instance': None}
+        results.append(result)
+        try:
+            validate_url(url)
+        except ValidationError:
+            continue
+        canonical_url = canonicalize_url(url)
+        tags = tag_names(entry.get('tags'))
+        if len(url) > URL_MAX_LENGTH or not valid_tags(tags):
+            continue
+
+        url_hash = hash_url(canonical_url)
+        if url_hash in pending:
+            result['status'] = DUPLICATE
+            continue
+        pending[url_hash] = {
+            'url': url,
+            'canonical_url': canonical_url,
+            'description': (entry.get('description') or url).strip(),
+            'note': entry.get('note') or '',
+            'tags': tags,
+            'saved': entry.get('saved') or now,
+            'result': result,
+        }
+
+    return results, pending
+
+
+def add_bookmarks(user, entries):
+    """
+    Save `entries` as bookmarks of `user` on the current site in one
+    transaction.
+
+    Existing bookmarks are resolved with a single lookup by URL hash and the
+    missing bookmarks and instances are bulk inserted. Returns one result
+    dict per entry, in order, with the `url`, a `status` and the `instance`
+    id when the entry was saved.
+    """
+    results, pending = clean_entries(entries)
+    if pending:
+        save_with_retries(save_pending, user, Site.objects.get_current(), pending)
+    return results
+
+
+def add_bookmark(user, entry):
+    """
+    Save a single entry like `add_bookmarks` in fewer queries, and return
+    its result dict.
+    """
+    (result,), pending = clean_entries([entry])
+    for url_hash, cleaned in pending.items():
+        save_with_retries(save_one, user, Site.objects.get_current(), url_hash, cleaned)
+    return result
@@ -0,0 +1,150 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+"""
+Cache of bookmark querysets and fragments invalidated by generation counters.
+
+Every site and every user has a counter that is bumped whenever bookmarks or
+bookmark instances in its scope change (see `bookmarks.receivers`). Cache
+keys embed the current counters, so bumping one orphans all the entries
+built from it in O(1) without scanning keys; the orphans expire on their
+own. Works with any Django cache backend, including locmem and file.
+
+Counters bumped inside a transaction can be read, and the old rows cached
+under them, before it commits. Writers therefore run in `atomic`, which
+bumps them again once the transaction is over.
+"""
+
+CACHE_ALIAS = getattr(settings, 'BOOKMARKS_CACHE', 'default')
+CACHE_TIMEOUT = getattr(settings, 'BOOKMARKS_CACHE_TIMEOUT', 300)
+KEY_PREFIX = 'bookmarks'
+
+_local = threading.local()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def generation_key(scope, pk):
+    return '{}:generation:{}:{}'.format(KEY_PREFIX, scope, pk)
+
+
+def changed_key(scope, pk):
+    return '{}:changed:{}:{}'.format(KEY_PREFIX, scope, pk)
+
+
+def new_generation():
+    # Start from the clock rather than 1 so a counter evicted from the cache
+    # cannot come back with a value it had before.
+    return int(time.time() * 1000)
+
+
+def get_generation(scope, pk):
+    cache = get_cache()
+    key = generation_key(scope, pk)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, new_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(scope, pk):
+    cache = get_cache()
+    key = generation_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_generation(), None)
+    cache.set(changed_key(scope, pk), time.time(), None)
+    bumped = getattr(_local, 'bumped', None)
+    if bumped is not None:
+        bumped.add((scope, pk))
+
+
+@contextmanager
+def atomic():
+    """
+    `transaction.atomic`, bumping the counters bumped inside the outermost
+    block again after it commits or rolls back.
+    """
+    if getattr(_local, 'bumped', None) is not None:
+        with transaction.atomic():
+            yield
+        return
+    _local.bumped = set()
+    try:
+        with transaction.atomic():
+            yield
+    finally:
+        bumped, _local.bumped = _local.bumped, None
+        for scope, pk in bumped:
+            bump_generation(scope, pk)
+
+
+def get_changed(scope, pk):
+    """Return when the generation of `scope` was last bumped, as a timestamp."""
+    cache = get_cache()
+    key = changed_key(scope, pk)
+    changed = cache.get(key)
+    if changed is None:
+        # Evicted or never bumped: assume it just changed.
+        cache.add(key, time.time(), None)
+        changed = cache.get(key)
+    return changed
+
+
+def bump_sites(site_ids):
+    for site_id in set(site_ids):
+        bump_generation('site', site_id)
+
+
+def bump_user(user_id):
+    bump_generation('user', user_id)
+
+
+def last_changed(site=None, user=None):
+    """Return the latest `get_changed` of `site` and `user`."""
+    changed = []
+    if site is not None:
+        changed.append(get_changed('site', site.pk))
+    if user is not None:
+        changed.append(get_changed('user', user.pk))
+    return max(changed)
+
+
+def cache_key(name, site=None, user=None):
+    """
+    Return the key for `name` (a string or tuple of strings) at the current
+    generations of `site` and `user`.
+    """
+    if isinstance(name, (list, tuple)):
+        name = ':'.join(u'{}'.format(part) for part in name)
+    parts = [name]
+    if site is not None:
+        parts.append('s{}.{}'.format(site.pk, get_generation('site', site.pk)))
+    if user is not None:
+        parts.append('u{}.{}'.format(user.pk, get_generation('user', user.pk)))
+    digest = hashlib.md5(u'|'.join(parts).encode('utf-8')).hexdigest()
+    return '{}:{}'.format(KEY_PREFIX, digest)
+
+
+def cached(name, build, site=None, user=None, timeout=CACHE_TIMEOUT):
+    """
+    Return the cached value for `name` in the scope of `site` and `user`,
+    calling `build` to compute and store it on a miss.
+    """
+    cache = get_cache()
+    key = cache_key(name, site, user)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
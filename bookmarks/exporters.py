@@ -0,0 +1,98 @@
+import calendar
+import csv
+import json
+
+from django.utils.encoding import force_bytes
+from django.utils.html import escape
+
+"""
+Streaming writers for a user's bookmarks.
+
+Each writer takes an iterable of `BookmarkInstance` (with the bookmark
+selected) and yields the export piece by piece.
+"""
+
+CHUNK_SIZE = 1000
+
+
+def iter_instances(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Iterate over `queryset` in primary key order, fetching `chunk_size` rows
+    at a time so memory use stays bounded however many rows there are.
+    """
+    queryset = queryset.select_related('bookmark').order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        for instance in chunk:
+            yield instance
+        last_pk = chunk[-1].pk
+
+
+def timestamp(value):
+    return calendar.timegm(value.utctimetuple())
+
+
+def export_html(instances):
+    """Write the Netscape bookmark file format read by all major browsers."""
+    yield (
+        u'<!DOCTYPE NETSCAPE-Bookmark-file-1>\n'
+        u'<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+        u'<TITLE>Bookmarks</TITLE>\n'
+        u'<H1>Bookmarks</H1>\n'
+        u'<DL><p>\n'
+    )
+    for instance in instances:
+        tags = u','.join(instance.tags.replace(',', ' ').split())
+        line = u'<DT><A HREF="{}" ADD_DATE="{}" TAGS="{}">{}</A>\n'.format(
+            escape(instance.bookmark.url),
+            timestamp(instance.saved),
+            escape(tags),
+            escape(instance.description),
+        )
+        if instance.note:
+            line += u'<DD>{}\n'.format(escape(instance.note))
+        yield line
+    yield u'</DL><p>\n'
+
+
+def export_json(instances):
+    """Write one JSON object per line (JSON Lines)."""
+    for instance in instances:
+        yield json.dumps({
+            'url': instance.bookmark.url,
+            'description': instance.description,
+            'note': instance.note,
+            'tags': instance.tags,
+            'saved': instance.saved.isoformat(),
+        }) + '\n'
+
+
+class Echo(object):
+    """File-like object that returns what is written to it."""
+    def write(self, value):
+        return value
+
+
+def export_csv(instances):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['url', 'description', 'note', 'tags', 'saved'])
+    for instance in instances:
+        yield writer.writerow([
+            force_bytes(value) for value in (
+                instance.bookmark.url,
+                instance.description,
+                instance.note,
+                instance.tags,
+                instance.saved.isoformat(),
+            )
+        ])
+
+
+EXPORTERS = {
+    'html': (export_html, 'text/html; charset=utf-8'),
+    'json': (export_json, 'application/x-ndjson; charset=utf-8'),
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+}
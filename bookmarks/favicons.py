@@ -0,0 +1,55 @@
+from multiprocessing.pool import ThreadPool
+
+from django.utils import timezone
+
+from bookmarks import cache
+from bookmarks.fetch import ConnectionPool, FetchError
+from bookmarks.models import Bookmark
+
+
+def probe_favicons(favicon_urls, workers=10, timeout=10):
+    """
+    Request each of `favicon_urls` concurrently with at most `workers`
+    threads and return a `{favicon_url: found}` mapping.
+    """
+    connections = ConnectionPool(timeout=timeout)
+
+    def probe(favicon_url):
+        try:
+            return favicon_url, connections.fetch(favicon_url).ok
+        except FetchError:
+            return favicon_url, False
+
+    pool = ThreadPool(workers)
+    try:
+        return dict(pool.map(probe, favicon_urls))
+    finally:
+        pool.close()
+        pool.join()
+        connections.close()
+
+
+def check_favicons(bookmarks, workers=10, timeout=10):
+    """
+    Probe the favicons of `bookmarks` and store the results.
+
+    Bookmarks are grouped by origin so each host is only requested once, and
+    the results are written with one UPDATE per outcome. Returns the number
+    of bookmarks found to have a favicon.
+    """
+    origins = {}
+    for bookmark in bookmarks:
+        favicon_url = bookmark.get_favicon_url(force=True)
+        origins.setdefault(favicon_url, []).append(bookmark.pk)
+
+    found = probe_favicons(origins.keys(), workers=workers, timeout=timeout)
+
+    now = timezone.now()
+    with_favicon = [pk for url, pks in origins.items() if found[url] for pk in pks]
+    without_favicon = [pk for url, pks in origins.items() if not found[url] for pk in pks]
+    Bookmark.objects.filter(pk__in=with_favicon).update(has_favicon=True, favicon_checked=now)
+    Bookmark.objects.filter(pk__in=without_favicon).update(has_favicon=False, favicon_checked=now)
+    # A queryset update sends no signals.
+    sites = Bookmark.sites.through.objects.filter(bookmark__in=with_favicon + without_favicon)
+    cache.bump_sites(sites.values_list('site_id', flat=True))
+    return len(with_favicon)
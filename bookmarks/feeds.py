@@ -0,0 +1,201 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.contrib.syndication.views import Feed
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.urlresolvers import reverse
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.translation import ugettext as _
+from django.views.decorators.http import condition
+from tagging.models import Tag
+from tagging.utils import parse_tag_input
+
+from bookmarks import cache
+from bookmarks.models import Bookmark, BookmarkInstance
+
+"""
+RSS and Atom feeds of the latest bookmarks on the current site, of a
+user's bookmarks and of the bookmarks with a tag.
+
+Feed readers poll often, so a feed's `ETag` is derived from the cache
+generations of its scope (see `bookmarks.cache`) and its `Last-Modified`
+from when they were last bumped, without any query. Unchanged polls get a
+304 without the feed being built, and the feed bodies are cached until the
+generations change.
+"""
+
+FEED_LENGTH = getattr(settings, 'BOOKMARKS_FEED_LENGTH', 20)
+
+FEED_TYPES = {
+    'rss': Rss201rev2Feed,
+    'atom': Atom1Feed,
+}
+
+
+class CachedFeed(Feed):
+    def __init__(self, feed_type=Rss201rev2Feed):
+        self.feed_type = feed_type
+
+    def cache_name(self, obj):
+        """The name of the feed of `obj` in `bookmarks.cache`."""
+        raise NotImplementedError
+
+    def cache_user(self, obj):
+        """The user whose generation the feed of `obj` depends on, if any."""
+        return None
+
+    def subtitle(self, obj):
+        # Atom has a subtitle where RSS has a description.
+        return self.description(obj)
+
+    def __call__(self, request, *args, **kwargs):
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404('Feed object does not exist.')
+        name = ('feed', self.feed_type.__name__) + self.cache_name(obj)
+        site = Site.objects.get_current()
+        user = self.cache_user(obj)
+        etag = cache.cache_key(name, site=site, user=user)
+        changed = cache.last_changed(site, user)
+        # Last-Modified has a resolution of a second, so a change in the
+        # current second isn't announced: a later change in the same second
+        # would have the same date.
+        last_modified = None
+        if time.time() - changed >= 1:
+            last_modified = datetime.datetime.fromtimestamp(int(changed), timezone.utc)
+
+        def build():
+            return self.get_feed(obj, request).writeString('utf-8')
+
+        @condition(etag_func=lambda request: etag, last_modified_func=lambda request: last_modified)
+        def view(request):
+            content = cache.cached(name, build, site=site, user=user)
+            return HttpResponse(content, content_type=self.feed_type.mime_type)
+
+        return view(request)
+
+
+def with_tag_names(bookmarks):
+    bookmarks = list(bookmarks)
+    tags = Bookmark.on_site.tags_with_counts(bookmarks)
+    for bookmark in bookmarks:
+        bookmark.tag_names = [tag.name for tag, count in tags[bookmark.pk]]
+    return bookmarks
+
+
+class BookmarkFeedMixin(object):
+    def items(self, obj):
+        return with_tag_names(self.bookmarks(obj).order_by('-added', '-id')[:FEED_LENGTH])
+
+    def item_title(self, bookmark):
+        return bookmark.description
+
+    def item_link(self, bookmark):
+        return bookmark.url
+
+    def item_description(self, bookmark):
+        return bookmark.note
+
+    def item_pubdate(self, bookmark):
+        return bookmark.added
+
+    def item_categories(self, bookmark):
+        return bookmark.tag_names
+
+
+class BookmarkFeed(BookmarkFeedMixin, CachedFeed):
+    def get_object(self, request):
+        return Site.objects.get_current()
+
+    def bookmarks(self, site):
+        return Bookmark.on_site.all()
+
+    def cache_name(self, site):
+        return ('all',)
+
+    def title(self, site):
+        return _('Bookmarks on {}').format(site.name)
+
+    def description(self, site):
+        return _('The latest bookmarks on {}.').format(site.name)
+
+    def link(self, site):
+        return reverse('bookmarks.views.bookmarks')
+
+
+class TagFeed(BookmarkFeedMixin, CachedFeed):
+    def get_object(self, request, tag):
+        return Tag.objects.get(name=tag)
+
+    def bookmarks(self, tag):
+        return Bookmark.on_site.tagged([tag])
+
+    def cache_name(self, tag):
+        return ('tag', tag.pk)
+
+    def title(self, tag):
+        return _('Bookmarks tagged {}').format(tag.name)
+
+    def description(self, tag):
+        return _('The latest bookmarks tagged {}.').format(tag.name)
+
+    def link(self, tag):
+        return reverse('bookmarks.views.tagged', kwargs={'tags': tag.name})
+
+
+class UserFeed(CachedFeed):
+    def get_object(self, request, username):
+        User = get_user_model()
+        return User._default_manager.get(**{User.USERNAME_FIELD: username})
+
+    def instances(self, user):
+        return BookmarkInstance.on_site.filter(user=user)
+
+    def items(self, user):
+        instances = self.instances(user).select_related('bookmark')
+        return instances.order_by('-saved', '-id')[:FEED_LENGTH]
+
+    def cache_name(self, user):
+        return ('user',)
+
+    def cache_user(self, user):
+        return user
+
+    def title(self, user):
+        return _("{}'s bookmarks").format(user.get_username())
+
+    def description(self, user):
+        return _('The latest bookmarks saved by {}.').format(user.get_username())
+
+    def link(self, user):
+        return reverse('bookmarks.views.bookmarks')
+
+    def item_title(self, instance):
+        return instance.description
+
+    def item_link(self, instance):
+        return instance.bookmark.url
+
+    def item_description(self, instance):
+        return instance.note
+
+    def item_pubdate(self, instance):
+        return instance.saved
+
+    def item_categories(self, instance):
+        return parse_tag_input(instance.tags)
+
+
+def feeds(feed_class):
+    return dict((format, feed_class(feed_type)) for format, feed_type in FEED_TYPES.items())
+
+
+BOOKMARK_FEEDS = feeds(BookmarkFeed)
+TAG_FEEDS = feeds(TagFeed)
+USER_FEEDS = feeds(UserFeed)
@@ -0,0 +1,134 @@
+import httplib
+import socket
+import threading
+import urlparse
+
+from django.utils.encoding import iri_to_uri
+
+"""
+A minimal HTTP client for the background checkers.
+
+Connections are kept alive and reused per origin and per thread, so a
+worker probing several URLs on the same host pays for one TCP (and TLS)
+handshake.
+"""
+
+DEFAULT_TIMEOUT = 10
+MAX_REDIRECTS = 5
+MAX_BODY = 64 * 1024
+USER_AGENT = 'incuna-bookmarks'
+
+CONNECTION_CLASSES = {
+    'http': httplib.HTTPConnection,
+    'https': httplib.HTTPSConnection,
+}
+
+
+class FetchError(Exception):
+    pass
+
+
+class Response(object):
+    def __init__(self, url, status, location=None):
+        self.url = url
+        self.status = status
+        self.location = location
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    @property
+    def is_redirect(self):
+        return self.status in (301, 302, 303, 307, 308) and bool(self.location)
+
+
+class ConnectionPool(object):
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.local = threading.local()
+        # Every thread's connections, for `close` to reach them all.
+        self.lock = threading.Lock()
+        self.opened = []
+
+    def connections(self):
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        return self.local.connections
+
+    def get_connection(self, scheme, netloc):
+        connections = self.connections()
+        key = (scheme, netloc)
+        if key not in connections:
+            try:
+                connection_class = CONNECTION_CLASSES[scheme]
+            except KeyError:
+                raise FetchError('Unsupported scheme: {}'.format(scheme))
+            connections[key] = connection_class(netloc, timeout=self.timeout)
+            with self.lock:
+                self.opened.append(connections[key])
+        return connections[key]
+
+    def discard_connection(self, scheme, netloc):
+        connection = self.connections().pop((scheme, netloc), None)
+        if connection is not None:
+            with self.lock:
+                self.opened.remove(connection)
+            connection.close()
+
+    def request(self, method, url):
+        """Send a single request for `url` and return a `Response`."""
+        # httplib sends the path as is, so quote its non-ASCII characters.
+        try:
+            scheme, netloc, path, query, fragment = urlparse.urlsplit(iri_to_uri(url))
+        except ValueError as e:
+            raise FetchError(str(e))
+        path = urlparse.urlunsplit(('', '', path or '/', query, ''))
+        headers = {'User-Agent': USER_AGENT}
+
+        # A kept-alive connection may have been closed by the server, so
+        # retry once on a fresh connection.
+        for attempt in (1, 2):
+            try:
+                # Raises `httplib.InvalidURL` for a bad port.
+                connection = self.get_connection(scheme, netloc)
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                # The response must be read, even the empty body of a HEAD,
+                # before the connection can be reused.
+                body = response.read(MAX_BODY)
+                if len(body) == MAX_BODY:
+                    # Don't download large bodies just to reuse the socket.
+                    self.discard_connection(scheme, netloc)
+                if response.will_close:
+                    self.discard_connection(scheme, netloc)
+                break
+            except (httplib.HTTPException, socket.error) as e:
+                self.discard_connection(scheme, netloc)
+                if attempt == 2:
+                    raise FetchError(str(e) or e.__class__.__name__)
+
+        location = response.getheader('location')
+        if location:
+            location = urlparse.urljoin(url, location)
+        return Response(url, response.status, location)
+
+    def fetch(self, url, method='GET', max_redirects=MAX_REDIRECTS):
+        """
+        Request `url`, following redirects. The returned `Response.url` is
+        the final URL.
+        """
+        for _ in range(max_redirects + 1):
+            response = self.request(method, url)
+            if not response.is_redirect:
+                return response
+            url = response.location
+        raise FetchError('Too many redirects.')
+
+    def close(self):
+        """Close the connections of every thread, once they are done."""
+        with self.lock:
+            opened, self.opened = self.opened, []
+            self.local = threading.local()
+        for connection in opened:
+            connection.close()
@@ -1,14 +1,17 @@
 from django import forms
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from tagging.forms import TagField
 
-from bookmarks.models import BookmarkInstance
+from bookmarks.importers import PARSERS
+from bookmarks.models import Bookmark, BookmarkInstance
 
 
 class BookmarkInstanceForm(forms.ModelForm):
     url = forms.URLField(
         label="URL",
+        max_length=Bookmark._meta.get_field('url').max_length,
         widget=forms.TextInput(attrs={"size": 40}),
     )
     description = forms.CharField(
@@ -20,18 +23,27 @@ class BookmarkInstanceForm(forms.ModelForm):
 
     def __init__(self, user=None, *args, **kwargs):
         self.user = user
+        self.bookmark = None
         super(BookmarkInstanceForm, self).__init__(*args, **kwargs)
         # hack to order fields
         self.fields.keyOrder = ['url', 'description', 'note', 'tags', 'redirect']
+        # These are filled in by save() when they are not submitted.
+        for name in ('bookmark', 'user', 'saved'):
+            self.fields[name].required = False
 
     def clean(self):
         if 'url' not in self.cleaned_data:
             return
-        bookmarks = BookmarkInstance.on_site.filter(
-            bookmark__url=self.cleaned_data['url'],
+        try:
+            self.bookmark = Bookmark.on_site.get_by_url(self.cleaned_data['url'])
+        except Bookmark.DoesNotExist:
+            self.bookmark = None
+            return self.cleaned_data
+        bookmarks = BookmarkInstance.objects.filter(
+            bookmark=self.bookmark,
             user=self.user,
         )
-        if bookmarks.count() > 0:
+        if bookmarks.exists():
             raise forms.ValidationError(
                 _("You have already bookmarked this link."),
             )
@@ -45,7 +57,14 @@ class BookmarkInstanceForm(forms.ModelForm):
 
     def save(self, commit=True):
         url = self.cleaned_data['url']
-        self.instance.bookmark = self.instance.get_or_create_bookmark(url)
+        if self.user is not None:
+            self.instance.user = self.user
+        if self.instance.saved is None:
+            self.instance.saved = timezone.now()
+        # clean() already looked the bookmark up.
+        if self.bookmark is None:
+            self.bookmark = self.instance.create_bookmark(url)
+        self.instance.bookmark = self.bookmark
         return super(BookmarkInstanceForm, self).save(commit)
 
     class Meta:
@@ -60,3 +79,19 @@ class BookmarkInstanceForm(forms.ModelForm):
             'url',
             'redirect',
         )
+
+
+class BookmarkImportForm(forms.Form):
+    file = forms.FileField(label=_("Bookmarks file"))
+    format = forms.ChoiceField(
+        label=_("Format"),
+        choices=(
+            ("html", _("Netscape bookmark HTML")),
+            ("json", _("JSON")),
+        ),
+        initial="html",
+    )
+
+    def entries(self):
+        """Return an iterator over the entries of the uploaded file."""
+        return PARSERS[self.cleaned_data["format"]](self.cleaned_data["file"])
@@ -0,0 +1,197 @@
+import codecs
+import datetime
+import json
+from HTMLParser import HTMLParser
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from bookmarks.bulk import add_bookmarks
+
+"""
+Streaming parsers for browser bookmark exports.
+
+Both parsers read their input in chunks and yield entry dicts as soon as
+they are complete, so memory use does not grow with the size of the file.
+"""
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def read_text(fileobj, encoding='utf-8'):
+    """Yield decoded text chunks of `fileobj`."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if isinstance(chunk, unicode):
+            yield chunk
+        else:
+            yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def parse_timestamp(value):
+    """
+    Parse a unix timestamp or an ISO 8601 string, returning None if empty or
+    invalid.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(int(value), timezone.utc)
+    except (OverflowError, TypeError, ValueError):
+        pass
+    try:
+        saved = parse_datetime(value)
+    except (TypeError, ValueError):
+        # Not a string, or out of range like u'2020-13-45T00:00:00'.
+        return None
+    if saved is not None and timezone.is_naive(saved):
+        saved = timezone.make_aware(saved, timezone.utc)
+    return saved
+
+
+class NetscapeParser(HTMLParser):
+    """
+    Collect entries from the Netscape bookmark file format exported by all
+    major browsers:
+
+        <DT><A HREF="http://..." ADD_DATE="1136073600" TAGS="a,b">Title</A>
+        <DD>Note
+    """
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.entries = []
+        self.entry = None
+        self.text = None
+
+    def finish_entry(self):
+        if self.entry is not None:
+            self.entry['note'] = ''.join(self.entry['note']).strip()
+            self.entries.append(self.entry)
+        self.entry = None
+        self.text = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self.finish_entry()
+            attrs = dict(attrs)
+            self.entry = {
+                'url': attrs.get('href', ''),
+                'description': [],
+                'note': [],
+                'tags': attrs.get('tags', '').split(','),
+                'saved': parse_timestamp(attrs.get('add_date')),
+            }
+            self.text = self.entry['description']
+        elif tag == 'dd' and self.entry is not None:
+            self.text = self.entry['note']
+        elif tag in ('dt', 'dl', 'h3'):
+            self.finish_entry()
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self.entry is not None:
+            self.entry['description'] = ''.join(self.entry['description']).strip()
+            self.text = None
+        elif tag == 'dl':
+            self.finish_entry()
+
+    def handle_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(self.unescape('&%s;' % name))
+
+    def handle_charref(self, name):
+        self.handle_data(self.unescape('&#%s;' % name))
+
+    def close(self):
+        HTMLParser.close(self)
+        self.finish_entry()
+
+
+def parse_netscape(fileobj):
+    """Yield the bookmarks of a Netscape bookmark HTML file."""
+    parser = NetscapeParser()
+    for text in read_text(fileobj):
+        parser.feed(text)
+        for entry in parser.entries:
+            yield entry
+        del parser.entries[:]
+    parser.close()
+    for entry in parser.entries:
+        yield entry
+
+
+def parse_json(fileobj):
+    """
+    Yield the bookmarks of a JSON array or JSON Lines file of objects with
+    `url`, `description` (or `title`), `note`, `tags` and `saved` keys.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    chunks = read_text(fileobj)
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                if buffer:
+                    raise ImportFormatError('Invalid JSON near: {!r}'.format(buffer[:50]))
+                return
+            try:
+                buffer += next(chunks)
+            except StopIteration:
+                eof = True
+            continue
+        buffer = buffer[end:]
+        if not isinstance(item, dict):
+            raise ImportFormatError('Expected a JSON object, got: {!r}'.format(item))
+        yield {
+            'url': item.get('url') or item.get('href') or '',
+            'description': item.get('description') or item.get('title') or '',
+            'note': item.get('note') or '',
+            'tags': item.get('tags') or '',
+            'saved': parse_timestamp(item.get('saved') or item.get('add_date')),
+        }
+
+
+PARSERS = {
+    'html': parse_netscape,
+    'json': parse_json,
+}
+
+
+def import_bookmarks(user, entries, batch_size=500, progress=None):
+    """
+    Save `entries` for `user` in batches of `batch_size`, each in its own
+    transaction. `progress`, if given, is called after every batch with the
+    results of that batch. Returns a `{status: count}` summary.
+    """
+    summary = {}
+
+    def flush(batch):
+        results = add_bookmarks(user, batch)
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
+        if progress is not None:
+            progress(results)
+
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return summary
@@ -0,0 +1,280 @@
+import bisect
+import functools
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from bookmarks import cache
+
+"""
+Opt-in instrumentation of the bookmarks views and template tags.
+
+With `BOOKMARKS_INSTRUMENTATION = True`, every instrumented call records its
+query count, database time, total time and result size in a `Measurement`
+and passes it to each sink in `BOOKMARKS_INSTRUMENTATION_SINKS` (dotted
+paths of callables taking a measurement). Calls slower than
+`BOOKMARKS_SLOW_VIEW_MS` are logged as warnings, and with
+`BOOKMARKS_INSTRUMENTATION_HEADER = True` views report their measurement in
+an `X-Bookmarks-Instrumentation` response header.
+
+Queries are counted by wrapping the cursors of the default database for the
+duration of the call, which costs a little per query, hence opt-in.
+"""
+
+logger = logging.getLogger('bookmarks.instrumentation')
+
+DEFAULT_SINKS = ['bookmarks.instrumentation.log_sink']
+HEADER = 'X-Bookmarks-Instrumentation'
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded.
+HISTOGRAM_BUCKETS = {
+    'total_ms': [5, 10, 25, 50, 100, 250, 500, 1000, 2500],
+    'queries': [1, 2, 5, 10, 20, 50, 100],
+}
+
+# Names of the instrumented views and tags, for `dump_instrumentation`.
+INSTRUMENTED = set()
+
+measured = Signal(providing_args=['measurement'])
+
+
+class Measurement(object):
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.db_ms = 0.0
+        self.total_ms = 0.0
+        self.size = None
+
+    def __str__(self):
+        return 'queries={}; db={:.1f}ms; total={:.1f}ms; size={}'.format(
+            self.queries, self.db_ms, self.total_ms, self.size,
+        )
+
+
+class CountingCursor(object):
+    """Cursor wrapper adding the queries it runs to a `QueryCounter`."""
+    def __init__(self, cursor, counter):
+        self.cursor = cursor
+        self.counter = counter
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.cursor.__exit__(exc_type, exc_value, traceback)
+
+    def execute(self, sql, params=None):
+        start = time.time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.counter.add(time.time() - start)
+
+    def executemany(self, sql, param_list):
+        start = time.time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.counter.add(time.time() - start)
+
+
+class QueryCounter(object):
+    """
+    Context manager counting the queries run on a connection and their time,
+    without keeping the queries like the debug cursor does.
+    """
+    CURSOR_FACTORIES = ('make_cursor', 'make_debug_cursor')
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+
+    def __enter__(self):
+        connection = connections[self.using]
+        self.previous = {}
+        for name in self.CURSOR_FACTORIES:
+            # Nested counters wrap the factories of the enclosing one.
+            self.previous[name] = vars(connection).get(name)
+            setattr(connection, name, self.wrap(getattr(connection, name)))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        connection = connections[self.using]
+        for name, previous in self.previous.items():
+            if previous is None:
+                delattr(connection, name)
+            else:
+                setattr(connection, name, previous)
+
+    def wrap(self, make_cursor):
+        def wrapper(cursor):
+            return CountingCursor(make_cursor(cursor), self)
+        return wrapper
+
+
+def is_enabled():
+    return getattr(settings, 'BOOKMARKS_INSTRUMENTATION', False)
+
+
+def get_sinks():
+    paths = getattr(settings, 'BOOKMARKS_INSTRUMENTATION_SINKS', DEFAULT_SINKS)
+    return [import_string(path) for path in paths]
+
+
+class measure(object):
+    """
+    Context manager measuring the block as `name`. Set `size` on the
+    measurement it returns to report the size of the result.
+
+        with measure('rebuild') as measurement:
+            ...
+            measurement.size = len(rows)
+
+    The measurement is only reported when instrumentation is enabled.
+    """
+    def __init__(self, name):
+        self.measurement = Measurement(name)
+        self.enabled = is_enabled()
+
+    def __enter__(self):
+        if self.enabled:
+            self.queries = QueryCounter()
+            self.queries.__enter__()
+            self.start = time.time()
+        return self.measurement
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.enabled:
+            return
+        measurement = self.measurement
+        measurement.total_ms = (time.time() - self.start) * 1000
+        self.queries.__exit__(exc_type, exc_value, traceback)
+        measurement.queries = self.queries.count
+        measurement.db_ms = self.queries.seconds * 1000
+        if exc_type is None:
+            report(measurement)
+
+
+def report(measurement):
+    for sink in get_sinks():
+        sink(measurement)
+    slow_ms = getattr(settings, 'BOOKMARKS_SLOW_VIEW_MS', None)
+    if slow_ms is not None and measurement.total_ms >= slow_ms:
+        logger.warning('Slow %s: %s', measurement.name, measurement)
+
+
+def instrument(name, size=None):
+    """
+    Decorator measuring calls of a function as `name`. `size`, if given, is
+    called with the return value to get the size of the result.
+    """
+    INSTRUMENTED.add(name)
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return function(*args, **kwargs)
+            with measure(name) as measurement:
+                result = function(*args, **kwargs)
+                if size is not None:
+                    measurement.size = size(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def instrument_view(view):
+    """Decorator measuring `view` and the size of its response."""
+    name = view.__name__
+    INSTRUMENTED.add(name)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_enabled():
+            return view(request, *args, **kwargs)
+        with measure(name) as measurement:
+            response = view(request, *args, **kwargs)
+            if not response.streaming:
+                measurement.size = len(response.content)
+        if getattr(settings, 'BOOKMARKS_INSTRUMENTATION_HEADER', False):
+            response[HEADER] = str(measurement)
+        return response
+    return wrapper
+
+
+def log_sink(measurement):
+    logger.info('%s: %s', measurement.name, measurement)
+
+
+def signal_sink(measurement):
+    measured.send(sender=Measurement, measurement=measurement)
+
+
+def histogram_key(name, metric, bucket):
+    return '{}:histogram:{}:{}:{}'.format(cache.KEY_PREFIX, name, metric, bucket)
+
+
+def histogram_sink(measurement):
+    """
+    Count the measurement in per-name histograms of total time and queries,
+    kept in the bookmarks cache so that all processes sharing it contribute.
+    """
+    cache_backend = cache.get_cache()
+    for metric, bounds in HISTOGRAM_BUCKETS.items():
+        bucket = bisect.bisect_left(bounds, getattr(measurement, metric))
+        key = histogram_key(measurement.name, metric, bucket)
+        try:
+            cache_backend.incr(key)
+        except ValueError:
+            if not cache_backend.add(key, 1, None):
+                cache_backend.incr(key)
+
+
+def get_histograms(names=None):
+    """
+    Return `{name: {metric: [(upper_bound, count)]}}` for `names` (all the
+    instrumented names by default). The last upper bound is None.
+    """
+    names = sorted(INSTRUMENTED if names is None else names)
+    keys = [
+        histogram_key(name, metric, bucket)
+        for name in names
+        for metric, bounds in HISTOGRAM_BUCKETS.items()
+        for bucket in range(len(bounds) + 1)
+    ]
+    counts = cache.get_cache().get_many(keys)
+    histograms = {}
+    for name in names:
+        for metric, bounds in HISTOGRAM_BUCKETS.items():
+            histograms.setdefault(name, {})[metric] = [
+                (bound, counts.get(histogram_key(name, metric, bucket), 0))
+                for bucket, bound in enumerate(bounds + [None])
+            ]
+    return histograms
+
+
+def reset_histograms(names=None):
+    names = INSTRUMENTED if names is None else names
+    cache.get_cache().delete_many([
+        histogram_key(name, metric, bucket)
+        for name in names
+        for metric, bounds in HISTOGRAM_BUCKETS.items()
+        for bucket in range(len(bounds) + 1)
+    ])
@@ -0,0 +1,163 @@
+import threading
+import time
+import urlparse
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+from django.db.models import Case, CharField, IntegerField, Value, When
+from django.utils import timezone
+
+from bookmarks import cache
+from bookmarks.fetch import MAX_REDIRECTS, ConnectionPool, FetchError
+from bookmarks.models import Bookmark
+
+"""
+Check that bookmarked URLs still resolve.
+
+URLs are requested concurrently by a pool of threads sharing kept-alive
+connections (see `bookmarks.fetch`). To be polite, at most `per_host`
+requests are in flight to a host at a time and consecutive requests to a
+host are spaced by `delay` seconds. URLs are queued round-robin across
+hosts so that workers are not all waiting on the same host.
+
+Each URL is first requested with HEAD, following redirects, and with GET
+when HEAD fails or is refused, as many servers mishandle HEAD.
+"""
+
+DEFAULT_WORKERS = 20
+DEFAULT_PER_HOST = 2
+DEFAULT_DELAY = 0.5
+FINAL_URL_MAX_LENGTH = Bookmark._meta.get_field('final_url').max_length
+
+
+class HostLimiter(object):
+    def __init__(self, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY):
+        self.per_host = per_host
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.next_request = {}
+
+    @contextmanager
+    def limit(self, url):
+        """Wait for a turn to request `url`'s host."""
+        host = urlparse.urlsplit(url).netloc.lower()
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            semaphore = self.semaphores[host]
+        with semaphore:
+            with self.lock:
+                now = time.time()
+                start = max(now, self.next_request.get(host, 0))
+                self.next_request[host] = start + self.delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class LinkChecker(object):
+    def __init__(self, timeout=10, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY):
+        self.connections = ConnectionPool(timeout=timeout)
+        self.limiter = HostLimiter(per_host=per_host, delay=delay)
+
+    def follow(self, method, url):
+        """Request `url` with `method`, following redirects politely."""
+        for _ in range(MAX_REDIRECTS + 1):
+            with self.limiter.limit(url):
+                response = self.connections.request(method, url)
+            if not response.is_redirect:
+                return response
+            url = response.location
+        raise FetchError('Too many redirects.')
+
+    def check(self, url):
+        """Return the `(status, final_url)` of `url`."""
+        try:
+            response = self.follow('HEAD', url)
+            if response.ok:
+                return response.status, response.url
+        except FetchError:
+            pass
+        try:
+            response = self.follow('GET', url)
+        except FetchError:
+            return Bookmark.LINK_UNREACHABLE, ''
+        return response.status, response.url
+
+    def close(self):
+        self.connections.close()
+
+
+def interleave_hosts(urls):
+    """Order `urls` round-robin by host."""
+    hosts = OrderedDict()
+    for url in urls:
+        hosts.setdefault(urlparse.urlsplit(url).netloc.lower(), []).append(url)
+    queues = [iter(host_urls) for host_urls in hosts.values()]
+    ordered = []
+    while queues:
+        remaining = []
+        for queue in queues:
+            url = next(queue, None)
+            if url is not None:
+                ordered.append(url)
+                remaining.append(queue)
+        queues = remaining
+    return ordered
+
+
+def probe_links(urls, workers=DEFAULT_WORKERS, **kwargs):
+    """
+    Check each of `urls` concurrently with at most `workers` threads and
+    return a `{url: (status, final_url)}` mapping. Other keyword arguments
+    are passed to `LinkChecker`.
+    """
+    checker = LinkChecker(**kwargs)
+
+    def check(url):
+        return url, checker.check(url)
+
+    pool = ThreadPool(workers)
+    try:
+        return dict(pool.imap_unordered(check, interleave_hosts(set(urls))))
+    finally:
+        pool.close()
+        pool.join()
+        checker.close()
+
+
+def check_links(bookmarks, workers=DEFAULT_WORKERS, **kwargs):
+    """
+    Check the URLs of `bookmarks` and store the results with one UPDATE.
+    Returns the number of bookmarks whose URL did not resolve.
+    """
+    bookmarks = list(bookmarks)
+    if not bookmarks:
+        return 0
+    results = probe_links((bookmark.url for bookmark in bookmarks), workers=workers, **kwargs)
+
+    statuses = []
+    final_urls = []
+    broken = 0
+    for bookmark in bookmarks:
+        status, final_url = results[bookmark.url]
+        # A redirect too long to store would fail the whole batch's UPDATE.
+        if final_url == bookmark.url or len(final_url) > FINAL_URL_MAX_LENGTH:
+            final_url = ''
+        statuses.append(When(pk=bookmark.pk, then=Value(status)))
+        final_urls.append(When(pk=bookmark.pk, then=Value(final_url)))
+        if not 200 <= status < 400:
+            broken += 1
+
+    pks = [bookmark.pk for bookmark in bookmarks]
+    Bookmark.objects.filter(pk__in=pks).update(
+        link_status=Case(*statuses, output_field=IntegerField()),
+        final_url=Case(*final_urls, output_field=CharField()),
+        link_checked=timezone.now(),
+    )
+    # A queryset update sends no signals.
+    sites = Bookmark.sites.through.objects.filter(bookmark__in=pks)
+    cache.bump_sites(sites.values_list('site_id', flat=True))
+    return broken
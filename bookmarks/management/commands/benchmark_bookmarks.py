@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bookmarks.benchmarks import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the bookmark views, the tag cloud and reindexing against '
+        'generated data and write the results as JSON. The generated data is '
+        'rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 100000, 1000000],
+            help='Numbers of bookmark instances to benchmark with.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this file.')
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(
+            options['sizes'],
+            repeat=options['repeat'],
+            seed=options['seed'],
+            progress=self.report_progress,
+        )
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fileobj:
+                fileobj.write(output)
+        else:
+            self.stdout.write(output)
+
+    def report_progress(self, size):
+        self.stderr.write('Benchmarked {} bookmark instances.'.format(size))
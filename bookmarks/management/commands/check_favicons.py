@@ -0,0 +1,45 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from bookmarks.favicons import check_favicons
+from bookmarks.models import Bookmark
+
+
+class Command(BaseCommand):
+    help = 'Probe the favicons of bookmarks not checked recently.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Recheck favicons last checked more than this many days ago.',
+        )
+        parser.add_argument('--workers', type=int, default=10)
+        parser.add_argument('--timeout', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        checked_before = timezone.now() - datetime.timedelta(days=options['days'])
+        stale = Bookmark.objects.filter(
+            Q(favicon_checked__isnull=True) | Q(favicon_checked__lt=checked_before),
+        )
+        stale = stale.only('pk', 'url').order_by('pk')
+
+        last_pk = 0
+        checked = found = 0
+        while True:
+            batch = list(stale.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            found += check_favicons(
+                batch,
+                workers=options['workers'],
+                timeout=options['timeout'],
+            )
+            checked += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write('Checked {} bookmarks, {} with a favicon.'.format(checked, found))
@@ -0,0 +1,59 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from bookmarks import links
+from bookmarks.models import Bookmark
+
+
+class Command(BaseCommand):
+    help = 'Check that the URLs of bookmarks not checked recently still resolve.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Recheck URLs last checked more than this many days ago.',
+        )
+        parser.add_argument('--workers', type=int, default=links.DEFAULT_WORKERS)
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=links.DEFAULT_PER_HOST,
+            help='Maximum concurrent requests to a host.',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=links.DEFAULT_DELAY,
+            help='Minimum seconds between requests to a host.',
+        )
+        parser.add_argument('--timeout', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        checked_before = timezone.now() - datetime.timedelta(days=options['days'])
+        stale = Bookmark.objects.filter(
+            Q(link_checked__isnull=True) | Q(link_checked__lt=checked_before),
+        )
+        stale = stale.only('pk', 'url').order_by('pk')
+
+        last_pk = 0
+        checked = broken = 0
+        while True:
+            batch = list(stale.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            broken += links.check_links(
+                batch,
+                workers=options['workers'],
+                timeout=options['timeout'],
+                per_host=options['per_host'],
+                delay=options['delay'],
+            )
+            checked += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write('Checked {} bookmarks, {} broken.'.format(checked, broken))
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+# Importing the instrumented modules registers their names.
+import bookmarks.templatetags.bookmark_tags  # NOQA
+import bookmarks.views  # NOQA
+from bookmarks.instrumentation import get_histograms, reset_histograms
+
+
+class Command(BaseCommand):
+    help = 'Print the histograms recorded by the histogram instrumentation sink.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Views or tags to show. All by default.')
+        parser.add_argument('--json', action='store_true', help='Print the histograms as JSON.')
+        parser.add_argument('--reset', action='store_true', help='Clear the histograms after printing.')
+
+    def handle(self, *args, **options):
+        names = options['names'] or None
+        histograms = get_histograms(names)
+        if options['json']:
+            self.stdout.write(json.dumps(histograms, indent=2, sort_keys=True))
+        else:
+            for name, metrics in sorted(histograms.items()):
+                self.stdout.write(name)
+                for metric, buckets in sorted(metrics.items()):
+                    self.stdout.write('  {}: {}'.format(metric, self.format_buckets(buckets)))
+        if options['reset']:
+            reset_histograms(names)
+
+    def format_buckets(self, buckets):
+        labels = ['<={}'.format(bound) for bound, count in buckets[:-1]]
+        labels.append('>{}'.format(buckets[-2][0]))
+        return ', '.join(
+            '{}: {}'.format(label, count)
+            for label, (bound, count) in zip(labels, buckets)
+        )
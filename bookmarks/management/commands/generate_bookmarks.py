@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookmarks.benchmarks import generate_data
+
+
+class Command(BaseCommand):
+    help = 'Create users, bookmarks, instances and tags for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('instances', type=int)
+        parser.add_argument('--users', type=int, help='Defaults to one per 100 instances.')
+        parser.add_argument('--urls', type=int, help='Defaults to one per 2 instances.')
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--sites', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='Prefix of the generated usernames, URLs and tags.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = generate_data(
+                options['instances'],
+                user_count=options['users'],
+                url_count=options['urls'],
+                tag_count=options['tags'],
+                site_count=options['sites'],
+                seed=options['seed'],
+                prefix=options['prefix'],
+                progress=self.report_progress,
+            )
+        self.stdout.write('Created {} users.'.format(len(users)))
+
+    def report_progress(self, created):
+        self.stdout.write('Created {} bookmark instances.'.format(created))
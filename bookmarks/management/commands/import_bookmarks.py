@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from bookmarks.importers import PARSERS, ImportFormatError, import_bookmarks
+
+
+class Command(BaseCommand):
+    help = 'Import a Netscape bookmark HTML or JSON export for a user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            choices=sorted(PARSERS),
+            help='Format of the file. Guessed from its extension by default.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{User.USERNAME_FIELD: options['username']})
+        except User.DoesNotExist:
+            raise CommandError('Unknown user "{}".'.format(options['username']))
+
+        path = options['path']
+        format = options['format'] or ('json' if path.endswith('.json') else 'html')
+        self.processed = 0
+
+        with open(path, 'rb') as fileobj:
+            try:
+                summary = import_bookmarks(
+                    user,
+                    PARSERS[format](fileobj),
+                    batch_size=options['batch_size'],
+                    progress=self.report_progress,
+                )
+            except ImportFormatError as e:
+                raise CommandError(str(e))
+
+        for status, count in sorted(summary.items()):
+            self.stdout.write('{}: {}'.format(status, count))
+
+    def report_progress(self, results):
+        self.processed += len(results)
+        self.stdout.write('Processed {} entries.'.format(self.processed))
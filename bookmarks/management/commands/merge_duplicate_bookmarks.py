@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from bookmarks import merge
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the canonical URL of every bookmark and merge the '
+        'bookmarks whose URLs are the same.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=merge.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rehashed = merge.rehash_bookmarks(batch_size)
+        self.stdout.write('Rehashed {} bookmarks.'.format(rehashed))
+        merged = merge.merge_duplicate_groups(
+            batch_size,
+            progress=lambda merged: self.stdout.write('Merged {} bookmarks.'.format(merged)),
+        )
+        updated = merge.rehash_site_bookmarks(batch_size)
+        self.stdout.write('Merged {} bookmarks, updated {} site links.'.format(merged, updated))
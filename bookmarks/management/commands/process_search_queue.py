@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookmarks.signal_processors import process_queue
+
+
+class Command(BaseCommand):
+    help = 'Send queued bookmark changes to the search backend.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the queue instead of exiting once it is empty.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls of an empty queue with --loop.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_queue(batch_size=options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write('Processed {} queued changes.'.format(total))
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from bookmarks.models import Bookmark
+from bookmarks.search import index_bookmarks
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search terms of every bookmark.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        bookmarks = Bookmark.objects.order_by('pk')
+        last_pk = 0
+        indexed = 0
+        while True:
+            batch = list(bookmarks.filter(pk__gt=last_pk).values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            index_bookmarks(batch)
+            indexed += len(batch)
+            last_pk = batch[-1]
+            self.stdout.write('Indexed {} bookmarks.'.format(indexed))
@@ -0,0 +1,28 @@
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+
+from bookmarks import cache
+from bookmarks.models import SiteBookmarkTag, SiteTagCount
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-site tag counts and the tag index of bookmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--site',
+            action='append',
+            dest='sites',
+            type=int,
+            help='Only rebuild the counts of this site id. May be repeated.',
+        )
+
+    def handle(self, *args, **options):
+        sites = Site.objects.all()
+        if options['sites']:
+            sites = sites.filter(pk__in=options['sites'])
+        for site in sites:
+            SiteTagCount.objects.rebuild(site)
+            SiteBookmarkTag.objects.rebuild(site)
+            cache.bump_sites([site.pk])
+            self.stdout.write('Rebuilt tag counts for {}.'.format(site.domain))
@@ -0,0 +1,43 @@
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+
+from bookmarks import related
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the related bookmarks of the bookmarks whose instances '
+        'changed since the last run, or of all bookmarks with --full.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--site',
+            action='append',
+            dest='sites',
+            type=int,
+            help='Only refresh this site id. May be repeated.',
+        )
+        parser.add_argument('--full', action='store_true', help='Recompute every bookmark.')
+        parser.add_argument('--batch-size', type=int, default=related.BATCH_SIZE)
+        parser.add_argument('--top-k', type=int, default=related.TOP_K)
+        parser.add_argument(
+            '--max-postings',
+            type=int,
+            default=related.MAX_POSTINGS,
+            help='Ignore tags and users shared by more bookmarks than this.',
+        )
+
+    def handle(self, *args, **options):
+        sites = Site.objects.all()
+        if options['sites']:
+            sites = sites.filter(pk__in=options['sites'])
+        for site in sites:
+            refreshed = related.refresh_related(
+                site,
+                full=options['full'],
+                batch_size=options['batch_size'],
+                top_k=options['top_k'],
+                max_postings=options['max_postings'],
+            )
+            self.stdout.write('Refreshed {} bookmarks on {}.'.format(refreshed, site.domain))
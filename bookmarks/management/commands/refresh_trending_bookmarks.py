@@ -0,0 +1,30 @@
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+
+from bookmarks import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Compact the old save counts of bookmarks and recompute the trending '
+        'bookmarks of each site. Meant to be run periodically.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--site',
+            action='append',
+            dest='sites',
+            type=int,
+            help='Only refresh the trending bookmarks of this site id. May be repeated.',
+        )
+        parser.add_argument('--top-k', type=int, default=trending.TOP_K)
+
+    def handle(self, *args, **options):
+        merged, deleted = trending.compact_buckets()
+        self.stdout.write('Merged {} hourly buckets, deleted {} buckets.'.format(merged, deleted))
+        sites = Site.objects.all()
+        if options['sites']:
+            sites = sites.filter(pk__in=options['sites'])
+        stored = trending.refresh_trending(sites, top_k=options['top_k'])
+        self.stdout.write('Stored {} trending bookmarks.'.format(stored))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from bookmarks.models import Bookmark, BookmarkInstance
+
+
+def repair_save_counts(bookmark_ids):
+    """
+    Recount the instances of `bookmark_ids` and fix the bookmarks whose
+    `save_count` has drifted. Returns the number of bookmarks fixed.
+    """
+    counts = (
+        BookmarkInstance.objects
+        .filter(bookmark__in=bookmark_ids)
+        .values_list('bookmark')
+        .annotate(Count('pk'))
+        .order_by()
+    )
+    counts = dict(counts)
+    stored = Bookmark.objects.filter(pk__in=bookmark_ids).values_list('pk', 'save_count')
+
+    fixed = 0
+    with transaction.atomic():
+        for pk, save_count in stored:
+            if save_count != counts.get(pk, 0):
+                Bookmark.objects.filter(pk=pk).update(save_count=counts.get(pk, 0))
+                fixed += 1
+    return fixed
+
+
+class Command(BaseCommand):
+    help = 'Recompute Bookmark.save_count where it has drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        bookmarks = Bookmark.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = 0
+        checked = fixed = 0
+        while True:
+            batch = list(bookmarks.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            fixed += repair_save_counts(batch)
+            checked += len(batch)
+            last_pk = batch[-1]
+            self.stdout.write('Checked {} bookmarks, fixed {}.'.format(checked, fixed))
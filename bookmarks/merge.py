@@ -0,0 +1,196 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, CharField, Count, F, Value, When
+
+from bookmarks import cache
+from bookmarks.models import Bookmark, BookmarkInstance, SiteBookmark
+from bookmarks.utils import canonicalize_url, hash_url
+
+"""
+Merge the bookmarks whose URLs have the same canonical form.
+
+Bookmarks saved before the canonicalization settings changed (or before a
+URL was canonicalized at all) keep the hash of their old canonical URL, so
+equivalent URLs can be separate bookmarks. `merge_duplicates` fixes that in
+three passes over the bookmarks, in batches:
+
+1. `rehash_bookmarks` recomputes the canonical URL and hash of every
+   bookmark.
+2. `merge_bookmarks` merges each group of bookmarks sharing a hash into the
+   oldest one. The bookmarks of the group are put on the same sites, the
+   instances are moved through `BookmarkInstance.save()` so the receivers
+   keep the counts and indexes right, and the votes are re-pointed.
+3. `rehash_site_bookmarks` stores the new hashes in `SiteBookmark`, which
+   can only be done once no site has two bookmarks with the same hash.
+
+Lookups by URL miss the bookmarks whose `SiteBookmark` hash is stale until
+the last pass, so duplicates added meanwhile are merged by the next run.
+"""
+
+BATCH_SIZE = 1000
+
+
+def rehash_bookmarks(batch_size=BATCH_SIZE):
+    """
+    Recompute the canonical URL and hash of every bookmark with one UPDATE
+    per batch. Returns the number of bookmarks whose hash changed.
+    """
+    bookmarks = Bookmark.objects.order_by('pk').values_list('pk', 'url', 'url_hash')
+    last_pk = 0
+    changed = 0
+    while True:
+        batch = list(bookmarks.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        changed_pks = []
+        canonical_urls = []
+        hashes = []
+        for pk, url, url_hash in batch:
+            canonical_url = canonicalize_url(url)
+            new_hash = hash_url(canonical_url)
+            if new_hash != url_hash:
+                changed_pks.append(pk)
+                canonical_urls.append(When(pk=pk, then=Value(canonical_url)))
+                hashes.append(When(pk=pk, then=Value(new_hash)))
+        if changed_pks:
+            Bookmark.objects.filter(pk__in=changed_pks).update(
+                canonical_url=Case(*canonical_urls, output_field=CharField()),
+                url_hash=Case(*hashes, output_field=CharField()),
+            )
+            changed += len(changed_pks)
+    return changed
+
+
+def vote_model():
+    if apps.is_installed('voting'):
+        return apps.get_model('voting', 'Vote')
+    return None
+
+
+def merge_votes(survivor, duplicate_ids):
+    """Move the votes on `duplicate_ids` to `survivor`, one vote per user."""
+    Vote = vote_model()
+    if Vote is None:
+        return
+    content_type = ContentType.objects.get_for_model(Bookmark)
+    votes = Vote.objects.filter(content_type=content_type)
+    voters = set(votes.filter(object_id=survivor.pk).values_list('user_id', flat=True))
+    duplicate_votes = votes.filter(object_id__in=duplicate_ids).order_by('-time_stamp')
+    keep = []
+    for pk, user_id in duplicate_votes.values_list('pk', 'user_id'):
+        if user_id not in voters:
+            voters.add(user_id)
+            keep.append(pk)
+    duplicate_votes.exclude(pk__in=keep).delete()
+    votes.filter(pk__in=keep).update(object_id=survivor.pk)
+
+
+def merge_bookmarks(survivor, duplicates):
+    """
+    Merge `duplicates` into `survivor` and delete them. An instance of a
+    user who already saved `survivor` is deleted rather than moved.
+    """
+    duplicate_ids = [bookmark.pk for bookmark in duplicates]
+    with cache.atomic():
+        # Free the hash on the duplicates' sites before linking the survivor.
+        SiteBookmark.objects.filter(bookmark__in=duplicate_ids).delete()
+        SiteBookmark.objects.filter(bookmark=survivor).update(url_hash=survivor.url_hash)
+
+        # Put every bookmark of the group on the same sites first, so that
+        # moving an instance leaves the per-site counts unchanged. Linking
+        # the duplicates to a site fails quietly as the survivor owns the
+        # hash there.
+        sites = Bookmark.sites.through.objects.filter(bookmark__in=[survivor.pk] + duplicate_ids)
+        site_ids = {}
+        for bookmark_id, site_id in sites.values_list('bookmark_id', 'site_id'):
+            site_ids.setdefault(bookmark_id, set()).add(site_id)
+        all_site_ids = set().union(*site_ids.values())
+        for bookmark in [survivor] + list(duplicates):
+            missing = all_site_ids - site_ids.get(bookmark.pk, set())
+            if missing:
+                bookmark.sites.add(*missing)
+
+        savers = set(survivor.saved_instances.values_list('user_id', flat=True))
+        instances = BookmarkInstance.objects.filter(bookmark__in=duplicate_ids).order_by('saved', 'pk')
+        conflicts = []
+        for instance in instances:
+            if instance.user_id in savers:
+                conflicts.append(instance.pk)
+                continue
+            savers.add(instance.user_id)
+            instance.bookmark = survivor
+            instance.save()
+        # A queryset delete, so that the duplicates are not deleted with
+        # their last instance by `BookmarkInstance.delete()`.
+        BookmarkInstance.objects.filter(pk__in=conflicts).delete()
+
+        merge_votes(survivor, duplicate_ids)
+        Bookmark.objects.filter(pk__in=duplicate_ids).delete()
+        # The votes moved without signals.
+        cache.bump_sites(all_site_ids)
+
+
+def duplicate_hashes(batch_size=BATCH_SIZE):
+    """Yield batches of the hashes shared by several bookmarks."""
+    hashes = Bookmark.objects.values_list('url_hash').annotate(count=Count('pk'))
+    hashes = hashes.filter(count__gt=1).order_by('url_hash')
+    last_hash = ''
+    while True:
+        batch = [url_hash for url_hash, count in hashes.filter(url_hash__gt=last_hash)[:batch_size]]
+        if not batch:
+            break
+        last_hash = batch[-1]
+        yield batch
+
+
+def merge_duplicate_groups(batch_size=BATCH_SIZE, progress=None):
+    """
+    Merge every group of bookmarks sharing a hash into its oldest bookmark.
+    Returns the number of bookmarks merged away.
+    """
+    merged = 0
+    for hashes in duplicate_hashes(batch_size):
+        groups = {}
+        for bookmark in Bookmark.objects.filter(url_hash__in=hashes).order_by('added', 'pk'):
+            groups.setdefault(bookmark.url_hash, []).append(bookmark)
+        for bookmarks in groups.values():
+            merge_bookmarks(bookmarks[0], bookmarks[1:])
+            merged += len(bookmarks) - 1
+        if progress is not None:
+            progress(merged)
+    return merged
+
+
+def rehash_site_bookmarks(batch_size=BATCH_SIZE):
+    """
+    Copy the hash of each bookmark to its stale `SiteBookmark` rows with one
+    UPDATE per batch. Returns the number of rows updated.
+    """
+    stale = SiteBookmark.objects.exclude(url_hash=F('bookmark__url_hash')).order_by('pk')
+    stale = stale.values_list('pk', 'bookmark__url_hash')
+    updated = 0
+    while True:
+        # Updated rows drop out of `stale`, so always take the first batch.
+        batch = list(stale[:batch_size])
+        if not batch:
+            break
+        SiteBookmark.objects.filter(pk__in=[pk for pk, url_hash in batch]).update(
+            url_hash=Case(
+                *[When(pk=pk, then=Value(url_hash)) for pk, url_hash in batch],
+                output_field=CharField()
+            ),
+        )
+        updated += len(batch)
+    return updated
+
+
+def merge_duplicates(batch_size=BATCH_SIZE, progress=None):
+    """
+    Rehash every bookmark and merge the duplicates. Returns the numbers of
+    bookmarks rehashed and merged away.
+    """
+    rehashed = rehash_bookmarks(batch_size)
+    merged = merge_duplicate_groups(batch_size, progress)
+    rehash_site_bookmarks(batch_size)
+    return rehashed, merged
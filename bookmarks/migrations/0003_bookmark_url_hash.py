@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0001_initial'),
+        ('bookmarks', '0002_auto_20160301_1154'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteBookmark',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('url_hash', models.CharField(max_length=40)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='canonical_url',
+            field=models.URLField(default='', max_length=511, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='url_hash',
+            field=models.CharField(default='', max_length=40, editable=False, db_index=True),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='sitebookmark',
+            name='bookmark',
+            field=models.ForeignKey(related_name='site_links', to='bookmarks.Bookmark'),
+        ),
+        migrations.AddField(
+            model_name='sitebookmark',
+            name='site',
+            field=models.ForeignKey(related_name='+', to='sites.Site'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sitebookmark',
+            unique_together=set([('site', 'bookmark'), ('site', 'url_hash')]),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, transaction
+
+from bookmarks.utils import canonicalize_url, hash_url
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_url_hash(apps, schema_editor):
+    Bookmark = apps.get_model('bookmarks', 'Bookmark')
+    SiteBookmark = apps.get_model('bookmarks', 'SiteBookmark')
+    BookmarkSites = Bookmark.sites.through
+
+    last_pk = 0
+    while True:
+        batch = list(
+            Bookmark.objects
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'url')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        hashes = {}
+        with transaction.atomic():
+            for pk, url in batch:
+                canonical_url = canonicalize_url(url)
+                hashes[pk] = hash_url(canonical_url)
+                Bookmark.objects.filter(pk=pk).update(
+                    canonical_url=canonical_url,
+                    url_hash=hashes[pk],
+                )
+
+            # The oldest bookmark wins when a site already has the same
+            # canonical URL; the others stay reachable through `sites`.
+            taken = set(
+                SiteBookmark.objects
+                .filter(url_hash__in=set(hashes.values()))
+                .values_list('site_id', 'url_hash')
+            )
+            links = []
+            site_pairs = (
+                BookmarkSites.objects
+                .filter(bookmark_id__in=hashes.keys())
+                .order_by('bookmark_id')
+                .values_list('site_id', 'bookmark_id')
+            )
+            for site_id, bookmark_id in site_pairs:
+                key = (site_id, hashes[bookmark_id])
+                if key in taken:
+                    continue
+                taken.add(key)
+                links.append(SiteBookmark(
+                    site_id=site_id,
+                    bookmark_id=bookmark_id,
+                    url_hash=hashes[bookmark_id],
+                ))
+            SiteBookmark.objects.bulk_create(links)
+
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmarks', '0003_bookmark_url_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_url_hash, migrations.RunPython.noop),
+    ]
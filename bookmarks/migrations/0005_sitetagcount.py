@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tagging', '0001_initial'),
+        ('sites', '0001_initial'),
+        ('bookmarks', '0004_backfill_url_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteTagCount',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('count', models.IntegerField(default=0)),
+                ('site', models.ForeignKey(related_name='+', to='sites.Site')),
+                ('tag', models.ForeignKey(related_name='+', to='tagging.Tag')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='sitetagcount',
+            unique_together=set([('site', 'tag')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='sitetagcount',
+            index_together=set([('site', 'count')]),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmarks', '0005_sitetagcount'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='bookmark',
+            index_together=set([('added', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='bookmarkinstance',
+            index_together=set([('user', 'saved', 'id')]),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models, transaction
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_site_links(apps, schema_editor):
+    BookmarkInstance = apps.get_model('bookmarks', 'BookmarkInstance')
+    SiteBookmarkInstance = apps.get_model('bookmarks', 'SiteBookmarkInstance')
+    BookmarkSites = apps.get_model('bookmarks', 'Bookmark').sites.through
+
+    last_pk = 0
+    while True:
+        batch = list(
+            BookmarkInstance.objects
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'bookmark_id')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        sites = {}
+        site_pairs = BookmarkSites.objects.filter(
+            bookmark_id__in=set(bookmark_id for pk, bookmark_id in batch),
+        )
+        for bookmark_id, site_id in site_pairs.values_list('bookmark_id', 'site_id'):
+            sites.setdefault(bookmark_id, []).append(site_id)
+
+        with transaction.atomic():
+            SiteBookmarkInstance.objects.bulk_create(
+                SiteBookmarkInstance(site_id=site_id, instance_id=pk)
+                for pk, bookmark_id in batch
+                for site_id in sites.get(bookmark_id, [])
+            )
+
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0001_initial'),
+        ('bookmarks', '0006_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteBookmarkInstance',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('instance', models.ForeignKey(related_name='site_links', to='bookmarks.BookmarkInstance')),
+                ('site', models.ForeignKey(related_name='+', to='sites.Site')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='sitebookmarkinstance',
+            unique_together=set([('site', 'instance')]),
+        ),
+        migrations.RunPython(backfill_site_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models, transaction
+from django.db.models import Count
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_save_count(apps, schema_editor):
+    Bookmark = apps.get_model('bookmarks', 'Bookmark')
+    BookmarkInstance = apps.get_model('bookmarks', 'BookmarkInstance')
+
+    last_pk = 0
+    while True:
+        batch = list(
+            Bookmark.objects
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        counts = (
+            BookmarkInstance.objects
+            .filter(bookmark__in=batch)
+            .values_list('bookmark')
+            .annotate(Count('pk'))
+            .order_by()
+        )
+        with transaction.atomic():
+            for pk, save_count in counts:
+                Bookmark.objects.filter(pk=pk).update(save_count=save_count)
+
+        last_pk = batch[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmarks', '0008_nullable_favicon_checked'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmark',
+            name='save_count',
+            field=models.IntegerField(default=0, verbose_name='save count', editable=False),
+        ),
+        migrations.AlterIndexTogether(
+            name='bookmark',
+            index_together=set([('save_count', 'id'), ('added', 'id')]),
+        ),
+        migrations.RunPython(backfill_save_count, migrations.RunPython.noop),
+    ]
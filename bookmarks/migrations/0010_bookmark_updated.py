@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmarks', '0009_bookmark_save_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmark',
+            name='updated',
+            field=models.DateTimeField(default=django.utils.timezone.now, auto_now=True, verbose_name='updated', db_index=True),
+            preserve_default=False,
+        ),
+    ]
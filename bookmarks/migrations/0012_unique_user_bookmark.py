@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicate_instances(apps, schema_editor):
+    """
+    Keep the first instance of each user and bookmark. Duplicates could only
+    be created by concurrent adds that the form check did not catch.
+
+    Historical models fire no signals, so the tags of the removed instances
+    are deleted here. `SiteTagCount` is left to `rebuild_tag_counts`.
+    """
+    Bookmark = apps.get_model('bookmarks', 'Bookmark')
+    BookmarkInstance = apps.get_model('bookmarks', 'BookmarkInstance')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('tagging', 'TaggedItem')
+    content_type = ContentType.objects.filter(
+        app_label='bookmarks',
+        model='bookmarkinstance',
+    ).first()
+
+    duplicates = (
+        BookmarkInstance.objects
+        .values('user', 'bookmark')
+        .annotate(first=Min('pk'), count=Count('pk'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        removed = BookmarkInstance.objects.filter(
+            user=duplicate['user'],
+            bookmark=duplicate['bookmark'],
+        ).exclude(pk=duplicate['first'])
+        if content_type is not None:
+            TaggedItem.objects.filter(
+                content_type=content_type,
+                object_id__in=list(removed.values_list('pk', flat=True)),
+            ).delete()
+        removed.delete()
+        Bookmark.objects.filter(pk=duplicate['bookmark']).update(
+            save_count=F('save_count') - (duplicate['count'] - 1),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmarks', '0011_searchqueueentry'),
+        ('contenttypes', '0001_initial'),
+        ('tagging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_instances, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='bookmarkinstance',
+            unique_together=set([('user', 'bookmark')]),
+        ),
+    ]
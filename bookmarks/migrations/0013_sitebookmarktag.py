@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tagging', '0001_initial'),
+        ('sites', '0001_initial'),
+        ('bookmarks', '0012_unique_user_bookmark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteBookmarkTag',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('count', models.IntegerField(default=0)),
+                ('bookmark', models.ForeignKey(related_name='tag_links', to='bookmarks.Bookmark')),
+                ('site', models.ForeignKey(related_name='+', to='sites.Site')),
+                ('tag', models.ForeignKey(related_name='+', to='tagging.Tag')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='sitebookmarktag',
+            unique_together=set([('site', 'tag', 'bookmark')]),
+        ),
+    ]
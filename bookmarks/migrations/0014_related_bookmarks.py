@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0001_initial'),
+        ('bookmarks', '0013_sitebookmarktag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedBookmark',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('score', models.FloatField()),
+                ('computed', models.DateTimeField(default=django.utils.timezone.now, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='instances_changed',
+            field=models.DateTimeField(null=True, editable=False, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='relatedbookmark',
+            name='bookmark',
+            field=models.ForeignKey(related_name='related_links', to='bookmarks.Bookmark'),
+        ),
+        migrations.AddField(
+            model_name='relatedbookmark',
+            name='related',
+            field=models.ForeignKey(related_name='+', to='bookmarks.Bookmark'),
+        ),
+        migrations.AddField(
+            model_name='relatedbookmark',
+            name='site',
+            field=models.ForeignKey(related_name='+', to='sites.Site'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='relatedbookmark',
+            unique_together=set([('site', 'bookmark', 'related')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='relatedbookmark',
+            index_together=set([('site', 'bookmark', 'score')]),
+        ),
+    ]
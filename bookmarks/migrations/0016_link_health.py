@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmarks', '0015_searchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmark',
+            name='final_url',
+            field=models.URLField(max_length=511, verbose_name='final URL', blank=True),
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='link_checked',
+            field=models.DateTimeField(db_index=True, null=True, verbose_name='link checked', blank=True),
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='link_status',
+            field=models.IntegerField(null=True, verbose_name='link status', blank=True),
+        ),
+    ]
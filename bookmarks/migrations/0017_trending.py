@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0001_initial'),
+        ('bookmarks', '0016_link_health'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaveBucket',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('start', models.DateTimeField(db_index=True)),
+                ('hours', models.PositiveSmallIntegerField(default=1)),
+                ('count', models.IntegerField(default=0)),
+                ('bookmark', models.ForeignKey(related_name='save_buckets', to='bookmarks.Bookmark')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingBookmark',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('window', models.CharField(max_length=4, choices=[(b'day', 'day'), (b'week', 'week')])),
+                ('score', models.FloatField()),
+                ('computed', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bookmark', models.ForeignKey(related_name='trending_links', to='bookmarks.Bookmark')),
+                ('site', models.ForeignKey(related_name='+', to='sites.Site')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='trendingbookmark',
+            unique_together=set([('site', 'window', 'bookmark')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='trendingbookmark',
+            index_together=set([('site', 'window', 'score')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='savebucket',
+            unique_together=set([('bookmark', 'start', 'hours')]),
+        ),
+    ]
@@ -1,13 +1,19 @@
+import datetime
 import urlparse
+from collections import Counter
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
+from django.db.models import F
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from tagging.fields import TagField
-from tagging.models import Tag
+from tagging.models import Tag, TaggedItem
+
+from bookmarks.utils import canonicalize_url, hash_url, truncate_day, truncate_hour
 
 """
 A Bookmark is unique to a URL whereas a BookmarkInstance represents a
@@ -28,23 +34,116 @@ class LiveBookmarkManager(models.Manager):
         current_site = Site.objects.get_current()
         return super(LiveBookmarkManager, self).get_queryset().filter(sites=current_site)
 
+    def get_by_url(self, url):
+        """
+        Return the bookmark for `url` on the current site using the indexed
+        URL hash rather than comparing the full URL.
+        """
+        current_site = Site.objects.get_current()
+        try:
+            site_bookmark = SiteBookmark.objects.select_related('bookmark').get(
+                site=current_site,
+                url_hash=hash_url(url),
+            )
+        except SiteBookmark.DoesNotExist:
+            raise Bookmark.DoesNotExist
+        return site_bookmark.bookmark
+
+    def tagged(self, tags, match_any=False):
+        """
+        Return the bookmarks on the current site tagged with all of `tags`
+        (names or `Tag` objects), or with any of them if `match_any`.
+
+        Resolved against the `SiteBookmarkTag` index, one indexed join per
+        tag for "all" and a single semi-join for "any", so the result can
+        be paginated by cursor like `Bookmark.on_site.all()`.
+        """
+        current_site = Site.objects.get_current()
+        names = set(tag.name if isinstance(tag, Tag) else tag for tag in tags)
+        tag_ids = list(Tag.objects.filter(name__in=names).values_list('pk', flat=True))
+        queryset = super(LiveBookmarkManager, self).get_queryset()
+        if not tag_ids or (not match_any and len(tag_ids) < len(names)):
+            return queryset.none()
+
+        if match_any:
+            links = SiteBookmarkTag.objects.filter(site=current_site, tag__in=tag_ids)
+            return queryset.filter(pk__in=links.values('bookmark_id'))
+        for tag_id in tag_ids:
+            queryset = queryset.filter(tag_links__site=current_site, tag_links__tag=tag_id)
+        return queryset
+
+    def tags_with_counts(self, bookmarks):
+        """
+        Return `{bookmark_id: [(tag, count), ...]}` for `bookmarks` (objects
+        or ids), counting the instances on the current site, most used tags
+        first. This is `Bookmark.all_tags_with_counts` for a whole page of
+        bookmarks in two queries.
+        """
+        bookmark_ids = [getattr(bookmark, 'pk', bookmark) for bookmark in bookmarks]
+        instances = BookmarkInstance.on_site.filter(bookmark__in=bookmark_ids)
+        bookmark_by_instance = dict(instances.values_list('pk', 'bookmark_id'))
+
+        tagged_items = TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(BookmarkInstance),
+            object_id__in=bookmark_by_instance.keys(),
+        ).values_list('object_id', 'tag_id', 'tag__name')
+
+        tags = {}
+        counts = dict((bookmark_id, Counter()) for bookmark_id in bookmark_ids)
+        for instance_id, tag_id, name in tagged_items:
+            tags.setdefault(tag_id, Tag(pk=tag_id, name=name))
+            counts[bookmark_by_instance[instance_id]][tag_id] += 1
+
+        return dict(
+            (bookmark_id, sorted(
+                ((tags[tag_id], count) for tag_id, count in tag_counts.items()),
+                key=lambda tag_count: (-tag_count[1], tag_count[0].name),
+            ))
+            for bookmark_id, tag_counts in counts.items()
+        )
+
 
 class Bookmark(models.Model):
     url = models.URLField(max_length=511)
+    # Canonicalizing can lengthen a URL, e.g. from http to https.
+    canonical_url = models.URLField(max_length=1024, editable=False)
+    url_hash = models.CharField(max_length=40, db_index=True, editable=False)
     description = models.TextField(_('description'))
     note = models.TextField(_('note'), blank=True)
 
     has_favicon = models.BooleanField(_('has favicon'), default=False)
-    favicon_checked = models.DateTimeField(_('favicon checked'), default=timezone.now)
+    favicon_checked = models.DateTimeField(_('favicon checked'), null=True, blank=True)
+
+    # Set by the `check_links` command. `link_status` is the HTTP status of
+    # the final response, or LINK_UNREACHABLE when no response was received.
+    link_status = models.IntegerField(_('link status'), null=True, blank=True)
+    link_checked = models.DateTimeField(_('link checked'), null=True, blank=True, db_index=True)
+    final_url = models.URLField(_('final URL'), max_length=511, blank=True)
 
     adder = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="added_bookmarks", verbose_name=_('adder'))
     added = models.DateTimeField(_('added'), default=timezone.now)
+    updated = models.DateTimeField(_('updated'), auto_now=True, db_index=True)
+
+    # Number of instances, maintained by the receivers in `bookmarks.receivers`.
+    save_count = models.IntegerField(_('save count'), default=0, editable=False)
+    # Last time an instance was saved, deleted or retagged, for incremental
+    # jobs such as `refresh_related_bookmarks`.
+    instances_changed = models.DateTimeField(null=True, db_index=True, editable=False)
 
     sites = models.ManyToManyField(Site)
 
     objects = models.Manager()  # The default manager.
     on_site = LiveBookmarkManager()
 
+    LINK_UNREACHABLE = 0
+
+    @property
+    def link_ok(self):
+        """Whether the URL resolved when last checked, None if never checked."""
+        if self.link_status is None:
+            return None
+        return 200 <= self.link_status < 400
+
     def get_favicon_url(self, force=False):
         """
         return the URL of the favicon (if it exists) for the site this
@@ -79,20 +178,32 @@ class Bookmark(models.Model):
         return self.url
 
     def save(self, force_insert=False, force_update=False, *args, **kwargs):
+        self.canonical_url = canonicalize_url(self.url)
+        url_hash = hash_url(self.canonical_url)
+        url_changed = self.pk is not None and url_hash != self.url_hash
+        self.url_hash = url_hash
         super(Bookmark, self).save(force_insert, force_update, *args, **kwargs)
+        if url_changed:
+            self.site_links.update(url_hash=url_hash)
         if not self.sites:
             current_site = Site.objects.get_current()
             self.sites.add(current_site)
 
     class Meta:
         ordering = ('-added',)
+        index_together = (
+            ('added', 'id'),
+            ('save_count', 'id'),
+        )
 
 
 # Manager for bookmark instances only returns those that belong to current site.
+# Uses the denormalised `SiteBookmarkInstance` rows, which are unique per site
+# and instance, so no join to `Bookmark` or DISTINCT is needed.
 class LiveBookmarkInstanceManager(models.Manager):
     def get_queryset(self):
         current_site = Site.objects.get_current()
-        return super(LiveBookmarkInstanceManager, self).get_queryset().filter(bookmark__sites=current_site).distinct()
+        return super(LiveBookmarkInstanceManager, self).get_queryset().filter(site_links__site=current_site)
 
 
 class BookmarkInstance(models.Model):
@@ -110,25 +221,502 @@ class BookmarkInstance(models.Model):
 
     def get_or_create_bookmark(self, url):
         try:
-            bookmark = Bookmark.on_site.get(url=url)
+            bookmark = Bookmark.on_site.get_by_url(url)
         except Bookmark.DoesNotExist:
-            # has_favicon=False is temporary as the view for adding bookmarks will change it
-            bookmark = Bookmark(
-                url=url,
-                description=self.description,
-                note=self.note,
-                has_favicon=False,
-                adder=self.user,
-            )
-            bookmark.save()
-            bookmark.sites.add(Site.objects.get_current())
+            bookmark = self.create_bookmark(url)
+        return bookmark
+
+    def create_bookmark(self, url):
+        """
+        Insert a bookmark for `url` on the current site, or return the one a
+        concurrent request inserted first.
+        """
+        current_site = Site.objects.get_current()
+        # has_favicon=False until the check_favicons command probes it
+        bookmark = Bookmark(
+            url=url,
+            description=self.description,
+            note=self.note,
+            has_favicon=False,
+            adder=self.user,
+        )
+        try:
+            with transaction.atomic():
+                bookmark.save()
+                # Claim the URL on the site before linking it: the unique
+                # (site, url_hash) index makes the loser of a race fail here.
+                # A new bookmark has no instances yet, so there is nothing
+                # for the `Bookmark.sites` receivers to update.
+                SiteBookmark.objects.create(
+                    site=current_site,
+                    bookmark=bookmark,
+                    url_hash=bookmark.url_hash,
+                )
+                Bookmark.sites.through.objects.create(site=current_site, bookmark=bookmark)
+        except IntegrityError:
+            bookmark = Bookmark.on_site.get_by_url(url)
         return bookmark
 
     def delete(self):
         bookmark = self.bookmark
         super(BookmarkInstance, self).delete()
-        if bookmark.saved_instances.all().count() == 0:
+        save_count = Bookmark.objects.filter(pk=bookmark.pk).values_list('save_count', flat=True)
+        if save_count.first() == 0:
             bookmark.delete()
 
     def __unicode__(self):
         return _("%(bookmark)s for %(user)s") % {'bookmark':self.bookmark, 'user':self.user}
+
+    class Meta:
+        unique_together = ('user', 'bookmark')
+        index_together = ('user', 'saved', 'id')
+
+
+class SiteBookmark(models.Model):
+    """
+    Denormalised copy of `Bookmark.sites` carrying the bookmark's URL hash.
+
+    A URL is unique per site, which makes "the bookmark for this URL on this
+    site" a single lookup on a unique index. Rows are kept in sync with
+    `Bookmark.sites` by the receivers in `bookmarks.receivers`.
+    """
+    site = models.ForeignKey(Site, related_name='+')
+    bookmark = models.ForeignKey(Bookmark, related_name='site_links')
+    url_hash = models.CharField(max_length=40)
+
+    class Meta:
+        unique_together = (
+            ('site', 'url_hash'),
+            ('site', 'bookmark'),
+        )
+
+
+class SiteTagCountManager(models.Manager):
+    def adjust(self, site_ids, tag_ids, delta):
+        """Add `delta` to the count of each tag on each site."""
+        for site_id in site_ids:
+            for tag_id in tag_ids:
+                counts = self.filter(site_id=site_id, tag_id=tag_id)
+                if counts.update(count=F('count') + delta) or delta < 0:
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(site_id=site_id, tag_id=tag_id, count=delta)
+                except IntegrityError:
+                    # Created concurrently; fall back to the update.
+                    counts.update(count=F('count') + delta)
+
+    def rebuild(self, site):
+        """Recount the tags of every bookmark instance on `site`."""
+        instances = BookmarkInstance.objects.filter(site_links__site=site)
+        tags = Tag.objects.usage_for_queryset(instances, counts=True)
+        with transaction.atomic():
+            self.filter(site=site).delete()
+            self.bulk_create(
+                SiteTagCount(site=site, tag=tag, count=tag.count)
+                for tag in tags
+            )
+
+    def for_site(self, site, limit=None):
+        """
+        Return the tags used on `site` most used first, each annotated with
+        its `count` like `Tag.objects.usage_for_queryset` does.
+        """
+        counts = self.filter(site=site, count__gt=0).select_related('tag')
+        counts = counts.order_by('-count')
+        if limit:
+            counts = counts[:limit]
+        tags = []
+        for tag_count in counts:
+            tag = tag_count.tag
+            tag.count = tag_count.count
+            tags.append(tag)
+        return tags
+
+
+class SiteTagCount(models.Model):
+    """
+    Number of bookmark instances on a site carrying a tag.
+
+    Maintained incrementally by the receivers in `bookmarks.receivers` and
+    rebuilt from scratch by the `rebuild_tag_counts` command.
+    """
+    site = models.ForeignKey(Site, related_name='+')
+    tag = models.ForeignKey(Tag, related_name='+')
+    count = models.IntegerField(default=0)
+
+    objects = SiteTagCountManager()
+
+    class Meta:
+        unique_together = ('site', 'tag')
+        index_together = ('site', 'count')
+
+
+class SiteBookmarkTagManager(models.Manager):
+    def adjust(self, site_ids, bookmark_id, tag_ids, delta):
+        """
+        Add `delta` to the number of instances of the bookmark tagged with
+        each tag on each site, removing the rows that drop to zero.
+        """
+        for site_id in site_ids:
+            for tag_id in tag_ids:
+                links = self.filter(site_id=site_id, bookmark_id=bookmark_id, tag_id=tag_id)
+                if delta < 0:
+                    links.update(count=F('count') + delta)
+                    links.filter(count__lte=0).delete()
+                    continue
+                if links.update(count=F('count') + delta):
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(site_id=site_id, bookmark_id=bookmark_id, tag_id=tag_id, count=delta)
+                except IntegrityError:
+                    # Created concurrently; fall back to the update.
+                    links.update(count=F('count') + delta)
+
+    def add_many(self, counts):
+        """
+        Add each `{(site_id, bookmark_id, tag_id): count}` of new instances in
+        a fixed number of queries.
+        """
+        if not counts:
+            return
+        existing = self.filter(
+            site_id__in=set(site_id for site_id, bookmark_id, tag_id in counts),
+            bookmark_id__in=set(bookmark_id for site_id, bookmark_id, tag_id in counts),
+            tag_id__in=set(tag_id for site_id, bookmark_id, tag_id in counts),
+        )
+        existing = dict(
+            ((site_id, bookmark_id, tag_id), pk)
+            for pk, site_id, bookmark_id, tag_id
+            in existing.values_list('pk', 'site_id', 'bookmark_id', 'tag_id')
+        )
+        by_delta = {}
+        for key, pk in existing.items():
+            if key in counts:
+                by_delta.setdefault(counts[key], []).append(pk)
+        for delta, pks in by_delta.items():
+            self.filter(pk__in=pks).update(count=F('count') + delta)
+
+        missing = dict((key, count) for key, count in counts.items() if key not in existing)
+        try:
+            with transaction.atomic():
+                self.bulk_create(
+                    SiteBookmarkTag(site_id=site_id, bookmark_id=bookmark_id, tag_id=tag_id, count=count)
+                    for (site_id, bookmark_id, tag_id), count in missing.items()
+                )
+        except IntegrityError:
+            # Some were created concurrently; add them one by one.
+            for (site_id, bookmark_id, tag_id), count in missing.items():
+                self.adjust([site_id], bookmark_id, [tag_id], count)
+
+    def rebuild(self, site, batch_size=1000):
+        """Recount the tagged instances of every bookmark on `site`."""
+        content_type = ContentType.objects.get_for_model(BookmarkInstance)
+        bookmarks = Bookmark.objects.filter(sites=site).order_by('pk')
+        with transaction.atomic():
+            self.filter(site=site).delete()
+            last_pk = 0
+            while True:
+                bookmark_ids = list(bookmarks.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+                if not bookmark_ids:
+                    break
+                instances = BookmarkInstance.objects.filter(site_links__site=site, bookmark__in=bookmark_ids)
+                bookmark_by_instance = dict(instances.values_list('pk', 'bookmark_id'))
+                tagged_items = TaggedItem.objects.filter(
+                    content_type=content_type,
+                    object_id__in=bookmark_by_instance.keys(),
+                ).values_list('object_id', 'tag_id')
+                counts = Counter(
+                    (bookmark_by_instance[instance_id], tag_id)
+                    for instance_id, tag_id in tagged_items
+                )
+                self.bulk_create(
+                    SiteBookmarkTag(site=site, bookmark_id=bookmark_id, tag_id=tag_id, count=count)
+                    for (bookmark_id, tag_id), count in counts.items()
+                )
+                last_pk = bookmark_ids[-1]
+
+
+class SiteBookmarkTag(models.Model):
+    """
+    Number of instances of a bookmark on a site carrying a tag.
+
+    A compact, indexed replacement for joining bookmarks to the generic
+    `TaggedItem` rows of their instances, used to browse bookmarks by tag.
+    Maintained by the receivers in `bookmarks.receivers` and rebuilt by the
+    `rebuild_tag_counts` command. Rows are deleted when their count drops to
+    zero.
+    """
+    site = models.ForeignKey(Site, related_name='+')
+    tag = models.ForeignKey(Tag, related_name='+')
+    bookmark = models.ForeignKey(Bookmark, related_name='tag_links')
+    count = models.IntegerField(default=0)
+
+    objects = SiteBookmarkTagManager()
+
+    class Meta:
+        unique_together = ('site', 'tag', 'bookmark')
+
+
+class SiteBookmarkInstance(models.Model):
+    """
+    Denormalised copy of the sites of each instance's bookmark.
+
+    Kept in sync with `Bookmark.sites` and `BookmarkInstance.bookmark` by the
+    receivers in `bookmarks.receivers`.
+    """
+    site = models.ForeignKey(Site, related_name='+')
+    instance = models.ForeignKey(BookmarkInstance, related_name='site_links')
+
+    class Meta:
+        unique_together = ('site', 'instance')
+
+
+class SearchQueueManager(models.Manager):
+    def enqueue(self, bookmark_ids, action):
+        """
+        Queue `action` for each of `bookmark_ids`, replacing any entry already
+        pending for the same bookmark so repeated changes are indexed once.
+        """
+        bookmark_ids = set(bookmark_ids)
+        if not bookmark_ids:
+            return
+        now = timezone.now()
+        entries = self.filter(bookmark_id__in=bookmark_ids)
+        queued = set(entries.values_list('bookmark_id', flat=True))
+        entries.update(action=action, queued=now)
+        missing = bookmark_ids - queued
+        try:
+            with transaction.atomic():
+                self.bulk_create(
+                    self.model(bookmark_id=bookmark_id, action=action, queued=now)
+                    for bookmark_id in missing
+                )
+        except IntegrityError:
+            # Some were queued concurrently; fall back to one at a time.
+            for bookmark_id in missing:
+                entries = self.filter(bookmark_id=bookmark_id)
+                if entries.update(action=action, queued=now):
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(bookmark_id=bookmark_id, action=action, queued=now)
+                except IntegrityError:
+                    entries.update(action=action, queued=now)
+
+
+class SearchQueueEntry(models.Model):
+    """
+    A bookmark waiting to be updated in or removed from the search index.
+
+    Filled by `bookmarks.signal_processors.QueuedSignalProcessor` and
+    emptied by the `process_search_queue` command.
+    """
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (UPDATE, _('update')),
+        (DELETE, _('delete')),
+    )
+
+    # Not a foreign key: deleted bookmarks stay queued for removal.
+    bookmark_id = models.PositiveIntegerField(unique=True)
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    queued = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = SearchQueueManager()
+
+
+class RelatedBookmarkManager(models.Manager):
+    def for_bookmark(self, bookmark, limit=None):
+        """
+        Return the bookmarks most similar to `bookmark` on the current site,
+        best first, each annotated with its similarity `score`.
+        """
+        related = self.filter(
+            site=Site.objects.get_current(),
+            bookmark=bookmark,
+        ).select_related('related').order_by('-score')
+        if limit:
+            related = related[:limit]
+        bookmarks = []
+        for link in related:
+            link.related.score = link.score
+            bookmarks.append(link.related)
+        return bookmarks
+
+
+class RelatedBookmark(models.Model):
+    """
+    One of the most similar bookmarks to a bookmark on a site.
+
+    Computed from shared tags and savers by `bookmarks.related` and stored
+    so that a "related bookmarks" panel is a single indexed lookup.
+    """
+    site = models.ForeignKey(Site, related_name='+')
+    bookmark = models.ForeignKey(Bookmark, related_name='related_links')
+    related = models.ForeignKey(Bookmark, related_name='+')
+    score = models.FloatField()
+    computed = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = RelatedBookmarkManager()
+
+    class Meta:
+        unique_together = ('site', 'bookmark', 'related')
+        index_together = ('site', 'bookmark', 'score')
+
+
+class SearchTerm(models.Model):
+    """
+    A word of a bookmark's description, URL, note or tags, weighted by where
+    and how often it occurs. The inverted index of `bookmarks.search`.
+    """
+    term = models.CharField(max_length=64)
+    bookmark = models.ForeignKey(Bookmark, related_name='search_terms')
+    weight = models.IntegerField()
+
+    class Meta:
+        unique_together = ('term', 'bookmark')
+
+
+class SaveBucketManager(models.Manager):
+    def is_retained(self, saved):
+        return saved >= timezone.now() - SaveBucket.RETENTION
+
+    def adjust(self, bookmark_id, saved, delta):
+        """
+        Add `delta` to the saves of the bookmark in the bucket of `saved`:
+        its hour, or its day once the hours have been compacted.
+        """
+        if not self.is_retained(saved):
+            return
+        hourly = self.filter(bookmark_id=bookmark_id, start=truncate_hour(saved), hours=1)
+        if hourly.update(count=F('count') + delta):
+            return
+        if truncate_day(saved) < truncate_day(timezone.now() - SaveBucket.HOURLY):
+            daily = self.filter(bookmark_id=bookmark_id, start=truncate_day(saved), hours=24)
+            if daily.update(count=F('count') + delta):
+                return
+        if delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(bookmark_id=bookmark_id, start=truncate_hour(saved), hours=1, count=delta)
+        except IntegrityError:
+            # Created concurrently; fall back to the update.
+            hourly.update(count=F('count') + delta)
+
+    def add_many(self, counts, hours=1, new=False):
+        """
+        Add each `{(bookmark_id, start): count}` to the buckets of `hours`
+        hours starting at `start`, in a fixed number of queries. With `new`,
+        the bookmarks are known to have no buckets yet.
+        """
+        counts = dict(
+            (key, count) for key, count in counts.items()
+            if self.is_retained(key[1])
+        )
+        if not counts:
+            return
+        if new:
+            self.bulk_create(
+                SaveBucket(bookmark_id=bookmark_id, start=start, hours=hours, count=count)
+                for (bookmark_id, start), count in counts.items()
+            )
+            return
+        existing = self.filter(
+            bookmark_id__in=set(bookmark_id for bookmark_id, start in counts),
+            start__in=set(start for bookmark_id, start in counts),
+            hours=hours,
+        )
+        existing = dict(
+            ((bookmark_id, start), pk)
+            for pk, bookmark_id, start in existing.values_list('pk', 'bookmark_id', 'start')
+        )
+        by_delta = {}
+        for key, pk in existing.items():
+            if key in counts:
+                by_delta.setdefault(counts[key], []).append(pk)
+        for delta, pks in by_delta.items():
+            self.filter(pk__in=pks).update(count=F('count') + delta)
+
+        missing = dict((key, count) for key, count in counts.items() if key not in existing)
+        try:
+            with transaction.atomic():
+                self.bulk_create(
+                    SaveBucket(bookmark_id=bookmark_id, start=start, hours=hours, count=count)
+                    for (bookmark_id, start), count in missing.items()
+                )
+        except IntegrityError:
+            # Some were created concurrently; add them one by one.
+            for (bookmark_id, start), count in missing.items():
+                buckets = self.filter(bookmark_id=bookmark_id, start=start, hours=hours)
+                if not buckets.update(count=F('count') + count):
+                    self.create(bookmark_id=bookmark_id, start=start, hours=hours, count=count)
+
+
+class SaveBucket(models.Model):
+    """
+    Number of instances of a bookmark saved in an hour, or in a day once
+    `bookmarks.trending.compact_buckets` has merged the hours of the day.
+
+    Maintained by the receivers in `bookmarks.receivers` for the saves of
+    the last `RETENTION`, the longest trending window and a day to spare.
+    Hourly buckets are compacted once their day is more than `HOURLY` ago.
+    """
+    RETENTION = datetime.timedelta(days=8)
+    HOURLY = datetime.timedelta(days=1)
+
+    bookmark = models.ForeignKey(Bookmark, related_name='save_buckets')
+    start = models.DateTimeField(db_index=True)
+    hours = models.PositiveSmallIntegerField(default=1)
+    count = models.IntegerField(default=0)
+
+    objects = SaveBucketManager()
+
+    class Meta:
+        unique_together = ('bookmark', 'start', 'hours')
+
+
+class TrendingBookmarkManager(models.Manager):
+    def for_site(self, site, window, limit=None):
+        """
+        Return the trending bookmarks on `site` over `window`, best first,
+        each annotated with its `trending_score`, in one query.
+        """
+        trending = self.filter(site=site, window=window).select_related('bookmark')
+        trending = trending.order_by('-score', 'bookmark_id')
+        if limit:
+            trending = trending[:limit]
+        bookmarks = []
+        for link in trending:
+            link.bookmark.trending_score = link.score
+            bookmarks.append(link.bookmark)
+        return bookmarks
+
+
+class TrendingBookmark(models.Model):
+    """
+    One of the most saved bookmarks on a site recently, with its score
+    decayed over a window. Computed from the `SaveBucket` rows by
+    `bookmarks.trending`.
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    WINDOW_CHOICES = (
+        (DAY, _('day')),
+        (WEEK, _('week')),
+    )
+
+    site = models.ForeignKey(Site, related_name='+')
+    window = models.CharField(max_length=4, choices=WINDOW_CHOICES)
+    bookmark = models.ForeignKey(Bookmark, related_name='trending_links')
+    score = models.FloatField()
+    computed = models.DateTimeField(default=timezone.now)
+
+    objects = TrendingBookmarkManager()
+
+    class Meta:
+        unique_together = ('site', 'window', 'bookmark')
+        index_together = ('site', 'window', 'score')
@@ -0,0 +1,92 @@
+import base64
+
+from django.db.models import DateTimeField, Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(value, pk):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    value = u'{}|{}'.format(value, pk)
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, parse=parse_datetime):
+    """Return the `(value, pk)` of `cursor`, converting value with `parse`."""
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        value, pk = value.rsplit('|', 1)
+        value = parse(value)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if value is None:
+        raise InvalidCursor(cursor)
+    return value, pk
+
+
+def cursor_parser(model, field):
+    """Return the function converting cursor values of `model.field`."""
+    if isinstance(model._meta.get_field(field), DateTimeField):
+        return parse_datetime
+    return int
+
+
+class CursorPage(object):
+    """
+    A page of a queryset ordered descending on `(field, pk)`.
+
+    `next_cursor` is the opaque value to request the following page with,
+    or None on the last page.
+    """
+    def __init__(self, object_list, field, has_next):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.next_cursor = None
+        if has_next:
+            last = object_list[-1]
+            self.next_cursor = encode_cursor(getattr(last, field), last.pk)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_by_cursor(queryset, field, cursor=None, per_page=20):
+    """
+    Return the `CursorPage` of `queryset` following `cursor`.
+
+    Rows are ordered by `-field, -pk` and the page is selected with a
+    `WHERE (field, pk) < cursor` condition rather than an OFFSET, so every
+    page costs the same index range scan however deep it is.
+    """
+    queryset = queryset.order_by('-' + field, '-pk')
+    if cursor:
+        value, pk = decode_cursor(cursor, cursor_parser(queryset.model, field))
+        queryset = queryset.filter(
+            Q(**{field + '__lt': value}) |
+            Q(**{field: value, 'pk__lt': pk})
+        )
+    object_list = list(queryset[:per_page + 1])
+    has_next = len(object_list) > per_page
+    return CursorPage(object_list[:per_page], field, has_next)
+
+
+def paginate_request(request, queryset, field, per_page):
+    """`paginate_by_cursor` using the `cursor` GET parameter of `request`."""
+    try:
+        return paginate_by_cursor(
+            queryset,
+            field,
+            cursor=request.GET.get('cursor'),
+            per_page=per_page,
+        )
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
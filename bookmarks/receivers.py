@@ -0,0 +1,330 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from tagging.models import Tag
+
+from bookmarks import cache, search
+from bookmarks.models import (
+    Bookmark, BookmarkInstance, SaveBucket, SiteBookmark, SiteBookmarkInstance,
+    SiteBookmarkTag, SiteTagCount,
+)
+
+
+def link_sites(links):
+    """
+    Create a `SiteBookmark` for each `(site_id, bookmark_id, url_hash)`.
+
+    A site keeps the first bookmark linked for a given URL hash; later
+    duplicates are left to the merge tooling rather than failing the save.
+    """
+    for site_id, bookmark_id, url_hash in links:
+        try:
+            with transaction.atomic():
+                SiteBookmark.objects.get_or_create(
+                    site_id=site_id,
+                    bookmark_id=bookmark_id,
+                    defaults={'url_hash': url_hash},
+                )
+        except IntegrityError:
+            pass
+
+
+def bookmark_site_ids(bookmark_id):
+    sites = Bookmark.sites.through.objects.filter(bookmark_id=bookmark_id)
+    return list(sites.values_list('site_id', flat=True))
+
+
+def instance_site_ids(instance):
+    """
+    `bookmark_site_ids` for the bookmark of `instance`, fetched once per save
+    or delete however many receivers need it.
+    """
+    site_ids = getattr(instance, '_site_ids', None)
+    if site_ids is None or site_ids[0] != instance.bookmark_id:
+        site_ids = (instance.bookmark_id, bookmark_site_ids(instance.bookmark_id))
+        instance._site_ids = site_ids
+    return site_ids[1]
+
+
+def instance_tag_ids(instance):
+    return set(Tag.objects.get_for_object(instance).values_list('pk', flat=True))
+
+
+def adjust_bookmark_tag_counts(bookmark_ids, site_ids, delta):
+    """Count the tags of every instance of `bookmark_ids` on `site_ids`."""
+    instances = BookmarkInstance.objects.filter(bookmark__in=bookmark_ids)
+    for instance in instances:
+        tag_ids = instance_tag_ids(instance)
+        SiteTagCount.objects.adjust(site_ids, tag_ids, delta)
+        SiteBookmarkTag.objects.adjust(site_ids, instance.bookmark_id, tag_ids, delta)
+
+
+@receiver(m2m_changed, sender=Bookmark.sites.through)
+def sync_site_bookmarks(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            bookmarks = Bookmark.objects.filter(pk__in=pk_set)
+            links = [
+                (instance.pk, bookmark_id, url_hash)
+                for bookmark_id, url_hash in bookmarks.values_list('pk', 'url_hash')
+            ]
+        else:
+            links = [(site_id, instance.pk, instance.url_hash) for site_id in pk_set]
+        link_sites(links)
+
+    elif action == 'post_remove':
+        if reverse:
+            links = SiteBookmark.objects.filter(site=instance, bookmark__in=pk_set)
+        else:
+            links = SiteBookmark.objects.filter(bookmark=instance, site__in=pk_set)
+        links.delete()
+
+    elif action == 'post_clear':
+        if reverse:
+            SiteBookmark.objects.filter(site=instance).delete()
+        else:
+            SiteBookmark.objects.filter(bookmark=instance).delete()
+
+
+@receiver(m2m_changed, sender=Bookmark.sites.through)
+def touch_bookmarks(sender, instance, action, reverse, pk_set, **kwargs):
+    """Mark bookmarks as updated when their sites change, for reindexing."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        if action == 'pre_clear':
+            bookmarks = Bookmark.objects.filter(sites=instance)
+        else:
+            bookmarks = Bookmark.objects.filter(pk__in=pk_set)
+    else:
+        bookmarks = Bookmark.objects.filter(pk=instance.pk)
+    bookmarks.update(updated=timezone.now())
+
+
+@receiver(m2m_changed, sender=Bookmark.sites.through)
+def sync_site_tag_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_clear', 'pre_remove'):
+        # Only uncount the links that exist: `pk_set` holds every id passed
+        # to `remove()`, linked or not.
+        if reverse:
+            links = Bookmark.sites.through.objects.filter(site=instance)
+            linked = set(links.values_list('bookmark_id', flat=True))
+        else:
+            linked = set(bookmark_site_ids(instance.pk))
+        pk_set = linked if action == 'pre_clear' else linked & set(pk_set)
+    elif action != 'pre_add':
+        return
+
+    if not pk_set:
+        return
+    delta = 1 if action == 'pre_add' else -1
+    if reverse:
+        adjust_bookmark_tag_counts(pk_set, [instance.pk], delta)
+    else:
+        adjust_bookmark_tag_counts([instance.pk], pk_set, delta)
+
+
+def link_instance_sites(instances, site_ids):
+    """Create a `SiteBookmarkInstance` for each of `instances` on `site_ids`."""
+    SiteBookmarkInstance.objects.bulk_create(
+        SiteBookmarkInstance(site_id=site_id, instance_id=instance_id)
+        for instance_id in instances
+        for site_id in site_ids
+    )
+
+
+@receiver(m2m_changed, sender=Bookmark.sites.through)
+def sync_site_instances(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            instances = BookmarkInstance.objects.filter(bookmark__in=pk_set)
+            site_ids = [instance.pk]
+        else:
+            instances = BookmarkInstance.objects.filter(bookmark=instance)
+            site_ids = pk_set
+        link_instance_sites(instances.values_list('pk', flat=True), site_ids)
+
+    elif action == 'post_remove':
+        if reverse:
+            links = SiteBookmarkInstance.objects.filter(
+                site=instance,
+                instance__bookmark__in=pk_set,
+            )
+        else:
+            links = SiteBookmarkInstance.objects.filter(
+                instance__bookmark=instance,
+                site__in=pk_set,
+            )
+        links.delete()
+
+    elif action == 'post_clear':
+        if reverse:
+            SiteBookmarkInstance.objects.filter(site=instance).delete()
+        else:
+            SiteBookmarkInstance.objects.filter(instance__bookmark=instance).delete()
+
+
+def adjust_save_count(bookmark_id, delta):
+    bookmark = Bookmark.objects.filter(pk=bookmark_id)
+    bookmark.update(save_count=F('save_count') + delta, instances_changed=timezone.now())
+
+
+@receiver(pre_save, sender=BookmarkInstance)
+@receiver(pre_delete, sender=BookmarkInstance)
+def reset_instance_site_ids(sender, instance, **kwargs):
+    # Connected before the other instance receivers, so they share the sites
+    # looked up during this save or delete only.
+    instance._site_ids = None
+
+
+@receiver(post_init, sender=BookmarkInstance)
+def store_loaded_bookmark(sender, instance, **kwargs):
+    instance._loaded_bookmark_id = instance.bookmark_id
+
+
+@receiver(post_save, sender=BookmarkInstance)
+def sync_instance_sites(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        if instance.bookmark_id == instance._loaded_bookmark_id:
+            return
+        instance.site_links.all().delete()
+        adjust_save_count(instance._loaded_bookmark_id, -1)
+    adjust_save_count(instance.bookmark_id, 1)
+    link_instance_sites([instance.pk], instance_site_ids(instance))
+    instance._loaded_bookmark_id = instance.bookmark_id
+
+
+@receiver(pre_save, sender=BookmarkInstance)
+def store_previous_tags(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._previous_tag_ids = set()
+    else:
+        instance._previous_tag_ids = instance_tag_ids(instance)
+    instance._previous_bookmark_id = instance._loaded_bookmark_id
+
+
+@receiver(post_save, sender=BookmarkInstance)
+def update_tag_counts(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_tag_ids = getattr(instance, '_previous_tag_ids', set())
+    previous_bookmark_id = getattr(instance, '_previous_bookmark_id', instance.bookmark_id)
+    tag_ids = instance_tag_ids(instance)
+    moved = not created and previous_bookmark_id != instance.bookmark_id
+    instance._retagged_bookmark_ids = []
+    if moved:
+        if previous_tag_ids or tag_ids:
+            instance._retagged_bookmark_ids = [previous_bookmark_id, instance.bookmark_id]
+        # The tag index rows follow the instance to its new bookmark.
+        SiteBookmarkTag.objects.adjust(
+            bookmark_site_ids(previous_bookmark_id),
+            previous_bookmark_id,
+            previous_tag_ids,
+            -1,
+        )
+        SiteBookmarkTag.objects.adjust(instance_site_ids(instance), instance.bookmark_id, tag_ids, 1)
+
+    added = tag_ids - previous_tag_ids
+    removed = previous_tag_ids - tag_ids
+    if not (added or removed):
+        return
+    site_ids = instance_site_ids(instance)
+    SiteTagCount.objects.adjust(site_ids, added, 1)
+    SiteTagCount.objects.adjust(site_ids, removed, -1)
+    if not moved:
+        instance._retagged_bookmark_ids = [instance.bookmark_id]
+        SiteBookmarkTag.objects.adjust(site_ids, instance.bookmark_id, added, 1)
+        SiteBookmarkTag.objects.adjust(site_ids, instance.bookmark_id, removed, -1)
+        if not created:
+            # New and moved instances already marked it in `sync_instance_sites`.
+            bookmark = Bookmark.objects.filter(pk=instance.bookmark_id)
+            bookmark.update(instances_changed=timezone.now())
+
+
+@receiver(pre_delete, sender=BookmarkInstance)
+def decrement_save_count(sender, instance, **kwargs):
+    adjust_save_count(instance.bookmark_id, -1)
+
+
+@receiver(post_save, sender=BookmarkInstance)
+def count_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_bookmark_id = getattr(instance, '_previous_bookmark_id', instance.bookmark_id)
+    if created:
+        SaveBucket.objects.adjust(instance.bookmark_id, instance.saved, 1)
+    elif previous_bookmark_id != instance.bookmark_id:
+        SaveBucket.objects.adjust(previous_bookmark_id, instance.saved, -1)
+        SaveBucket.objects.adjust(instance.bookmark_id, instance.saved, 1)
+
+
+@receiver(pre_delete, sender=BookmarkInstance)
+def uncount_save(sender, instance, **kwargs):
+    SaveBucket.objects.adjust(instance.bookmark_id, instance.saved, -1)
+
+
+@receiver(pre_delete, sender=BookmarkInstance)
+def remove_tag_counts(sender, instance, **kwargs):
+    site_ids = instance_site_ids(instance)
+    tag_ids = instance_tag_ids(instance)
+    SiteTagCount.objects.adjust(site_ids, tag_ids, -1)
+    SiteBookmarkTag.objects.adjust(site_ids, instance.bookmark_id, tag_ids, -1)
+    instance._deleted_tag_ids = tag_ids
+
+
+@receiver(post_save, sender=Bookmark)
+def bump_bookmark_cache(sender, instance, created, raw=False, **kwargs):
+    # New bookmarks are not on any site yet; linking them bumps the sites.
+    if not (raw or created):
+        cache.bump_sites(bookmark_site_ids(instance.pk))
+
+
+@receiver(pre_delete, sender=Bookmark)
+def bump_deleted_bookmark_cache(sender, instance, **kwargs):
+    cache.bump_sites(bookmark_site_ids(instance.pk))
+
+
+@receiver(post_save, sender=BookmarkInstance)
+@receiver(pre_delete, sender=BookmarkInstance)
+def bump_instance_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cache.bump_sites(instance_site_ids(instance))
+    cache.bump_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Bookmark.sites.through)
+def bump_sites_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        cache.bump_sites([instance.pk])
+    elif action == 'pre_clear':
+        cache.bump_sites(bookmark_site_ids(instance.pk))
+    else:
+        cache.bump_sites(pk_set)
+
+
+@receiver(post_save, sender=Bookmark)
+def index_bookmark(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        search.index_bookmarks([instance.pk], new=created)
+
+
+@receiver(post_save, sender=BookmarkInstance)
+def index_retagged_bookmarks(sender, instance, raw=False, **kwargs):
+    bookmark_ids = getattr(instance, '_retagged_bookmark_ids', None)
+    if bookmark_ids and not raw:
+        search.index_bookmarks(bookmark_ids)
+
+
+@receiver(post_delete, sender=BookmarkInstance)
+def index_untagged_bookmark(sender, instance, **kwargs):
+    if getattr(instance, '_deleted_tag_ids', None):
+        search.index_bookmarks([instance.bookmark_id])
@@ -0,0 +1,210 @@
+import heapq
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from bookmarks.models import Bookmark, BookmarkInstance, RelatedBookmark, SiteBookmarkTag
+
+"""
+Precompute the most similar bookmarks of each bookmark on a site.
+
+Bookmarks are compared by weighted Jaccard similarity of their features:
+every tag weighs the number of instances of the bookmark carrying it (from
+the `SiteBookmarkTag` index) and every user who saved the bookmark weighs
+`USER_WEIGHT`. For two feature vectors `a` and `b`:
+
+    sum(min(a, b)) / sum(max(a, b)) = overlap / (total(a) + total(b) - overlap)
+
+Bookmarks are processed in batches. For each batch the features are looked
+up, then the posting lists (the bookmarks sharing each feature) are fetched
+and the overlaps accumulated sparsely, so only bookmarks sharing at least
+one feature are ever scored. Features shared by more than `max_postings`
+bookmarks (the tags and users that relate everything to everything) are
+skipped when looking for candidates. Only the `top_k` best scores are kept.
+"""
+
+BATCH_SIZE = 500
+TOP_K = 10
+MAX_POSTINGS = 1000
+USER_WEIGHT = 1.0
+
+# Keeps IN clauses below the parameter limits of the database backends.
+CHUNK_SIZE = 500
+
+
+def chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def site_instances(site):
+    return BookmarkInstance.objects.filter(site_links__site=site)
+
+
+def tag_features(site, bookmark_ids):
+    """Return `{bookmark_id: {tag_id: count}}`."""
+    features = defaultdict(dict)
+    for ids in chunks(bookmark_ids):
+        links = SiteBookmarkTag.objects.filter(site=site, bookmark__in=ids)
+        for bookmark_id, tag_id, count in links.values_list('bookmark_id', 'tag_id', 'count'):
+            features[bookmark_id][tag_id] = count
+    return features
+
+
+def user_features(site, bookmark_ids):
+    """Return `{bookmark_id: set(user_id)}`."""
+    features = defaultdict(set)
+    for ids in chunks(bookmark_ids):
+        instances = site_instances(site).filter(bookmark__in=ids)
+        for bookmark_id, user_id in instances.values_list('bookmark_id', 'user_id'):
+            features[bookmark_id].add(user_id)
+    return features
+
+
+def common(counts, max_postings):
+    return set(key for key, count in counts if count > max_postings)
+
+
+def tag_postings(site, tag_ids, max_postings):
+    """Return `{tag_id: [(bookmark_id, count)]}`, skipping the common tags."""
+    postings = defaultdict(list)
+    for ids in chunks(tag_ids):
+        links = SiteBookmarkTag.objects.filter(site=site, tag__in=ids)
+        skip = common(links.values_list('tag').annotate(Count('id')), max_postings)
+        links = links.exclude(tag__in=skip)
+        for tag_id, bookmark_id, count in links.values_list('tag_id', 'bookmark_id', 'count'):
+            postings[tag_id].append((bookmark_id, count))
+    return postings
+
+
+def user_postings(site, user_ids, max_postings):
+    """Return `{user_id: [bookmark_id]}`, skipping the most prolific users."""
+    postings = defaultdict(list)
+    for ids in chunks(user_ids):
+        instances = site_instances(site).filter(user__in=ids)
+        skip = common(instances.values_list('user').annotate(Count('id')), max_postings)
+        instances = instances.exclude(user__in=skip)
+        for user_id, bookmark_id in instances.values_list('user_id', 'bookmark_id'):
+            postings[user_id].append(bookmark_id)
+    return postings
+
+
+def feature_totals(site, bookmark_ids):
+    """Return `{bookmark_id: total weight}` of all the features of each bookmark."""
+    totals = defaultdict(float)
+    for ids in chunks(bookmark_ids):
+        links = SiteBookmarkTag.objects.filter(site=site, bookmark__in=ids)
+        for bookmark_id, count in links.values_list('bookmark').annotate(Sum('count')):
+            totals[bookmark_id] += count
+        instances = site_instances(site).filter(bookmark__in=ids)
+        for bookmark_id, count in instances.values_list('bookmark').annotate(Count('id')):
+            totals[bookmark_id] += count * USER_WEIGHT
+    return totals
+
+
+def similar_bookmarks(site, bookmark_ids, top_k=TOP_K, max_postings=MAX_POSTINGS):
+    """Return `{bookmark_id: [(score, related_id)]}`, best first."""
+    tags = tag_features(site, bookmark_ids)
+    users = user_features(site, bookmark_ids)
+    tag_lists = tag_postings(
+        site, set(tag_id for features in tags.values() for tag_id in features), max_postings)
+    user_lists = user_postings(
+        site, set(user_id for features in users.values() for user_id in features), max_postings)
+
+    overlaps = {}
+    for bookmark_id in bookmark_ids:
+        overlap = defaultdict(float)
+        for tag_id, count in tags[bookmark_id].items():
+            for other_id, other_count in tag_lists.get(tag_id, ()):
+                overlap[other_id] += min(count, other_count)
+        for user_id in users[bookmark_id]:
+            for other_id in user_lists.get(user_id, ()):
+                overlap[other_id] += USER_WEIGHT
+        overlap.pop(bookmark_id, None)
+        overlaps[bookmark_id] = overlap
+
+    totals = feature_totals(site, set(bookmark_ids).union(*overlaps.values()))
+    similar = {}
+    for bookmark_id, overlap in overlaps.items():
+        total = totals[bookmark_id]
+        scores = (
+            (shared / (total + totals[other_id] - shared), other_id)
+            for other_id, shared in overlap.items()
+        )
+        similar[bookmark_id] = heapq.nlargest(top_k, scores)
+    return similar
+
+
+def store_related(site, similar, computed):
+    """Replace the related bookmarks of each bookmark of `similar`."""
+    with transaction.atomic():
+        for ids in chunks(similar):
+            RelatedBookmark.objects.filter(site=site, bookmark__in=ids).delete()
+        RelatedBookmark.objects.bulk_create(
+            RelatedBookmark(
+                site=site,
+                bookmark_id=bookmark_id,
+                related_id=related_id,
+                score=score,
+                computed=computed,
+            )
+            for bookmark_id, scores in similar.items()
+            for score, related_id in scores
+        )
+
+
+def changed_bookmark_ids(site, since):
+    """
+    The bookmarks whose instances changed since `since`, and the bookmarks
+    listing them as related, whose scores may have changed too.
+    """
+    changed = Bookmark.objects.filter(sites=site, instances_changed__gte=since)
+    changed = set(changed.values_list('pk', flat=True))
+    referrers = set()
+    for ids in chunks(changed):
+        links = RelatedBookmark.objects.filter(site=site, related__in=ids)
+        referrers.update(links.values_list('bookmark_id', flat=True))
+    return changed | referrers
+
+
+def last_refreshed(site):
+    computed = RelatedBookmark.objects.filter(site=site).aggregate(Max('computed'))
+    return computed['computed__max']
+
+
+def refresh_related(site, full=False, batch_size=BATCH_SIZE, top_k=TOP_K,
+                    max_postings=MAX_POSTINGS, progress=None):
+    """
+    Recompute the related bookmarks on `site`: of every bookmark if `full`
+    or if it was never computed, else only of the bookmarks affected by
+    instance changes since the last run. Returns the number of bookmarks
+    refreshed.
+
+    An incremental run does not add a changed bookmark to the lists of
+    bookmarks it did not appear in before; a periodic full run does.
+    """
+    computed = timezone.now()
+    since = None if full else last_refreshed(site)
+    if since is None:
+        bookmark_ids = Bookmark.objects.filter(sites=site).order_by('pk')
+        bookmark_ids = list(bookmark_ids.values_list('pk', flat=True))
+        stale = RelatedBookmark.objects.filter(site=site, computed__lt=computed)
+    else:
+        bookmark_ids = sorted(changed_bookmark_ids(site, since))
+        stale = None
+
+    refreshed = 0
+    for ids in chunks(bookmark_ids, batch_size):
+        similar = similar_bookmarks(site, ids, top_k=top_k, max_postings=max_postings)
+        store_related(site, similar, computed)
+        refreshed += len(ids)
+        if progress is not None:
+            progress(refreshed)
+
+    if stale is not None:
+        # Bookmarks removed from the site since the last full run.
+        stale.delete()
+    return refreshed
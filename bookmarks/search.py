@@ -0,0 +1,156 @@
+import re
+import urlparse
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, Value, When
+
+from bookmarks.models import Bookmark, SearchTerm, SiteBookmarkTag
+
+"""
+Full-text search of bookmarks without an external search backend.
+
+Every bookmark's description, URL, note and tags are split into terms
+stored in the `SearchTerm` table with a weight depending on the field and
+the number of occurrences. The receivers in `bookmarks.receivers` reindex
+a bookmark when it or the tags of its instances change.
+
+A query matches the bookmarks having, for every word of the query, a term
+starting with it. Prefixes are matched with a range on the indexed `term`
+column, which any database can resolve from the index. Results are ranked
+by the summed weights of the matched terms, exact matches counting double.
+
+For queries of several words, the rarest word is found by counting its
+matches up to `CANDIDATE_LIMIT`, and only the bookmarks it matches are
+ranked, so a rare word keeps a query fast however common the others are.
+"""
+
+FIELD_WEIGHTS = {
+    'description': 3,
+    'tags': 3,
+    'url': 2,
+    'note': 1,
+}
+EXACT_BOOST = 2
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+# Multi-word queries are evaluated over the bookmarks matching the rarest
+# word when it matches fewer terms than this.
+CANDIDATE_LIMIT = 1000
+# Sorts after any character, closing the range of terms with a prefix.
+PREFIX_END = u'\uffff'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Return the lower-cased words of `text` long enough to be indexed."""
+    return [
+        word[:MAX_TERM_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+        if len(word) >= MIN_TERM_LENGTH
+    ]
+
+
+def url_text(url):
+    # The scheme is in every URL, so it would match everything.
+    scheme, netloc, path, query, fragment = urlparse.urlsplit(url)
+    return u' '.join((netloc, path, query))
+
+
+def bookmark_terms(bookmark, tag_names):
+    """Return the `{term: weight}` of `bookmark` tagged with `tag_names`."""
+    terms = Counter()
+    fields = (
+        ('description', bookmark.description),
+        ('url', url_text(bookmark.url)),
+        ('note', bookmark.note),
+        ('tags', u' '.join(tag_names)),
+    )
+    for field, text in fields:
+        for term in tokenize(text):
+            terms[term] += FIELD_WEIGHTS[field]
+    return terms
+
+
+def index_bookmarks(bookmark_ids, new=False):
+    """
+    Replace the search terms of `bookmark_ids`. With `new`, the bookmarks
+    are known to have neither terms nor tagged instances yet.
+    """
+    bookmark_ids = list(bookmark_ids)
+    bookmarks = Bookmark.objects.filter(pk__in=bookmark_ids).only('url', 'description', 'note')
+    tags = {}
+    if not new:
+        links = SiteBookmarkTag.objects.filter(bookmark__in=bookmark_ids)
+        for bookmark_id, name in links.values_list('bookmark_id', 'tag__name').distinct():
+            tags.setdefault(bookmark_id, []).append(name)
+
+    # No savepoint: a failure aborts the caller's transaction anyway.
+    with transaction.atomic(savepoint=False):
+        if not new:
+            SearchTerm.objects.filter(bookmark__in=bookmark_ids).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, bookmark_id=bookmark.pk, weight=weight)
+            for bookmark in bookmarks
+            for term, weight in bookmark_terms(bookmark, tags.get(bookmark.pk, [])).items()
+        )
+
+
+def search(query, site=None, limit=20, offset=0):
+    """
+    Return the bookmarks (on `site` if given) matching every word of
+    `query`, best first, each annotated with its `rank`.
+    """
+    words = []
+    for word in tokenize(query):
+        if word not in words:
+            words.append(word)
+    words = words[:MAX_QUERY_TERMS]
+    if not words:
+        return []
+
+    terms = SearchTerm.objects.all()
+    if site is not None:
+        terms = terms.filter(bookmark__site_links__site=site)
+
+    word_matches = [Q(term__gte=word, term__lt=word + PREFIX_END) for word in words]
+    if len(words) > 1:
+        counts = [
+            (SearchTerm.objects.filter(match)[:CANDIDATE_LIMIT].count(), index)
+            for index, match in enumerate(word_matches)
+        ]
+        count, rarest = min(counts)
+        if count < CANDIDATE_LIMIT:
+            candidates = SearchTerm.objects.filter(word_matches[rarest])
+            terms = terms.filter(bookmark__in=list(candidates.values_list('bookmark_id', flat=True)))
+
+    match_any = Q()
+    matches = {}
+    for index, match in enumerate(word_matches):
+        match_any |= match
+        matches['match_{}'.format(index)] = Max(Case(
+            When(match, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    rank = Sum(Case(
+        When(term__in=words, then=F('weight') * EXACT_BOOST),
+        default=F('weight'),
+        output_field=IntegerField(),
+    ))
+
+    results = terms.filter(match_any).values('bookmark_id').annotate(rank=rank, **matches)
+    results = results.filter(**dict((name, 1) for name in matches))
+    results = results.order_by('-rank', '-bookmark_id')[offset:offset + limit]
+    ranks = [(result['bookmark_id'], result['rank']) for result in results]
+
+    bookmarks = Bookmark.objects.in_bulk([bookmark_id for bookmark_id, rank in ranks])
+    found = []
+    for bookmark_id, rank in ranks:
+        bookmark = bookmarks.get(bookmark_id)
+        if bookmark is not None:
+            bookmark.rank = rank
+            found.append(bookmark)
+    return found
@@ -12,8 +12,17 @@ class BookmarkIndex(SearchIndex, Indexable):
     sites = CharField(model_attr='site_slugs')
 
     def index_queryset(self, using=None):
-        """Used when the entire index for model is updated."""
-        return self.get_model().objects.all()
+        """Used when the entire index for model is updated.
+
+        Haystack slices this queryset into batches ordered by primary key, so
+        the related rows used by `author` and `site_slugs` are fetched once
+        per batch rather than once per bookmark.
+        """
+        return self.get_model().objects.select_related('adder').prefetch_related('sites__ghtsite')
+
+    def get_updated_field(self):
+        """Lets `update_index --age` only reindex recently changed bookmarks."""
+        return 'updated'
 
     def get_model(self):
         return Bookmark
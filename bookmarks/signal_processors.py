@@ -0,0 +1,79 @@
+from django.db.models import signals
+from django.utils import timezone
+from haystack import connection_router, connections
+from haystack.signals import BaseSignalProcessor
+
+from bookmarks.models import Bookmark, SearchQueueEntry
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Queue bookmark index updates instead of sending them to the search
+    backend during the request.
+
+    Enable with `HAYSTACK_SIGNAL_PROCESSOR` and run the `process_search_queue`
+    command to send the queued changes in batches.
+    """
+    def setup(self):
+        signals.post_save.connect(self.enqueue_save, sender=Bookmark)
+        signals.post_delete.connect(self.enqueue_delete, sender=Bookmark)
+        signals.m2m_changed.connect(self.enqueue_sites, sender=Bookmark.sites.through)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.enqueue_save, sender=Bookmark)
+        signals.post_delete.disconnect(self.enqueue_delete, sender=Bookmark)
+        signals.m2m_changed.disconnect(self.enqueue_sites, sender=Bookmark.sites.through)
+
+    def enqueue_save(self, sender, instance, **kwargs):
+        SearchQueueEntry.objects.enqueue([instance.pk], SearchQueueEntry.UPDATE)
+
+    def enqueue_delete(self, sender, instance, **kwargs):
+        SearchQueueEntry.objects.enqueue([instance.pk], SearchQueueEntry.DELETE)
+
+    def enqueue_sites(self, sender, instance, action, reverse, pk_set, **kwargs):
+        if action not in ('post_add', 'post_remove', 'pre_clear'):
+            return
+        if not reverse:
+            bookmark_ids = [instance.pk]
+        elif action == 'pre_clear':
+            bookmark_ids = Bookmark.objects.filter(sites=instance).values_list('pk', flat=True)
+        else:
+            bookmark_ids = pk_set
+        SearchQueueEntry.objects.enqueue(bookmark_ids, SearchQueueEntry.UPDATE)
+
+
+def process_queue(batch_size=500):
+    """
+    Send up to `batch_size` queued changes to every search backend and
+    return the number processed.
+    """
+    started = timezone.now()
+    entries = list(
+        SearchQueueEntry.objects
+        .filter(queued__lte=started)
+        .order_by('queued')[:batch_size]
+    )
+    if not entries:
+        return 0
+
+    update_ids = set(e.bookmark_id for e in entries if e.action == SearchQueueEntry.UPDATE)
+    delete_ids = set(e.bookmark_id for e in entries) - update_ids
+
+    for using in connection_router.for_write():
+        connection = connections[using]
+        index = connection.get_unified_index().get_index(Bookmark)
+        backend = connection.get_backend()
+        bookmarks = list(index.index_queryset(using=using).filter(pk__in=update_ids))
+        if bookmarks:
+            backend.update(index, bookmarks)
+        # Bookmarks deleted since they were queued for an update are removed too.
+        missing_ids = update_ids - set(bookmark.pk for bookmark in bookmarks)
+        for bookmark_id in delete_ids | missing_ids:
+            backend.remove('bookmarks.bookmark.{}'.format(bookmark_id))
+
+    # Entries queued again while this batch was processed stay for the next.
+    SearchQueueEntry.objects.filter(
+        pk__in=[entry.pk for entry in entries],
+        queued__lte=started,
+    ).delete()
+    return len(entries)
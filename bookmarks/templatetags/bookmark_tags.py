@@ -1,11 +1,62 @@
 from django import template
-from bookmarks.models import BookmarkInstance
-from tagging.models import Tag
+from django.contrib.sites.models import Site
+
+from bookmarks import cache
+from bookmarks.instrumentation import instrument
+from bookmarks.models import RelatedBookmark, SiteTagCount
 
 register = template.Library()
 
 @register.inclusion_tag('bookmarks/tags.html')
-def show_bookmarks_tags():
+def show_bookmarks_tags(limit=None):
     """ Show a box with tags for all articles that belong to current site.
+
+    Reads the precomputed `SiteTagCount` rows, optionally keeping only the
+    `limit` most used tags.
+    """
+    return {'bookmark_tags': site_tags(limit)}
+
+
+@instrument('show_bookmarks_tags', size=len)
+def site_tags(limit=None):
+    current_site = Site.objects.get_current()
+    return cache.cached(
+        ('show_bookmarks_tags', limit),
+        lambda: SiteTagCount.objects.for_site(current_site, limit),
+        site=current_site,
+    )
+
+
+@register.filter
+def saved_by(bookmark, saved_bookmark_ids):
+    """ Whether `bookmark` is in the `saved_bookmark_ids` set of the view.
+
+    Usage: {% if bookmark|saved_by:saved_bookmark_ids %}
+    """
+    return getattr(bookmark, 'pk', bookmark) in saved_bookmark_ids
+
+
+@register.assignment_tag
+def bookmarks_cache_version(user=None):
+    """ Version string of the bookmarks of the current site (and `user`).
+
+    It changes whenever those bookmarks change, so it can be used to vary
+    fragment caches:
+
+        {% bookmarks_cache_version request.user as version %}
+        {% cache 600 bookmark_list version %}...{% endcache %}
+    """
+    version = cache.get_generation('site', Site.objects.get_current().pk)
+    if user is not None and user.is_authenticated():
+        version = '{}.{}'.format(version, cache.get_generation('user', user.pk))
+    return version
+
+
+@register.assignment_tag
+def related_bookmarks(bookmark, limit=5):
+    """ The bookmarks most similar to `bookmark`, as computed by the
+    `refresh_related_bookmarks` command, each with its `score`.
+
+    Usage: {% related_bookmarks bookmark 5 as related %}
     """
-    return {'bookmark_tags': Tag.objects.usage_for_queryset(queryset=BookmarkInstance.on_site.all(), counts=True, min_count=1)}
\ No newline at end of file
+    return RelatedBookmark.objects.for_bookmark(bookmark, limit)
@@ -12,6 +12,7 @@ class UserFactory(factory.DjangoModelFactory):
 
 
 class BookmarkFactory(factory.DjangoModelFactory):
+    url = factory.Sequence('http://example.com/{}'.format)
     adder = factory.SubFactory(UserFactory)
 
     class Meta:
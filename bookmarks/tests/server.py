@@ -0,0 +1,64 @@
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubServerMixin(object):
+    """
+    Run a local HTTP server for the duration of each test.
+
+    `responses` maps `(host, path)`, or `(method, host, path)` for a
+    response to one method only, to `(status, headers)`; other requests get
+    a 404. Requests received are recorded in `self.requests`.
+    """
+    responses = {}
+
+    def setUp(self):
+        super(StubServerMixin, self).setUp()
+        requests = self.requests = []
+        responses = self.responses
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def respond(self, body):
+                host = self.headers.get('host', '').split(':')[0]
+                requests.append((self.command, host, self.path))
+                status, headers = responses.get(
+                    (self.command, host, self.path),
+                    responses.get((host, self.path), (404, {})),
+                )
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value.format(port=self.server.server_port))
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                if body:
+                    self.wfile.write(b'ok')
+
+            def do_GET(self):
+                self.respond(body=True)
+
+            def do_HEAD(self):
+                self.respond(body=False)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = StubServer(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_port
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(StubServerMixin, self).tearDown()
+
+    def url(self, host, path='/'):
+        return 'http://{}:{}{}'.format(host, self.port, path)
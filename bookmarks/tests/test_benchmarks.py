@@ -0,0 +1,56 @@
+from django.contrib.sites.models import Site
+from django.test import TestCase
+
+from bookmarks import cache
+from bookmarks.benchmarks import benchmark_index, benchmark_size, generate_data, measure
+from bookmarks.models import Bookmark, BookmarkInstance, SiteTagCount
+
+
+class TestGenerateData(TestCase):
+    def test_generate_data(self):
+        users = generate_data(50, user_count=5, url_count=20, tag_count=10, site_count=2)
+
+        self.assertEqual(len(users), 5)
+        self.assertEqual(BookmarkInstance.objects.count(), 50)
+        self.assertEqual(Bookmark.on_site.count(), Bookmark.objects.count())
+        extra_site = Site.objects.get(domain='bench-1.example.com')
+        self.assertTrue(Bookmark.objects.filter(sites=extra_site).exists())
+        self.assertTrue(SiteTagCount.objects.exists())
+
+    def test_save_counts(self):
+        generate_data(30, user_count=3, url_count=15)
+
+        for bookmark in Bookmark.objects.all():
+            self.assertEqual(bookmark.save_count, bookmark.saved_instances.count())
+
+
+class TestBenchmarkSize(TestCase):
+    def test_benchmark_size(self):
+        results = benchmark_size(40, repeat=2)
+
+        self.assertEqual(
+            set(results) - {'index'},
+            {
+                'bookmarks', 'bookmarks_popular', 'your_bookmarks', 'add', 'add_quick', 'add_batch',
+                'delete', 'show_bookmarks_tags',
+            },
+        )
+        self.assertIn('queries', results['bookmarks'])
+        # The generated data is rolled back.
+        self.assertFalse(BookmarkInstance.objects.exists())
+
+    def test_index_skipped(self):
+        # The test project has no ghtsite app for the index to read slugs from.
+        self.assertIsNone(benchmark_index(repeat=1))
+
+
+class TestMeasure(TestCase):
+    def test_keeps_project_cache(self):
+        cache.get_cache().set('unrelated', 1)
+        seen = []
+
+        results = measure(lambda: seen.append(cache.get_cache().get('unrelated')), repeat=2)
+
+        self.assertEqual(seen, [None, None])
+        self.assertEqual(results['queries'], 0)
+        self.assertEqual(cache.get_cache().get('unrelated'), 1)
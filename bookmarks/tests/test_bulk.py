@@ -0,0 +1,170 @@
+from django.contrib.sites.models import Site
+from django.test import TestCase, override_settings
+from tagging.models import Tag
+
+from .. import bulk, search
+from ..bulk import (
+    ADDED, DUPLICATE, EXISTS, INVALID, QUEUED_SIGNAL_PROCESSOR, add_bookmark,
+    add_bookmarks,
+)
+from ..models import (
+    Bookmark, BookmarkInstance, SearchQueueEntry, SiteBookmarkTag, SiteTagCount,
+)
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
+
+
+class TestAddBookmarks(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.user = UserFactory.create()
+
+    def test_add(self):
+        results = add_bookmarks(self.user, [
+            {'url': 'http://example.com/', 'description': 'Example', 'tags': 'one two'},
+            {'url': 'not a url'},
+            {'url': 'HTTP://EXAMPLE.COM'},
+        ])
+
+        self.assertEqual([result['status'] for result in results], [ADDED, INVALID, DUPLICATE])
+        instance = BookmarkInstance.on_site.get(pk=results[0]['instance'])
+        self.assertEqual(instance.user, self.user)
+        self.assertEqual(instance.description, 'Example')
+        self.assertEqual(instance.bookmark.save_count, 1)
+        self.assertEqual(Bookmark.on_site.get_by_url('http://example.com/'), instance.bookmark)
+        self.assertEqual(sorted(tag.name for tag in Tag.objects.get_for_object(instance)), ['one', 'two'])
+        counts = SiteTagCount.objects.for_site(self.site)
+        self.assertEqual(sorted((tag.name, tag.count) for tag in counts), [('one', 1), ('two', 1)])
+
+    def test_too_long(self):
+        url = 'https://example.com/'
+        http_url = 'http://example.com/'
+        results = add_bookmarks(self.user, [
+            {'url': url + 'a' * (511 - len(url))},
+            {'url': url + 'b' * (512 - len(url))},
+            # Longer once canonicalized to https, which is fine.
+            {'url': http_url + 'c' * (511 - len(http_url))},
+            {'url': url, 'tags': 'a' * 51},
+            {'url': url, 'tags': ' '.join('tag{:02}'.format(i) for i in range(50))},
+            {'url': url, 'tags': 'a' * 50},
+        ])
+
+        self.assertEqual(
+            [result['status'] for result in results],
+            [ADDED, INVALID, ADDED, INVALID, INVALID, ADDED],
+        )
+
+    def test_existing_bookmark(self):
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(self.site)
+        saved = BookmarkInstanceFactory.create(user=self.user)
+        saved.bookmark.sites.add(self.site)
+
+        results = add_bookmarks(self.user, [
+            {'url': bookmark.url},
+            {'url': saved.bookmark.url},
+        ])
+
+        self.assertEqual([result['status'] for result in results], [ADDED, EXISTS])
+        self.assertEqual(Bookmark.objects.count(), 2)
+        self.assertEqual(BookmarkInstance.objects.get(pk=results[0]['instance']).bookmark, bookmark)
+
+    def test_tag_index(self):
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(self.site)
+        BookmarkInstanceFactory.create(bookmark=bookmark, tags='one')
+
+        add_bookmarks(self.user, [{'url': bookmark.url, 'tags': 'one two'}])
+
+        links = SiteBookmarkTag.objects.filter(site=self.site, bookmark=bookmark)
+        self.assertEqual(sorted(links.values_list('tag__name', 'count')), [('one', 2), ('two', 1)])
+
+    def test_add_bookmark(self):
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(self.site)
+        BookmarkInstanceFactory.create(bookmark=bookmark, tags='one')
+
+        result = add_bookmark(self.user, {'url': bookmark.url, 'tags': 'one two'})
+
+        self.assertEqual(result['status'], ADDED)
+        instance = BookmarkInstance.on_site.get(pk=result['instance'])
+        self.assertEqual((instance.user, instance.bookmark), (self.user, bookmark))
+        self.assertEqual(Bookmark.objects.get(pk=bookmark.pk).save_count, 2)
+        links = SiteBookmarkTag.objects.filter(site=self.site, bookmark=bookmark)
+        self.assertEqual(sorted(links.values_list('tag__name', 'count')), [('one', 2), ('two', 1)])
+        self.assertEqual(add_bookmark(self.user, {'url': bookmark.url})['status'], EXISTS)
+        self.assertEqual(add_bookmark(self.user, {'url': 'nope'})['status'], INVALID)
+
+    def test_add_bookmark_new(self):
+        result = add_bookmark(self.user, {'url': 'http://example.com/', 'description': 'Example'})
+
+        self.assertEqual(result['status'], ADDED)
+        bookmark = Bookmark.on_site.get_by_url('http://example.com/')
+        self.assertEqual(bookmark.save_count, 1)
+        self.assertIsNotNone(bookmark.instances_changed)
+        self.assertEqual(BookmarkInstance.on_site.get(pk=result['instance']).bookmark, bookmark)
+        self.assertEqual([found.pk for found in search.search('example')], [bookmark.pk])
+
+    @override_settings(HAYSTACK_SIGNAL_PROCESSOR=QUEUED_SIGNAL_PROCESSOR)
+    def test_search_queue(self):
+        tagged = BookmarkFactory.create()
+        untagged = BookmarkFactory.create()
+        self.site.bookmark_set.add(tagged, untagged)
+        SearchQueueEntry.objects.all().delete()
+
+        results = add_bookmarks(self.user, [
+            {'url': 'http://example.com/'},
+            {'url': tagged.url, 'tags': 'one'},
+            {'url': untagged.url},
+        ])
+
+        created = BookmarkInstance.objects.get(pk=results[0]['instance']).bookmark
+        entries = SearchQueueEntry.objects.values_list('bookmark_id', 'action')
+        self.assertEqual(
+            sorted(entries),
+            sorted([(created.pk, SearchQueueEntry.UPDATE), (tagged.pk, SearchQueueEntry.UPDATE)]),
+        )
+
+    def test_search_queue_disabled(self):
+        add_bookmarks(self.user, [{'url': 'http://example.com/', 'tags': 'one'}])
+
+        self.assertFalse(SearchQueueEntry.objects.exists())
+
+    def stale_first_lookup(self, name, stale):
+        """Make the first call of the lookup `name` miss, as in a race."""
+        lookup = getattr(bulk, name)
+        calls = []
+
+        def first_stale(*args):
+            calls.append(args)
+            return stale if len(calls) == 1 else lookup(*args)
+        self.addCleanup(setattr, bulk, name, lookup)
+        setattr(bulk, name, first_stale)
+        return calls
+
+    def test_instance_saved_concurrently(self):
+        saved = BookmarkInstanceFactory.create(user=self.user)
+        saved.bookmark.sites.add(self.site)
+        calls = self.stale_first_lookup('saved_bookmark_ids', set())
+
+        results = add_bookmarks(self.user, [
+            {'url': saved.bookmark.url},
+            {'url': 'http://example.com/'},
+        ])
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([result['status'] for result in results], [EXISTS, ADDED])
+        self.assertIsNone(results[0]['instance'])
+        self.assertEqual(BookmarkInstance.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Bookmark.objects.get(pk=saved.bookmark.pk).save_count, 1)
+
+    def test_bookmark_saved_concurrently(self):
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(self.site)
+        calls = self.stale_first_lookup('site_bookmark_ids', {})
+
+        results = add_bookmarks(self.user, [{'url': bookmark.url}])
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results[0]['status'], ADDED)
+        self.assertEqual(Bookmark.objects.count(), 1)
+        self.assertEqual(BookmarkInstance.objects.get(pk=results[0]['instance']).bookmark, bookmark)
@@ -0,0 +1,73 @@
+from django.contrib.sites.models import Site
+from django.test import TestCase
+
+from .. import cache
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
+
+
+class TestCached(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.site = Site.objects.get_current()
+        self.calls = 0
+
+    def build(self):
+        self.calls += 1
+        return self.calls
+
+    def test_cached(self):
+        first = cache.cached('test', self.build, site=self.site)
+        second = cache.cached('test', self.build, site=self.site)
+
+        self.assertEqual((first, second), (1, 1))
+
+    def test_bump_site(self):
+        cache.cached('test', self.build, site=self.site)
+
+        cache.bump_sites([self.site.pk])
+
+        self.assertEqual(cache.cached('test', self.build, site=self.site), 2)
+
+    def test_instance_saved(self):
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(self.site)
+        user = UserFactory.create()
+        cache.cached('test', self.build, site=self.site)
+        cache.cached('test', self.build, user=user)
+
+        BookmarkInstanceFactory.create(bookmark=bookmark, user=user)
+
+        self.assertEqual(cache.cached('test', self.build, site=self.site), 3)
+        self.assertEqual(cache.cached('test', self.build, user=user), 4)
+
+    def test_other_user_unaffected(self):
+        user, other_user = UserFactory.create_batch(2)
+        cache.cached('test', self.build, user=other_user)
+
+        BookmarkInstanceFactory.create(user=user)
+
+        self.assertEqual(cache.cached('test', self.build, user=other_user), 1)
+
+    def test_atomic_bumps_after_commit(self):
+        with cache.atomic():
+            with cache.atomic():
+                cache.bump_sites([self.site.pk])
+            # Bumped again by the outermost block only.
+            cache.cached('test', self.build, site=self.site)
+
+        self.assertEqual(cache.cached('test', self.build, site=self.site), 2)
+
+    def test_atomic_bumps_after_rollback(self):
+        with self.assertRaises(ValueError):
+            with cache.atomic():
+                cache.bump_sites([self.site.pk])
+                cache.cached('test', self.build, site=self.site)
+                raise ValueError
+
+        self.assertEqual(cache.cached('test', self.build, site=self.site), 2)
+
+    def test_atomic_bumps_once(self):
+        with cache.atomic():
+            cache.cached('test', self.build, site=self.site)
+
+        self.assertEqual(cache.cached('test', self.build, site=self.site), 1)
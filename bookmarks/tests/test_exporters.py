@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+
+from django.test import TestCase
+
+from ..exporters import export_csv, export_html, export_json, iter_instances
+from ..importers import parse_netscape
+from ..models import BookmarkInstance
+from .factories import BookmarkInstanceFactory
+
+
+class TestExporters(TestCase):
+    def setUp(self):
+        self.instance = BookmarkInstanceFactory.create(
+            description=u'A <website>',
+            note=u'Note',
+            tags=u'one two',
+        )
+        # Reload so the instance looks like one read by `iter_instances`.
+        self.instances = list(iter_instances(BookmarkInstance.objects.all()))
+
+    def test_iter_instances_chunks(self):
+        BookmarkInstanceFactory.create_batch(2)
+
+        instances = list(iter_instances(BookmarkInstance.objects.all(), chunk_size=2))
+
+        self.assertEqual(instances, list(BookmarkInstance.objects.order_by('pk')))
+
+    def test_html_round_trip(self):
+        html = u''.join(export_html(self.instances)).encode('utf-8')
+
+        entries = list(parse_netscape(io.BytesIO(html)))
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['url'], self.instance.bookmark.url)
+        self.assertEqual(entries[0]['description'], u'A <website>')
+        self.assertEqual(entries[0]['note'], u'Note')
+        self.assertEqual(entries[0]['tags'], [u'one', u'two'])
+
+    def test_json(self):
+        lines = list(export_json(self.instances))
+
+        self.assertEqual(json.loads(lines[0])['url'], self.instance.bookmark.url)
+
+    def test_csv(self):
+        rows = list(csv.reader(export_csv(self.instances)))
+
+        self.assertEqual(rows[0], ['url', 'description', 'note', 'tags', 'saved'])
+        self.assertEqual(rows[1][:4], [self.instance.bookmark.url, 'A <website>', 'Note', 'one two'])
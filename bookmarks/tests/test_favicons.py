@@ -0,0 +1,30 @@
+from django.test import TestCase
+
+from ..favicons import check_favicons
+from ..models import Bookmark
+from .factories import BookmarkFactory
+from .server import StubServerMixin
+
+
+class TestCheckFavicons(StubServerMixin, TestCase):
+    responses = {
+        ('localhost', '/favicon.ico'): (200, {}),
+    }
+
+    def test_check_favicons(self):
+        with_favicon = BookmarkFactory.create_batch(2, url=self.url('localhost', '/page'))
+        without_favicon = BookmarkFactory.create(url=self.url('127.0.0.1', '/page'))
+
+        found = check_favicons(Bookmark.objects.all(), workers=2, timeout=2)
+
+        self.assertEqual(found, 2)
+        for bookmark in with_favicon:
+            bookmark = Bookmark.objects.get(pk=bookmark.pk)
+            self.assertTrue(bookmark.has_favicon)
+            self.assertIsNotNone(bookmark.favicon_checked)
+        self.assertFalse(Bookmark.objects.get(pk=without_favicon.pk).has_favicon)
+        # Each origin is only requested once.
+        self.assertEqual(sorted(self.requests), [
+            ('GET', '127.0.0.1', '/favicon.ico'),
+            ('GET', 'localhost', '/favicon.ico'),
+        ])
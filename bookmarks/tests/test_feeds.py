@@ -0,0 +1,147 @@
+import time
+
+from django.conf.urls import url
+from django.contrib.sites.models import Site
+from django.core.cache import cache as default_cache
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.http import http_date
+
+from .. import cache, views
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
+
+# The project URLconf may not be importable, so serve what the feeds link to.
+urlpatterns = [
+    url(r'^$', views.bookmarks),
+    url(r'^tags/(?P<tags>[^/]+)/$', views.tagged),
+]
+
+
+@override_settings(ROOT_URLCONF='bookmarks.tests.test_feeds')
+class TestFeeds(TestCase):
+    def setUp(self):
+        default_cache.clear()
+        self.site = Site.objects.get_current()
+        self.user = UserFactory.create(username='alice')
+        self.bookmark = BookmarkFactory.create(url='http://example.com/a', description='Example')
+        self.bookmark.sites.add(self.site)
+        self.instance = BookmarkInstanceFactory.create(
+            bookmark=self.bookmark,
+            user=self.user,
+            description='Mine',
+            tags='python web',
+        )
+        self.backdate()
+
+    def backdate(self):
+        """Pretend nothing has changed for an hour."""
+        for scope, pk in (('site', self.site.pk), ('user', self.user.pk)):
+            cache.get_cache().set(cache.changed_key(scope, pk), time.time() - 3600, None)
+
+    def get(self, view, *args, **headers):
+        return view(RequestFactory().get('/', **headers), *args)
+
+    def test_feed(self):
+        response = self.get(views.feed, 'rss')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('application/rss+xml'))
+        self.assertContains(response, '<link>http://example.com/a</link>')
+        self.assertContains(response, '<category>python</category>')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_atom(self):
+        response = self.get(views.feed, 'atom')
+
+        self.assertTrue(response['Content-Type'].startswith('application/atom+xml'))
+        self.assertContains(response, 'href="http://example.com/a"')
+
+    def test_tag_feed(self):
+        other = BookmarkFactory.create(url='http://example.com/b')
+        other.sites.add(self.site)
+        BookmarkInstanceFactory.create(bookmark=other, tags='food')
+
+        response = self.get(views.tag_feed, 'python', 'rss')
+
+        self.assertContains(response, 'http://example.com/a')
+        self.assertNotContains(response, 'http://example.com/b')
+        with self.assertRaises(Http404):
+            self.get(views.tag_feed, 'missing', 'rss')
+
+    def test_user_feed(self):
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, description='Theirs')
+
+        response = self.get(views.user_feed, 'alice', 'rss')
+
+        self.assertContains(response, '<title>Mine</title>')
+        self.assertNotContains(response, 'Theirs')
+        with self.assertRaises(Http404):
+            self.get(views.user_feed, 'bob', 'rss')
+
+    def test_not_modified(self):
+        response = self.get(views.feed, 'rss')
+
+        with self.assertNumQueries(0):
+            not_modified = self.get(views.feed, 'rss', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.get(views.feed, 'rss', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_cached_until_changed(self):
+        response = self.get(views.feed, 'rss')
+        with self.assertNumQueries(0):
+            cached = self.get(views.feed, 'rss')
+        self.assertEqual(cached.content, response.content)
+
+        self.instance.tags = 'python cooking'
+        self.instance.save()
+
+        changed = self.get(views.feed, 'rss', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertContains(changed, '<category>cooking</category>')
+
+    def test_user_feed_changes_with_instances(self):
+        response = self.get(views.user_feed, 'alice', 'rss')
+
+        self.instance.delete()
+
+        changed = self.get(views.user_feed, 'alice', 'rss', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotContains(changed, 'Mine')
+
+    def test_modified_since(self):
+        since = http_date(time.time() - 1800)
+        not_modified = self.get(views.feed, 'rss', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_modified_by_retag(self):
+        since = http_date(time.time() - 1800)
+
+        self.instance.tags = 'python cooking'
+        self.instance.save()
+
+        for view, args in ((views.feed, ('rss',)), (views.user_feed, ('alice', 'rss'))):
+            changed = self.get(view, *args, HTTP_IF_MODIFIED_SINCE=since)
+            self.assertEqual(changed.status_code, 200)
+            self.assertContains(changed, '<category>cooking</category>')
+
+    def test_modified_by_delete(self):
+        since = http_date(time.time() - 1800)
+
+        self.instance.delete()
+
+        for view, args in ((views.feed, ('rss',)), (views.user_feed, ('alice', 'rss'))):
+            changed = self.get(view, *args, HTTP_IF_MODIFIED_SINCE=since)
+            self.assertEqual(changed.status_code, 200)
+            self.assertNotContains(changed, 'Mine')
+
+    def test_not_announced_in_same_second(self):
+        self.instance.tags = 'python cooking'
+        self.instance.save()
+
+        response = self.get(views.feed, 'rss')
+
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
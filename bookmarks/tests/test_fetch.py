@@ -0,0 +1,40 @@
+import threading
+
+from django.test import TestCase
+
+from ..fetch import ConnectionPool
+from .server import StubServerMixin
+
+
+class TestConnectionPool(StubServerMixin, TestCase):
+    responses = {
+        ('localhost', '/ok'): (200, {}),
+    }
+
+    def test_reuses_connection(self):
+        pool = ConnectionPool(timeout=2)
+
+        pool.fetch(self.url('localhost', '/ok'))
+        pool.fetch(self.url('localhost', '/ok'))
+
+        self.assertEqual(len(pool.opened), 1)
+        pool.close()
+
+    def test_close_every_thread(self):
+        pool = ConnectionPool(timeout=2)
+        threads = [
+            threading.Thread(target=pool.fetch, args=(self.url('localhost', '/ok'),))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        connections = list(pool.opened)
+
+        pool.close()
+
+        self.assertEqual(len(connections), 3)
+        self.assertEqual([connection.sock for connection in connections], [None] * 3)
+        self.assertEqual(pool.opened, [])
+        self.assertEqual(pool.connections(), {})
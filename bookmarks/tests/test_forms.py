@@ -1,8 +1,10 @@
+from django.contrib.sites.models import Site
 from django.test import TestCase
 from django.utils import timezone
 
 from ..forms import BookmarkInstanceForm
-from .factories import BookmarkFactory, UserFactory
+from ..models import Bookmark, BookmarkInstance
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
 
 
 class TestBookmarkInstanceForm(TestCase):
@@ -26,3 +28,62 @@ class TestBookmarkInstanceForm(TestCase):
 
         self.assertEqual(instance.bookmark.url, url)
         self.assertEqual(instance.description, description)
+
+    def test_clean_duplicate(self):
+        site = Site.objects.get_current()
+        instance = BookmarkInstanceFactory.create()
+        instance.bookmark.sites.add(site)
+        data = {
+            u'url': instance.bookmark.url.upper(),
+            u'description': u'A website',
+        }
+
+        form = BookmarkInstanceForm(instance.user, data=data)
+
+        self.assertFalse(form.is_valid())
+        self.assertIn(u'You have already bookmarked this link.', form.non_field_errors())
+
+    def test_long_url(self):
+        user = UserFactory.create()
+        url = u'http://example.com/'
+        url += u'a' * (511 - len(url))
+
+        form = BookmarkInstanceForm(user, data={u'url': url, u'description': u'Long'})
+        self.assertTrue(form.is_valid(), form.errors)
+        instance = form.save()
+
+        canonical_url = instance.bookmark.canonical_url
+        self.assertEqual(canonical_url, u'https' + url[4:])
+        self.assertLessEqual(len(canonical_url), Bookmark._meta.get_field('canonical_url').max_length)
+
+        form = BookmarkInstanceForm(user, data={u'url': url + u'a', u'description': u'Too long'})
+        self.assertIn(u'url', form.errors)
+
+    def test_save_query_count(self):
+        site = Site.objects.get_current()
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(site)
+        user = UserFactory.create()
+        data = {u'url': bookmark.url, u'description': u'A website'}
+
+        with self.assertNumQueries(12):
+            form = BookmarkInstanceForm(user, data=data)
+            self.assertTrue(form.is_valid(), form.errors)
+            instance = form.save()
+
+        self.assertEqual(instance.bookmark, bookmark)
+        self.assertEqual(instance.user, user)
+
+
+class TestBookmarkInstanceCreateBookmark(TestCase):
+    def test_concurrent_create(self):
+        """A bookmark created for the URL since it was looked up is reused."""
+        site = Site.objects.get_current()
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(site)
+        instance = BookmarkInstance(user=UserFactory.create(), description=u'A website')
+
+        created = instance.create_bookmark(bookmark.url)
+
+        self.assertEqual(created, bookmark)
+        self.assertEqual(Bookmark.objects.count(), 1)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import io
+
+from django.test import TestCase
+
+from ..importers import ImportFormatError, parse_json, parse_netscape, parse_timestamp
+
+
+NETSCAPE = b"""<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+    <DT><H3>Folder</H3>
+    <DL><p>
+        <DT><A HREF="http://example.com/" ADD_DATE="1136073600" TAGS="one,two">Example &amp; co</A>
+        <DD>A note
+        <DT><A HREF="http://example.org/">Caf\xc3\xa9</A>
+    </DL><p>
+</DL><p>
+"""
+
+
+class TestParseNetscape(TestCase):
+    def test_parse(self):
+        entries = list(parse_netscape(io.BytesIO(NETSCAPE)))
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['url'], 'http://example.com/')
+        self.assertEqual(entries[0]['description'], u'Example & co')
+        self.assertEqual(entries[0]['note'], u'A note')
+        self.assertEqual(entries[0]['tags'], ['one', 'two'])
+        self.assertEqual(entries[0]['saved'].year, 2006)
+        self.assertEqual(entries[1]['description'], u'Caf\xe9')
+        self.assertIsNone(entries[1]['saved'])
+
+
+class TestParseJSON(TestCase):
+    def test_array(self):
+        data = b'[{"url": "http://example.com/", "title": "Example"}, {"url": "http://example.org/"}]'
+
+        entries = list(parse_json(io.BytesIO(data)))
+
+        self.assertEqual([entry['url'] for entry in entries], ['http://example.com/', 'http://example.org/'])
+        self.assertEqual(entries[0]['description'], 'Example')
+
+    def test_lines(self):
+        data = b'{"url": "http://example.com/", "tags": ["a"]}\n{"url": "http://example.org/"}\n'
+
+        entries = list(parse_json(io.BytesIO(data)))
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['tags'], ['a'])
+
+    def test_invalid(self):
+        with self.assertRaises(ImportFormatError):
+            list(parse_json(io.BytesIO(b'[{"url": ')))
+
+
+class TestParseTimestamp(TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_timestamp('1136073600').year, 2006)
+        self.assertEqual(parse_timestamp(u'2020-01-02T03:04:05Z').day, 2)
+        self.assertIsNone(parse_timestamp(''))
+
+    def test_invalid(self):
+        for value in (u'2020-13-45T00:00:00', u'yesterday', ['2020'], {'a': 1}, 10 ** 20):
+            self.assertIsNone(parse_timestamp(value), value)
+
+    def test_invalid_in_file(self):
+        data = b'[{"url": "http://example.com/", "saved": [1]}, {"url": "http://example.org/", "saved": "2020-13-45"}]'
+
+        entries = list(parse_json(io.BytesIO(data)))
+
+        self.assertEqual([entry['saved'] for entry in entries], [None, None])
@@ -0,0 +1,132 @@
+import logging
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+
+from .. import cache
+from ..instrumentation import (
+    HEADER, QueryCounter, get_histograms, instrument, instrument_view, logger,
+    measured, reset_histograms,
+)
+from ..models import Bookmark
+from .factories import BookmarkFactory
+
+collected = []
+
+
+def collect(measurement):
+    collected.append(measurement)
+
+
+@instrument('count_bookmarks', size=len)
+def bookmark_list():
+    return list(Bookmark.objects.all())
+
+
+@instrument_view
+def bookmark_view(request):
+    return HttpResponse(''.join(bookmark.url for bookmark in Bookmark.objects.all()))
+
+
+@override_settings(
+    BOOKMARKS_INSTRUMENTATION=True,
+    BOOKMARKS_INSTRUMENTATION_SINKS=['bookmarks.tests.test_instrumentation.collect'],
+)
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        del collected[:]
+        cache.get_cache().clear()
+        BookmarkFactory.create_batch(3)
+
+    def test_instrument(self):
+        bookmark_list()
+
+        measurement, = collected
+        self.assertEqual(measurement.name, 'count_bookmarks')
+        self.assertEqual(measurement.queries, 1)
+        self.assertEqual(measurement.size, 3)
+        self.assertGreater(measurement.total_ms, 0)
+
+    @override_settings(BOOKMARKS_INSTRUMENTATION=False)
+    def test_disabled(self):
+        bookmark_list()
+
+        self.assertEqual(collected, [])
+
+    def test_instrument_view(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        response = bookmark_view(request)
+
+        measurement, = collected
+        self.assertEqual(measurement.name, 'bookmark_view')
+        self.assertEqual(measurement.size, len(response.content))
+        self.assertNotIn(HEADER, response)
+
+    @override_settings(BOOKMARKS_INSTRUMENTATION_HEADER=True)
+    def test_header(self):
+        response = bookmark_view(RequestFactory().get('/'))
+
+        self.assertIn('queries=1;', response[HEADER])
+
+    @override_settings(BOOKMARKS_SLOW_VIEW_MS=0)
+    def test_slow_log(self):
+        records = []
+        handler = logging.Handler(logging.WARNING)
+        handler.emit = records.append
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        bookmark_list()
+
+        record, = records
+        self.assertTrue(record.getMessage().startswith('Slow count_bookmarks: queries=1;'))
+
+    @override_settings(BOOKMARKS_INSTRUMENTATION_SINKS=['bookmarks.instrumentation.signal_sink'])
+    def test_signal_sink(self):
+        def receiver(sender, measurement, **kwargs):
+            collected.append(measurement)
+        measured.connect(receiver)
+        self.addCleanup(measured.disconnect, receiver)
+
+        bookmark_list()
+
+        self.assertEqual(collected[0].name, 'count_bookmarks')
+
+    @override_settings(BOOKMARKS_INSTRUMENTATION_SINKS=['bookmarks.instrumentation.histogram_sink'])
+    def test_histogram_sink(self):
+        bookmark_list()
+        bookmark_list()
+
+        histograms = get_histograms(['count_bookmarks'])
+        self.assertEqual(histograms['count_bookmarks']['queries'][0], (1, 2))
+        self.assertEqual(sum(count for bound, count in histograms['count_bookmarks']['total_ms']), 2)
+
+        reset_histograms(['count_bookmarks'])
+        self.assertEqual(get_histograms(['count_bookmarks'])['count_bookmarks']['queries'][0], (1, 0))
+
+
+class TestQueryCounter(TestCase):
+    def test_count(self):
+        BookmarkFactory.create()
+        logged = len(connection.queries_log)
+
+        with QueryCounter() as outer:
+            list(Bookmark.objects.all())
+            with QueryCounter() as inner:
+                Bookmark.objects.count()
+                Bookmark.objects.exists()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                self.assertEqual(cursor.fetchone()[0], 1)
+
+        self.assertEqual(inner.count, 2)
+        self.assertEqual(outer.count, 4)
+        self.assertGreater(outer.seconds, 0)
+        # The queries are counted, not logged.
+        self.assertEqual(len(connection.queries_log), logged)
+        self.assertNotIn('make_cursor', vars(connections[DEFAULT_DB_ALIAS]))
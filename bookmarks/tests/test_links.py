@@ -0,0 +1,136 @@
+import time
+
+from django.contrib.sites.models import Site
+from django.test import TestCase
+
+from .. import cache
+from ..links import HostLimiter, check_links, interleave_hosts
+from ..models import Bookmark
+from .factories import BookmarkFactory
+from .server import StubServerMixin
+
+
+class TestCheckLinks(StubServerMixin, TestCase):
+    responses = {
+        ('localhost', '/ok'): (200, {}),
+        ('localhost', '/moved'): (301, {'Location': 'http://localhost:{port}/ok'}),
+        ('HEAD', 'localhost', '/no-head'): (405, {}),
+        ('GET', 'localhost', '/no-head'): (200, {}),
+        ('localhost', '/caf%C3%A9'): (200, {}),
+        ('localhost', '/long'): (301, {'Location': 'http://localhost:{port}/' + 'a' * 600}),
+        ('localhost', '/' + 'a' * 600): (200, {}),
+    }
+
+    def check(self, url):
+        bookmark = BookmarkFactory.create(url=url)
+        check_links(Bookmark.objects.filter(pk=bookmark.pk), workers=2, timeout=2, delay=0)
+        return Bookmark.objects.get(pk=bookmark.pk)
+
+    def test_ok(self):
+        bookmark = self.check(self.url('localhost', '/ok'))
+
+        self.assertEqual(bookmark.link_status, 200)
+        self.assertTrue(bookmark.link_ok)
+        self.assertEqual(bookmark.final_url, '')
+        self.assertIsNotNone(bookmark.link_checked)
+        self.assertEqual(self.requests, [('HEAD', 'localhost', '/ok')])
+
+    def test_redirect(self):
+        bookmark = self.check(self.url('localhost', '/moved'))
+
+        self.assertEqual(bookmark.link_status, 200)
+        self.assertEqual(bookmark.final_url, self.url('localhost', '/ok'))
+
+    def test_get_fallback(self):
+        bookmark = self.check(self.url('localhost', '/no-head'))
+
+        self.assertEqual(bookmark.link_status, 200)
+        self.assertEqual(self.requests, [
+            ('HEAD', 'localhost', '/no-head'),
+            ('GET', 'localhost', '/no-head'),
+        ])
+
+    def test_not_found(self):
+        bookmark = self.check(self.url('localhost', '/gone'))
+
+        self.assertEqual(bookmark.link_status, 404)
+        self.assertFalse(bookmark.link_ok)
+
+    def test_unreachable(self):
+        bookmark = self.check('http://127.0.0.1:1/')
+
+        self.assertEqual(bookmark.link_status, Bookmark.LINK_UNREACHABLE)
+
+    def test_long_redirect(self):
+        bookmark = self.check(self.url('localhost', '/long'))
+
+        self.assertEqual(bookmark.link_status, 200)
+        self.assertEqual(bookmark.final_url, '')
+        self.assertIsNotNone(bookmark.link_checked)
+
+    def test_non_ascii_path(self):
+        bookmark = self.check(self.url('localhost') + u'caf\xe9')
+
+        self.assertEqual(bookmark.link_status, 200)
+        self.assertEqual(bookmark.final_url, '')
+        self.assertEqual(self.requests, [('HEAD', 'localhost', '/caf%C3%A9')])
+
+    def test_invalid_url(self):
+        BookmarkFactory.create(url='http://example.com:abc/')
+        BookmarkFactory.create(url=self.url('localhost', '/ok'))
+
+        broken = check_links(Bookmark.objects.all(), workers=2, timeout=2, delay=0)
+
+        self.assertEqual(broken, 1)
+        self.assertEqual(
+            dict(Bookmark.objects.values_list('url', 'link_status')),
+            {'http://example.com:abc/': Bookmark.LINK_UNREACHABLE, self.url('localhost', '/ok'): 200},
+        )
+
+    def test_bulk(self):
+        BookmarkFactory.create(url=self.url('localhost', '/ok'))
+        BookmarkFactory.create(url=self.url('localhost', '/gone'))
+
+        broken = check_links(Bookmark.objects.all(), workers=2, timeout=2, delay=0)
+
+        self.assertEqual(broken, 1)
+        self.assertEqual(
+            sorted(Bookmark.objects.values_list('link_status', flat=True)),
+            [200, 404],
+        )
+
+
+    def test_bumps_sites(self):
+        site = Site.objects.get_current()
+        bookmark = BookmarkFactory.create(url=self.url('localhost', '/ok'))
+        bookmark.sites.add(site)
+        generation = cache.get_generation('site', site.pk)
+
+        check_links([bookmark], workers=2, timeout=2, delay=0)
+
+        self.assertNotEqual(cache.get_generation('site', site.pk), generation)
+
+
+class TestHostLimiter(TestCase):
+    def test_delay(self):
+        limiter = HostLimiter(per_host=1, delay=0.2)
+
+        start = time.time()
+        for _ in range(3):
+            with limiter.limit('http://example.com/'):
+                pass
+        with limiter.limit('http://example.org/'):
+            pass
+
+        self.assertGreaterEqual(time.time() - start, 0.4)
+        # Requests to other hosts do not wait.
+        self.assertLess(time.time() - start, 0.6)
+
+
+class TestInterleaveHosts(TestCase):
+    def test_interleave(self):
+        urls = ['http://a/1', 'http://a/2', 'http://a/3', 'http://b/1', 'http://c/1', 'http://b/2']
+
+        self.assertEqual(interleave_hosts(urls), [
+            'http://a/1', 'http://b/1', 'http://c/1', 'http://a/2', 'http://b/2', 'http://a/3',
+        ])
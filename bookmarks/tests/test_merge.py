@@ -0,0 +1,95 @@
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+
+from ..merge import merge_duplicates
+from ..models import (
+    Bookmark, BookmarkInstance, SearchTerm, SiteBookmark, SiteBookmarkTag, SiteTagCount,
+)
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
+
+# How URLs were canonicalized before the settings were introduced.
+LEGACY_CANONICALIZATION = {
+    'BOOKMARKS_URL_IGNORE_SCHEME': False,
+    'BOOKMARKS_URL_STRIP_TRAILING_SLASH': False,
+    'BOOKMARKS_URL_TRACKING_PARAMS': (),
+}
+
+
+def tag_counts(site):
+    return (
+        set(SiteTagCount.objects.filter(site=site, count__gt=0).values_list('tag__name', 'count')),
+        set(SiteBookmarkTag.objects.filter(site=site).values_list('bookmark_id', 'tag__name', 'count')),
+    )
+
+
+class TestMergeDuplicates(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.other_site = Site.objects.create(domain='other.example.com')
+        self.users = UserFactory.create_batch(4)
+        with override_settings(**LEGACY_CANONICALIZATION):
+            self.bookmark = self.create('http://example.com/a', [self.site])
+            self.slash = self.create('https://example.com/a/', [self.site, self.other_site])
+            self.tracked = self.create('http://example.com/a?utm_source=feed', [self.site])
+            self.other = self.create('http://example.com/b', [self.site])
+            BookmarkInstanceFactory.create(bookmark=self.bookmark, user=self.users[0], tags='one')
+            BookmarkInstanceFactory.create(bookmark=self.bookmark, user=self.users[1], tags='two')
+            BookmarkInstanceFactory.create(bookmark=self.slash, user=self.users[1], tags='three')
+            BookmarkInstanceFactory.create(bookmark=self.slash, user=self.users[2], tags='one')
+            BookmarkInstanceFactory.create(bookmark=self.tracked, user=self.users[3])
+            BookmarkInstanceFactory.create(bookmark=self.other, user=self.users[0])
+
+    def create(self, url, sites):
+        bookmark = BookmarkFactory.create(url=url)
+        for site in sites:
+            SiteBookmark.objects.create(site=site, bookmark=bookmark, url_hash=bookmark.url_hash)
+            Bookmark.sites.through.objects.create(site=site, bookmark=bookmark)
+        return bookmark
+
+    def test_merge(self):
+        rehashed, merged = merge_duplicates(batch_size=2)
+
+        self.assertEqual(rehashed, 4)
+        self.assertEqual(merged, 2)
+        self.assertEqual(set(Bookmark.objects.all()), {self.bookmark, self.other})
+        bookmark = Bookmark.objects.get(pk=self.bookmark.pk)
+        self.assertEqual(bookmark.canonical_url, 'https://example.com/a')
+        self.assertEqual(bookmark.save_count, 4)
+        self.assertEqual(set(bookmark.sites.all()), {self.site, self.other_site})
+        instances = BookmarkInstance.objects.filter(bookmark=bookmark)
+        self.assertEqual(set(instances.values_list('user', 'tags')), {
+            (self.users[0].pk, 'one'),
+            # The instance of the first bookmark is kept.
+            (self.users[1].pk, 'two'),
+            (self.users[2].pk, 'one'),
+            (self.users[3].pk, ''),
+        })
+        self.assertEqual(Bookmark.on_site.get_by_url('https://example.com/a/?utm_source=x'), bookmark)
+        self.assertEqual(Bookmark.on_site.get_by_url('http://example.com/b/'), self.other)
+        self.assertFalse(SiteBookmark.objects.exclude(bookmark__url_hash=F('url_hash')).exists())
+        self.assertEqual(BookmarkInstance.on_site.count(), 5)
+        # The tags of the deleted instance are no longer indexed.
+        self.assertFalse(SearchTerm.objects.filter(bookmark=bookmark, term='three').exists())
+
+    def test_merge_keeps_tag_counts(self):
+        merge_duplicates()
+
+        for site in (self.site, self.other_site):
+            counts = tag_counts(site)
+            SiteTagCount.objects.rebuild(site)
+            SiteBookmarkTag.objects.rebuild(site)
+            self.assertEqual(counts, tag_counts(site))
+        self.assertIn(('two', 1), tag_counts(self.other_site)[0])
+
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command('merge_duplicate_bookmarks', stdout=stdout)
+
+        self.assertIn('Merged 2 bookmarks', stdout.getvalue())
+        stdout = StringIO()
+        call_command('merge_duplicate_bookmarks', stdout=stdout)
+        self.assertIn('Rehashed 0 bookmarks', stdout.getvalue())
@@ -2,6 +2,13 @@ from django.contrib.sites.models import Site
 from django.test import TestCase
 from tagging.models import Tag
 
+from ..management.commands.repair_save_counts import repair_save_counts
+from ..models import (
+    Bookmark, BookmarkInstance, SearchQueueEntry, SiteBookmark, SiteBookmarkTag,
+    SiteTagCount,
+)
+from ..pagination import paginate_by_cursor
+from ..utils import hash_url
 from .factories import BookmarkFactory, BookmarkInstanceFactory
 
 
@@ -31,3 +38,352 @@ class TestBookmark(TestCase):
 
         other_tag_instance = Tag.objects.get(name=other_tag)
         self.assertNotIn(other_tag_instance, tags)
+
+
+class TestBookmarkURLHash(TestCase):
+    def test_save_sets_canonical_url(self):
+        bookmark = BookmarkFactory.create(url='HTTP://Example.COM:80')
+
+        self.assertEqual(bookmark.canonical_url, 'https://example.com/')
+        self.assertEqual(bookmark.url_hash, hash_url('http://example.com/'))
+
+    def test_get_by_url(self):
+        bookmark = BookmarkFactory.create(url='http://example.com/page')
+        bookmark.sites.add(Site.objects.get_current())
+
+        found = Bookmark.on_site.get_by_url('http://EXAMPLE.com/page')
+
+        self.assertEqual(found, bookmark)
+
+    def test_get_by_url_other_site(self):
+        other_site = Site.objects.create(domain='other.example.com')
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(other_site)
+
+        with self.assertRaises(Bookmark.DoesNotExist):
+            Bookmark.on_site.get_by_url(bookmark.url)
+
+    def test_remove_site_unlinks(self):
+        site = Site.objects.get_current()
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(site)
+
+        bookmark.sites.remove(site)
+
+        self.assertFalse(SiteBookmark.objects.filter(bookmark=bookmark).exists())
+
+    def test_url_unique_per_site(self):
+        site = Site.objects.get_current()
+        bookmark, duplicate = BookmarkFactory.create_batch(2, url='http://example.com/')
+        bookmark.sites.add(site)
+        duplicate.sites.add(site)
+
+        self.assertEqual(Bookmark.on_site.get_by_url('http://example.com/'), bookmark)
+
+
+class TestSiteTagCount(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.bookmark = BookmarkFactory.create()
+        self.bookmark.sites.add(self.site)
+
+    def counts(self):
+        tags = SiteTagCount.objects.for_site(self.site)
+        return {tag.name: tag.count for tag in tags}
+
+    def test_save(self):
+        BookmarkInstanceFactory.create_batch(2, bookmark=self.bookmark, tags='one two')
+
+        self.assertEqual(self.counts(), {'one': 2, 'two': 2})
+
+    def test_change_tags(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one two')
+
+        instance.tags = 'two three'
+        instance.save()
+
+        self.assertEqual(self.counts(), {'two': 1, 'three': 1})
+
+    def test_delete(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one')
+
+        instance.delete()
+
+        self.assertEqual(self.counts(), {})
+
+    def test_remove_site(self):
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one')
+
+        self.bookmark.sites.remove(self.site)
+
+        self.assertEqual(self.counts(), {})
+
+    def test_remove_unlinked_site(self):
+        other_site = Site.objects.create(domain='other.example.com')
+        other = BookmarkFactory.create()
+        other.sites.add(other_site)
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one')
+        BookmarkInstanceFactory.create(bookmark=other, tags='one')
+
+        self.bookmark.sites.remove(other_site)
+        other_site.bookmark_set.remove(self.bookmark)
+
+        self.assertEqual(self.counts(), {'one': 1})
+        tags = SiteTagCount.objects.for_site(other_site)
+        self.assertEqual({tag.name: tag.count for tag in tags}, {'one': 1})
+        links = SiteBookmarkTag.objects.filter(site=other_site)
+        self.assertEqual(list(links.values_list('bookmark_id', 'count')), [(other.pk, 1)])
+
+    def test_rebuild(self):
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one two')
+        SiteTagCount.objects.all().delete()
+
+        SiteTagCount.objects.rebuild(self.site)
+
+        self.assertEqual(self.counts(), {'one': 1, 'two': 1})
+
+    def test_for_site_limit(self):
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one two')
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='two')
+
+        tags = SiteTagCount.objects.for_site(self.site, limit=1)
+
+        self.assertEqual([tag.name for tag in tags], ['two'])
+
+
+class TestSiteBookmarkTag(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.bookmark = BookmarkFactory.create()
+        self.bookmark.sites.add(self.site)
+
+    def index(self):
+        links = SiteBookmarkTag.objects.filter(site=self.site)
+        return {
+            (bookmark_id, name): count
+            for bookmark_id, name, count in links.values_list('bookmark_id', 'tag__name', 'count')
+        }
+
+    def test_save(self):
+        BookmarkInstanceFactory.create_batch(2, bookmark=self.bookmark, tags='one two')
+
+        self.assertEqual(self.index(), {
+            (self.bookmark.pk, 'one'): 2,
+            (self.bookmark.pk, 'two'): 2,
+        })
+
+    def test_change_tags(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one two')
+
+        instance.tags = 'two three'
+        instance.save()
+
+        self.assertEqual(self.index(), {
+            (self.bookmark.pk, 'two'): 1,
+            (self.bookmark.pk, 'three'): 1,
+        })
+
+    def test_change_bookmark(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one')
+        other_bookmark = BookmarkFactory.create()
+        other_bookmark.sites.add(self.site)
+
+        instance.bookmark = other_bookmark
+        instance.save()
+
+        self.assertEqual(self.index(), {(other_bookmark.pk, 'one'): 1})
+
+    def test_delete(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one')
+
+        instance.delete()
+
+        self.assertEqual(self.index(), {})
+
+    def test_sites_changed(self):
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one')
+
+        self.bookmark.sites.remove(self.site)
+        self.assertEqual(self.index(), {})
+
+        self.bookmark.sites.add(self.site)
+        self.assertEqual(self.index(), {(self.bookmark.pk, 'one'): 1})
+
+    def test_rebuild(self):
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='one two')
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, tags='two')
+        SiteBookmarkTag.objects.all().delete()
+
+        SiteBookmarkTag.objects.rebuild(self.site)
+
+        self.assertEqual(self.index(), {
+            (self.bookmark.pk, 'one'): 1,
+            (self.bookmark.pk, 'two'): 2,
+        })
+
+
+class TestTagged(TestCase):
+    def setUp(self):
+        site = Site.objects.get_current()
+        self.both, self.one, self.two, self.other_site = BookmarkFactory.create_batch(4)
+        for bookmark in (self.both, self.one, self.two):
+            bookmark.sites.add(site)
+        self.other_site.sites.add(Site.objects.create(domain='other.example.com'))
+        BookmarkInstanceFactory.create(bookmark=self.both, tags='one')
+        BookmarkInstanceFactory.create(bookmark=self.both, tags='two')
+        BookmarkInstanceFactory.create(bookmark=self.one, tags='one')
+        BookmarkInstanceFactory.create(bookmark=self.two, tags='two three')
+        BookmarkInstanceFactory.create(bookmark=self.other_site, tags='one two')
+
+    def test_all(self):
+        bookmarks = Bookmark.on_site.tagged(['one', 'two'])
+
+        self.assertEqual(list(bookmarks), [self.both])
+
+    def test_any(self):
+        bookmarks = Bookmark.on_site.tagged(['one', 'three'], match_any=True)
+
+        self.assertEqual(set(bookmarks), {self.both, self.one, self.two})
+
+    def test_tag_objects(self):
+        bookmarks = Bookmark.on_site.tagged(Tag.objects.filter(name='three'))
+
+        self.assertEqual(list(bookmarks), [self.two])
+
+    def test_unknown_tag(self):
+        self.assertEqual(list(Bookmark.on_site.tagged(['one', 'unknown'])), [])
+        self.assertEqual(
+            set(Bookmark.on_site.tagged(['one', 'unknown'], match_any=True)),
+            {self.both, self.one},
+        )
+
+    def test_paginate(self):
+        bookmarks = Bookmark.on_site.tagged(['one', 'two'], match_any=True)
+
+        page = paginate_by_cursor(bookmarks, 'added', per_page=2)
+        next_page = paginate_by_cursor(bookmarks, 'added', cursor=page.next_cursor, per_page=2)
+
+        self.assertEqual(len(page) + len(next_page), 3)
+        self.assertFalse(set(page) & set(next_page))
+
+
+class TestLiveBookmarkInstanceManager(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.other_site = Site.objects.create(domain='other.example.com')
+
+    def test_bookmark_on_site(self):
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(self.site, self.other_site)
+        instance = BookmarkInstanceFactory.create(bookmark=bookmark)
+
+        self.assertEqual(list(BookmarkInstance.on_site.all()), [instance])
+
+    def test_site_added_later(self):
+        instance = BookmarkInstanceFactory.create()
+
+        instance.bookmark.sites.add(self.site)
+
+        self.assertEqual(list(BookmarkInstance.on_site.all()), [instance])
+
+    def test_site_removed(self):
+        instance = BookmarkInstanceFactory.create()
+        instance.bookmark.sites.add(self.site)
+
+        instance.bookmark.sites.remove(self.site)
+
+        self.assertEqual(list(BookmarkInstance.on_site.all()), [])
+
+    def test_bookmark_changed(self):
+        bookmark = BookmarkFactory.create()
+        bookmark.sites.add(self.other_site)
+        instance = BookmarkInstanceFactory.create(bookmark=bookmark)
+        other_bookmark = BookmarkFactory.create()
+        other_bookmark.sites.add(self.site)
+
+        instance.bookmark = other_bookmark
+        instance.save()
+
+        self.assertEqual(list(BookmarkInstance.on_site.all()), [instance])
+
+
+class TestTagsWithCounts(TestCase):
+    def test_tags_with_counts(self):
+        site = Site.objects.get_current()
+        bookmark, other_bookmark, untagged = BookmarkFactory.create_batch(3)
+        for b in (bookmark, other_bookmark, untagged):
+            b.sites.add(site)
+        BookmarkInstanceFactory.create(bookmark=bookmark, tags='one two')
+        BookmarkInstanceFactory.create(bookmark=bookmark, tags='two')
+        BookmarkInstanceFactory.create(bookmark=other_bookmark, tags='three')
+
+        with self.assertNumQueries(2):
+            tags = Bookmark.on_site.tags_with_counts([bookmark, other_bookmark, untagged])
+
+        def names(bookmark):
+            return [(tag.name, count) for tag, count in tags[bookmark.pk]]
+
+        self.assertEqual(names(bookmark), [('two', 2), ('one', 1)])
+        self.assertEqual(names(other_bookmark), [('three', 1)])
+        self.assertEqual(names(untagged), [])
+
+
+class TestSaveCount(TestCase):
+    def save_count(self, bookmark):
+        return Bookmark.objects.get(pk=bookmark.pk).save_count
+
+    def test_create(self):
+        bookmark = BookmarkFactory.create()
+
+        BookmarkInstanceFactory.create_batch(2, bookmark=bookmark)
+
+        self.assertEqual(self.save_count(bookmark), 2)
+
+    def test_delete(self):
+        bookmark = BookmarkFactory.create()
+        instance, other_instance = BookmarkInstanceFactory.create_batch(2, bookmark=bookmark)
+
+        instance.delete()
+
+        self.assertEqual(self.save_count(bookmark), 1)
+
+    def test_delete_last(self):
+        instance = BookmarkInstanceFactory.create()
+
+        instance.delete()
+
+        self.assertFalse(Bookmark.objects.filter(pk=instance.bookmark_id).exists())
+
+    def test_repair(self):
+        bookmark = BookmarkFactory.create()
+        BookmarkInstanceFactory.create(bookmark=bookmark)
+        Bookmark.objects.filter(pk=bookmark.pk).update(save_count=5)
+
+        fixed = repair_save_counts([bookmark.pk])
+
+        self.assertEqual(fixed, 1)
+        self.assertEqual(self.save_count(bookmark), 1)
+
+
+class TestBookmarkUpdated(TestCase):
+    def test_sites_changed(self):
+        bookmark = BookmarkFactory.create()
+        Bookmark.objects.filter(pk=bookmark.pk).update(updated=bookmark.added)
+
+        bookmark.sites.add(Site.objects.get_current())
+
+        self.assertGreater(Bookmark.objects.get(pk=bookmark.pk).updated, bookmark.added)
+
+
+class TestSearchQueue(TestCase):
+    def test_enqueue_coalesces(self):
+        SearchQueueEntry.objects.enqueue([1, 2], SearchQueueEntry.UPDATE)
+        SearchQueueEntry.objects.enqueue([1], SearchQueueEntry.UPDATE)
+        SearchQueueEntry.objects.enqueue([2], SearchQueueEntry.DELETE)
+
+        entries = SearchQueueEntry.objects.order_by('bookmark_id')
+
+        self.assertEqual(
+            list(entries.values_list('bookmark_id', 'action')),
+            [(1, SearchQueueEntry.UPDATE), (2, SearchQueueEntry.DELETE)],
+        )
@@ -0,0 +1,54 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Bookmark
+from ..pagination import InvalidCursor, decode_cursor, paginate_by_cursor
+from .factories import BookmarkFactory
+
+
+class TestPaginateByCursor(TestCase):
+    def setUp(self):
+        added = timezone.now()
+        # Two bookmarks share a timestamp to exercise the id tie-break.
+        self.bookmarks = [
+            BookmarkFactory.create(added=added - datetime.timedelta(days=days))
+            for days in (0, 1, 1, 2, 3)
+        ]
+        self.queryset = Bookmark.objects.all()
+
+    def test_first_page(self):
+        page = paginate_by_cursor(self.queryset, 'added', per_page=3)
+
+        expected = [self.bookmarks[0], self.bookmarks[2], self.bookmarks[1]]
+        self.assertEqual(page.object_list, expected)
+        self.assertTrue(page.has_next)
+
+    def test_walk_pages(self):
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_by_cursor(self.queryset, 'added', cursor, per_page=2)
+            seen.extend(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        expected = list(self.queryset.order_by('-added', '-pk'))
+        self.assertEqual(seen, expected)
+        self.assertIsNone(page.next_cursor)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+
+    def test_integer_field(self):
+        for save_count, bookmark in enumerate(self.bookmarks):
+            Bookmark.objects.filter(pk=bookmark.pk).update(save_count=save_count % 2)
+
+        first = paginate_by_cursor(self.queryset, 'save_count', per_page=3)
+        second = paginate_by_cursor(self.queryset, 'save_count', first.next_cursor, per_page=3)
+
+        expected = list(self.queryset.order_by('-save_count', '-pk'))
+        self.assertEqual(first.object_list + second.object_list, expected)
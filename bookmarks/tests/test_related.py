@@ -0,0 +1,65 @@
+import datetime
+
+from django.contrib.sites.models import Site
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Bookmark, RelatedBookmark
+from ..related import refresh_related, similar_bookmarks
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
+
+
+class TestRelatedBookmarks(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.python, self.django, self.cooking = BookmarkFactory.create_batch(3)
+        for bookmark in (self.python, self.django, self.cooking):
+            bookmark.sites.add(self.site)
+        self.user = UserFactory.create()
+        BookmarkInstanceFactory.create(bookmark=self.python, user=self.user, tags='python code')
+        BookmarkInstanceFactory.create(bookmark=self.django, user=self.user, tags='python web')
+        BookmarkInstanceFactory.create(bookmark=self.cooking, tags='food')
+
+    def test_similar_bookmarks(self):
+        similar = similar_bookmarks(self.site, [self.python.pk, self.cooking.pk])
+
+        # Shares one tag and one user out of three features each: 2 / (3 + 3 - 2).
+        self.assertEqual(similar[self.python.pk], [(0.5, self.django.pk)])
+        self.assertEqual(similar[self.cooking.pk], [])
+
+    def test_max_postings(self):
+        similar = similar_bookmarks(self.site, [self.python.pk], max_postings=1)
+
+        self.assertEqual(similar[self.python.pk], [])
+
+    def test_refresh(self):
+        refreshed = refresh_related(self.site)
+
+        self.assertEqual(refreshed, 3)
+        related = RelatedBookmark.objects.for_bookmark(self.django)
+        self.assertEqual(related, [self.python])
+        self.assertEqual(related[0].score, 0.5)
+
+    def test_refresh_incremental(self):
+        refresh_related(self.site)
+        RelatedBookmark.objects.update(computed=timezone.now() - datetime.timedelta(hours=1))
+        Bookmark.objects.update(instances_changed=timezone.now() - datetime.timedelta(days=1))
+
+        BookmarkInstanceFactory.create(bookmark=self.cooking, user=self.user, tags='code')
+        refreshed = refresh_related(self.site)
+
+        # The changed bookmark only; it was nobody's related bookmark.
+        self.assertEqual(refreshed, 1)
+        self.assertEqual(
+            [bookmark.pk for bookmark in RelatedBookmark.objects.for_bookmark(self.cooking)],
+            [self.python.pk, self.django.pk],
+        )
+
+    def test_retag_marks_changed(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.cooking, tags='food')
+        Bookmark.objects.update(instances_changed=None)
+
+        instance.tags = 'recipes'
+        instance.save()
+
+        self.assertIsNotNone(Bookmark.objects.get(pk=self.cooking.pk).instances_changed)
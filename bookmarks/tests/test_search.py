@@ -0,0 +1,100 @@
+from django.contrib.sites.models import Site
+from django.test import TestCase
+
+from ..bulk import add_bookmarks
+from ..models import SearchTerm
+from ..search import bookmark_terms, search, tokenize
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
+
+
+class TestTokenize(TestCase):
+    def test_tokenize(self):
+        self.assertEqual(tokenize(u'Django: the Web framework, a 2nd time'), [
+            'django', 'the', 'web', 'framework', '2nd', 'time',
+        ])
+
+    def test_bookmark_terms(self):
+        bookmark = BookmarkFactory.build(
+            url='https://docs.djangoproject.com/en/',
+            description='Django docs',
+            note='Read the docs',
+        )
+
+        terms = bookmark_terms(bookmark, ['python'])
+
+        self.assertEqual(terms['docs'], 3 + 2 + 1)
+        self.assertEqual(terms['python'], 3)
+        self.assertNotIn('https', terms)
+
+
+class TestSearch(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.django = BookmarkFactory.create(
+            url='https://www.djangoproject.com/',
+            description='Django web framework',
+        )
+        self.flask = BookmarkFactory.create(
+            url='http://flask.pocoo.org/',
+            description='Flask, a web microframework',
+        )
+        for bookmark in (self.django, self.flask):
+            bookmark.sites.add(self.site)
+
+    def test_ranked(self):
+        self.assertEqual(search('web', self.site), [self.flask, self.django])
+        self.assertEqual(search('django web', self.site), [self.django])
+
+    def test_prefix(self):
+        self.assertEqual(search('micro', self.site), [self.flask])
+        self.assertEqual(search('djang', self.site), [self.django])
+
+    def test_exact_ranks_first(self):
+        frameworks = BookmarkFactory.create(description='Frameworks')
+        frameworks.sites.add(self.site)
+
+        results = search('framework', self.site)
+
+        self.assertEqual(results, [self.django, frameworks])
+        self.assertGreater(results[0].rank, results[1].rank)
+
+    def test_site_filter(self):
+        other_site = Site.objects.create(domain='other.example.com')
+
+        self.assertEqual(search('django', other_site), [])
+        self.assertEqual(search('django'), [self.django])
+
+    def test_tags(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.flask, tags='python')
+        self.assertEqual(search('python', self.site), [self.flask])
+
+        instance.tags = 'wsgi'
+        instance.save()
+        self.assertEqual(search('python', self.site), [])
+
+        instance.delete()
+        self.assertEqual(search('wsgi', self.site), [])
+
+    def test_update_description(self):
+        self.flask.description = 'Pocoo'
+        self.flask.save()
+
+        self.assertEqual(search('microframework', self.site), [])
+
+    def test_delete(self):
+        self.flask.delete()
+
+        self.assertFalse(SearchTerm.objects.filter(bookmark_id=self.flask.pk).exists())
+
+    def test_bulk(self):
+        add_bookmarks(UserFactory.create(), [
+            {'url': 'http://bottlepy.org/', 'description': 'Bottle', 'tags': 'python'},
+            {'url': self.flask.url, 'tags': 'python'},
+        ])
+
+        self.assertEqual(set(bookmark.url for bookmark in search('python', self.site)), {
+            'http://bottlepy.org/', self.flask.url,
+        })
+
+    def test_empty_query(self):
+        self.assertEqual(search(' - ', self.site), [])
@@ -0,0 +1,112 @@
+from unittest import skipIf
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+
+from ..models import Bookmark, SearchQueueEntry
+from .factories import BookmarkFactory
+
+try:
+    from .. import signal_processors
+except (ImportError, ImproperlyConfigured):
+    # Haystack is optional.
+    signal_processors = None
+
+
+class FakeIndex(object):
+    def __init__(self, model):
+        self.model = model
+
+    def index_queryset(self, using=None):
+        return self.model.objects.all()
+
+
+class FakeBackend(object):
+    def __init__(self):
+        self.updated = []
+        self.removed = []
+
+    def update(self, index, bookmarks):
+        self.updated.extend(bookmark.pk for bookmark in bookmarks)
+
+    def remove(self, identifier):
+        self.removed.append(identifier)
+
+
+class FakeConnection(object):
+    def __init__(self, index, backend):
+        self.index = index
+        self.backend = backend
+
+    def get_unified_index(self):
+        return self
+
+    def get_index(self, model):
+        return self.index
+
+    def get_backend(self):
+        return self.backend
+
+
+class FakeRouter(object):
+    def for_write(self):
+        return ['default']
+
+
+@skipIf(signal_processors is None, 'Haystack is not configured.')
+class TestProcessQueue(TestCase):
+    def setUp(self):
+        self.backend = FakeBackend()
+        connection = FakeConnection(FakeIndex(Bookmark), self.backend)
+        for name, fake in (('connections', {'default': connection}), ('connection_router', FakeRouter())):
+            self.addCleanup(setattr, signal_processors, name, getattr(signal_processors, name))
+            setattr(signal_processors, name, fake)
+        self.bookmarks = BookmarkFactory.create_batch(2)
+        SearchQueueEntry.objects.all().delete()
+
+    def test_update(self):
+        ids = [bookmark.pk for bookmark in self.bookmarks]
+        SearchQueueEntry.objects.enqueue(ids, SearchQueueEntry.UPDATE)
+        SearchQueueEntry.objects.enqueue(ids[:1], SearchQueueEntry.UPDATE)
+
+        self.assertEqual(signal_processors.process_queue(), 2)
+
+        self.assertEqual(sorted(self.backend.updated), sorted(ids))
+        self.assertEqual(self.backend.removed, [])
+        self.assertFalse(SearchQueueEntry.objects.exists())
+
+    def test_delete(self):
+        updated, deleted = self.bookmarks
+        SearchQueueEntry.objects.enqueue([updated.pk, deleted.pk], SearchQueueEntry.UPDATE)
+        deleted_pk = deleted.pk
+        deleted.delete()
+        SearchQueueEntry.objects.enqueue([deleted_pk, 0], SearchQueueEntry.DELETE)
+
+        self.assertEqual(signal_processors.process_queue(), 3)
+
+        self.assertEqual(self.backend.updated, [updated.pk])
+        self.assertEqual(sorted(self.backend.removed), sorted([
+            'bookmarks.bookmark.{}'.format(deleted_pk),
+            'bookmarks.bookmark.0',
+        ]))
+        self.assertFalse(SearchQueueEntry.objects.exists())
+
+    def test_missing_update(self):
+        bookmark = self.bookmarks[0]
+        SearchQueueEntry.objects.enqueue([bookmark.pk], SearchQueueEntry.UPDATE)
+        bookmark_pk = bookmark.pk
+        bookmark.delete()
+
+        signal_processors.process_queue()
+
+        self.assertEqual(self.backend.removed, ['bookmarks.bookmark.{}'.format(bookmark_pk)])
+
+    def test_batch_size(self):
+        ids = [bookmark.pk for bookmark in self.bookmarks]
+        SearchQueueEntry.objects.enqueue(ids, SearchQueueEntry.UPDATE)
+
+        self.assertEqual(signal_processors.process_queue(batch_size=1), 1)
+        self.assertEqual(SearchQueueEntry.objects.count(), 1)
+        self.assertEqual(signal_processors.process_queue(batch_size=1), 1)
+        self.assertEqual(signal_processors.process_queue(batch_size=1), 0)
+        self.assertEqual(sorted(self.backend.updated), sorted(ids))
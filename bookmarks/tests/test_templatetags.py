@@ -0,0 +1,20 @@
+from django.template import Context, Template
+from django.test import TestCase
+
+from .factories import BookmarkFactory
+
+
+class TestSavedBy(TestCase):
+    def test_saved_by(self):
+        saved, other = BookmarkFactory.create_batch(2)
+        template = Template(
+            '{% load bookmark_tags %}'
+            '{% for bookmark in bookmarks %}{{ bookmark|saved_by:saved_bookmark_ids }} {% endfor %}'
+        )
+
+        rendered = template.render(Context({
+            'bookmarks': [saved, other],
+            'saved_bookmark_ids': set([saved.pk]),
+        }))
+
+        self.assertEqual(rendered, 'True False ')
@@ -0,0 +1,163 @@
+import datetime
+
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from ..bulk import add_bookmarks
+from ..models import BookmarkInstance, SaveBucket, TrendingBookmark
+from ..trending import compact_buckets, refresh_trending
+from ..utils import truncate_day, truncate_hour
+from ..views import trending
+from .factories import BookmarkFactory, BookmarkInstanceFactory, UserFactory
+
+
+def counts():
+    return dict(
+        ((bookmark_id, start, hours), count)
+        for bookmark_id, start, hours, count
+        in SaveBucket.objects.values_list('bookmark_id', 'start', 'hours', 'count')
+    )
+
+
+class TestSaveBuckets(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.bookmark, self.other = BookmarkFactory.create_batch(2)
+        self.bookmark.sites.add(self.site)
+        self.other.sites.add(self.site)
+        self.now = timezone.now()
+        self.hour = truncate_hour(self.now)
+
+    def test_save_and_delete(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.bookmark, saved=self.now)
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, saved=self.now)
+
+        self.assertEqual(counts(), {(self.bookmark.pk, self.hour, 1): 2})
+
+        instance.delete()
+
+        self.assertEqual(counts(), {(self.bookmark.pk, self.hour, 1): 1})
+
+    def test_moved_instance(self):
+        instance = BookmarkInstanceFactory.create(bookmark=self.bookmark, saved=self.now)
+
+        instance = BookmarkInstance.objects.get(pk=instance.pk)
+        instance.bookmark = self.other
+        instance.save()
+
+        self.assertEqual(counts(), {
+            (self.bookmark.pk, self.hour, 1): 0,
+            (self.other.pk, self.hour, 1): 1,
+        })
+
+    def test_old_saves_not_counted(self):
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, saved=self.now - datetime.timedelta(days=30))
+
+        self.assertEqual(counts(), {})
+
+    def test_bulk(self):
+        user = UserFactory.create()
+        add_bookmarks(user, [
+            {'url': 'http://example.com/new', 'saved': self.now},
+            {'url': self.bookmark.url, 'saved': self.now},
+            {'url': 'http://example.com/old', 'saved': self.now - datetime.timedelta(days=30)},
+        ])
+
+        bookmark_ids = set(bookmark_id for bookmark_id, start, hours in counts())
+        self.assertEqual(len(bookmark_ids), 2)
+        self.assertIn(self.bookmark.pk, bookmark_ids)
+        self.assertEqual(set(counts().values()), {1})
+
+    def test_compact(self):
+        three_days_ago = self.now - datetime.timedelta(days=3)
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, saved=three_days_ago)
+        instance = BookmarkInstanceFactory.create(
+            bookmark=self.bookmark,
+            saved=three_days_ago + datetime.timedelta(hours=1),
+        )
+        BookmarkInstanceFactory.create(bookmark=self.bookmark, saved=self.now)
+        SaveBucket.objects.create(
+            bookmark=self.other,
+            start=truncate_day(self.now - datetime.timedelta(days=10)),
+            hours=24,
+            count=5,
+        )
+
+        merged, deleted = compact_buckets()
+
+        self.assertEqual((merged, deleted), (2, 1))
+        day = truncate_day(three_days_ago)
+        self.assertEqual(counts(), {
+            (self.bookmark.pk, day, 24): 2,
+            (self.bookmark.pk, self.hour, 1): 1,
+        })
+
+        # Deleting a save counted in a compacted bucket.
+        instance.delete()
+
+        self.assertEqual(counts()[self.bookmark.pk, day, 24], 1)
+
+
+class TestTrending(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.other_site = Site.objects.create(domain='other.example.com')
+        self.now = timezone.now()
+        self.recent, self.older, self.elsewhere = BookmarkFactory.create_batch(3)
+        self.recent.sites.add(self.site)
+        self.older.sites.add(self.site)
+        self.elsewhere.sites.add(self.other_site)
+        self.save(self.recent, 3, datetime.timedelta(hours=1))
+        self.save(self.older, 6, datetime.timedelta(days=3))
+        self.save(self.elsewhere, 1, datetime.timedelta(hours=1))
+
+    def save(self, bookmark, count, ago):
+        for _ in range(count):
+            BookmarkInstanceFactory.create(bookmark=bookmark, saved=self.now - ago)
+
+    def test_refresh(self):
+        refresh_trending(now=self.now)
+
+        day = TrendingBookmark.objects.for_site(self.site, TrendingBookmark.DAY)
+        self.assertEqual(day, [self.recent])
+        with self.assertNumQueries(1):
+            week = TrendingBookmark.objects.for_site(self.site, TrendingBookmark.WEEK)
+        # Six saves three days ago are worth fewer than three an hour ago.
+        self.assertEqual(week, [self.recent, self.older])
+        self.assertGreater(week[0].trending_score, week[1].trending_score)
+        other = TrendingBookmark.objects.for_site(self.other_site, TrendingBookmark.DAY)
+        self.assertEqual(other, [self.elsewhere])
+
+    def test_top_k(self):
+        refresh_trending(sites=[self.site], top_k=1, now=self.now)
+
+        week = TrendingBookmark.objects.for_site(self.site, TrendingBookmark.WEEK)
+        self.assertEqual(week, [self.recent])
+        self.assertFalse(TrendingBookmark.objects.filter(site=self.other_site).exists())
+
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command('refresh_trending_bookmarks', stdout=stdout)
+
+        self.assertIn('Stored 5 trending bookmarks', stdout.getvalue())
+
+    @override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {
+            'loaders': [('django.template.loaders.locmem.Loader', {
+                'bookmarks/trending.html': '{% for bookmark in bookmarks %}{{ bookmark.url }} {% endfor %}',
+            })],
+        },
+    }])
+    def test_view(self):
+        refresh_trending(now=self.now)
+        request = RequestFactory().get('/trending/', {'window': 'week'})
+        request.user = UserFactory.create()
+
+        response = trending(request)
+
+        self.assertEqual(response.content.split(), [self.recent.url, self.older.url])
@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..utils import canonicalize_url, hash_url
+
+
+class TestCanonicalizeURL(SimpleTestCase):
+    def test_host_and_port(self):
+        self.assertEqual(canonicalize_url('HTTPS://Example.COM:443'), 'https://example.com/')
+        self.assertEqual(canonicalize_url('https://example.com:8443/a'), 'https://example.com:8443/a')
+
+    def test_scheme(self):
+        self.assertEqual(canonicalize_url('http://example.com/a'), 'https://example.com/a')
+        with override_settings(BOOKMARKS_URL_IGNORE_SCHEME=False):
+            self.assertEqual(canonicalize_url('http://example.com/a'), 'http://example.com/a')
+
+    def test_trailing_slash(self):
+        self.assertEqual(canonicalize_url('https://example.com/a/'), 'https://example.com/a')
+        self.assertEqual(canonicalize_url('https://example.com/'), 'https://example.com/')
+        with override_settings(BOOKMARKS_URL_STRIP_TRAILING_SLASH=False):
+            self.assertEqual(canonicalize_url('https://example.com/a/'), 'https://example.com/a/')
+
+    def test_tracking_params(self):
+        url = 'https://example.com/a?utm_source=feed&id=1&fbclid=x&utm_medium=rss#top'
+        self.assertEqual(canonicalize_url(url), 'https://example.com/a?id=1#top')
+        self.assertEqual(canonicalize_url('https://example.com/a?utm_source=feed'), 'https://example.com/a')
+        with override_settings(BOOKMARKS_URL_TRACKING_PARAMS=['id']):
+            self.assertEqual(
+                canonicalize_url(url),
+                'https://example.com/a?utm_source=feed&fbclid=x&utm_medium=rss#top',
+            )
+
+    def test_idempotent(self):
+        for url in ('http://Example.com:80//a/?utm_term=1&b=2', 'https://example.com'):
+            canonical_url = canonicalize_url(url)
+            self.assertEqual(canonicalize_url(canonical_url), canonical_url)
+
+    def test_hash_url(self):
+        self.assertEqual(
+            hash_url('http://example.com/a/?utm_source=feed'),
+            hash_url('https://EXAMPLE.com/a'),
+        )
@@ -0,0 +1,132 @@
+import json
+import time
+
+from django.contrib.sites.models import Site
+from django.core.urlresolvers import reverse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import baseconv
+
+from ..bulk import ADDED, EXISTS, INVALID
+from ..models import BookmarkInstance
+from ..views import (
+    BOOKMARKLET_MAX_AGE, add, add_batch, add_quick, bookmarklet_signer, bookmarklet_token,
+    bookmarklet_user,
+)
+from .factories import UserFactory
+
+
+class TestAddBatch(TestCase):
+    def setUp(self):
+        self.site = Site.objects.get_current()
+        self.user = UserFactory.create()
+
+    def post(self, data):
+        body = data if isinstance(data, str) else json.dumps(data)
+        request = RequestFactory().post('/add/batch/', body, content_type='application/json')
+        request.user = self.user
+        return add_batch(request)
+
+    def test_add(self):
+        response = self.post([
+            {'url': 'http://example.com/', 'description': 'Example', 'tags': ['one', 'two']},
+            {'url': 'nope'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)['results']
+        self.assertEqual([result['status'] for result in results], [ADDED, INVALID])
+        instance = BookmarkInstance.objects.get(pk=results[0]['instance'])
+        self.assertEqual(instance.user, self.user)
+        self.assertEqual(instance.tags, 'one two')
+
+        response = self.post({'bookmarks': [{'url': 'http://example.com/'}]})
+        self.assertEqual(json.loads(response.content)['results'][0]['status'], EXISTS)
+
+    def test_invalid(self):
+        for body in ('{', {'bookmarks': 'http://example.com/'}, [1], [{'url': 1}], [{'tags': [1]}]):
+            response = self.post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', json.loads(response.content))
+
+    def test_get_not_allowed(self):
+        request = RequestFactory().get('/add/batch/')
+        request.user = self.user
+
+        self.assertEqual(add_batch(request).status_code, 405)
+
+
+class TestAddQuick(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.token = bookmarklet_token(self.user)
+
+    def post(self, data):
+        return add_quick(RequestFactory().post('/add/quick/', data))
+
+    def test_add(self):
+        data = {'token': self.token, 'url': 'http://example.com/', 'description': 'Example'}
+        with self.assertNumQueries(14):
+            response = self.post(data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], '*')
+        result = json.loads(response.content)
+        self.assertEqual(result['status'], ADDED)
+        instance = BookmarkInstance.objects.get(pk=result['instance'])
+        self.assertEqual(instance.user, self.user)
+        self.assertEqual(instance.description, 'Example')
+
+        with self.assertNumQueries(5):
+            result = json.loads(self.post(data).content)
+        self.assertEqual(result['status'], EXISTS)
+
+    def test_invalid_url(self):
+        response = self.post({'token': self.token, 'url': 'nope'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['status'], INVALID)
+
+    def test_invalid_token(self):
+        other = UserFactory.create()
+        forged = '{}:{}'.format(other.pk, self.token.partition(':')[2])
+        for token in ('', 'nope', forged, self.token + 'x'):
+            response = self.post({'token': token, 'url': 'http://example.com/'})
+            self.assertEqual(response.status_code, 403, token)
+            self.assertIn('message', json.loads(response.content))
+        self.assertFalse(BookmarkInstance.objects.exists())
+
+    def test_token_expires(self):
+        signer = bookmarklet_signer(self.user)
+        signed = int(time.time()) - BOOKMARKLET_MAX_AGE - 1
+        signer.timestamp = lambda: baseconv.base62.encode(signed)
+        token = signer.sign(str(self.user.pk))
+
+        self.assertIsNone(bookmarklet_user(token))
+        response = self.post({'token': token, 'url': 'http://example.com/'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_password_change_revokes_token(self):
+        self.assertEqual(bookmarklet_user(self.token), self.user)
+
+        self.user.set_password('changed')
+        self.user.save()
+
+        self.assertIsNone(bookmarklet_user(self.token))
+
+    @override_settings(ROOT_URLCONF='bookmarks.benchmarks', TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {
+            'loaders': [('django.template.loaders.locmem.Loader', {
+                'bookmarks/add.html': '{{ quick_bookmarklet }}',
+            })],
+        },
+    }])
+    def test_snippet(self):
+        request = RequestFactory().get('/add/')
+        request.user = self.user
+
+        response = add(request)
+
+        self.assertContains(response, 'https://example.com' + reverse(add_quick))
+        self.assertContains(response, self.token)
+        self.assertContains(response, 'x.onerror=')
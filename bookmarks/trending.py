@@ -0,0 +1,129 @@
+import datetime
+import heapq
+from collections import Counter, defaultdict
+
+from django.contrib.sites.models import Site
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bookmarks.models import Bookmark, SaveBucket, TrendingBookmark
+from bookmarks.related import chunks
+from bookmarks.utils import truncate_day
+
+"""
+Rank the bookmarks saved the most recently on each site.
+
+The receivers in `bookmarks.receivers` count saves per bookmark and hour in
+`SaveBucket`. `refresh_trending` scores every bookmark over each window of
+`WINDOWS`, summing the saves of the buckets in the window halved every
+`half_life` of age, and stores the `TOP_K` best of each site in
+`TrendingBookmark`, so that a trending list is a single indexed query.
+
+`compact_buckets` merges the hourly buckets older than the day window into
+one bucket per day, as the week window doesn't need the resolution, and
+deletes the buckets older than every window. Both are run periodically by
+the `refresh_trending_bookmarks` command.
+"""
+
+# window: (length, half_life)
+WINDOWS = {
+    TrendingBookmark.DAY: (datetime.timedelta(days=1), datetime.timedelta(hours=6)),
+    TrendingBookmark.WEEK: (datetime.timedelta(days=7), datetime.timedelta(days=2)),
+}
+TOP_K = 50
+BATCH_SIZE = 1000
+
+
+def hours(delta):
+    return delta.total_seconds() / 3600
+
+
+def bucket_scores(now):
+    """Return `{window: {bookmark_id: score}}` from the buckets before `now`."""
+    buckets = SaveBucket.objects.filter(start__gte=now - SaveBucket.RETENTION, count__gt=0)
+    buckets = buckets.values_list('bookmark_id', 'start', 'hours', 'count')
+
+    scores = dict((window, defaultdict(float)) for window in WINDOWS)
+    for bookmark_id, start, span, count in buckets.iterator():
+        age = max(hours(now - start) - span / 2.0, 0)
+        for window, (length, half_life) in WINDOWS.items():
+            if age <= hours(length):
+                scores[window][bookmark_id] += count * 0.5 ** (age / hours(half_life))
+    return scores
+
+
+def site_ids_by_bookmark(bookmark_ids):
+    sites = defaultdict(list)
+    for ids in chunks(bookmark_ids):
+        links = Bookmark.sites.through.objects.filter(bookmark__in=ids)
+        for bookmark_id, site_id in links.values_list('bookmark_id', 'site_id'):
+            sites[bookmark_id].append(site_id)
+    return sites
+
+
+def refresh_trending(sites=None, top_k=TOP_K, now=None):
+    """
+    Recompute the `top_k` trending bookmarks of each window on `sites`, all
+    sites by default. Returns the number of rows stored.
+    """
+    now = now or timezone.now()
+    scores = bucket_scores(now)
+    bookmark_sites = site_ids_by_bookmark(set().union(*scores.values()))
+    if sites is None:
+        sites = Site.objects.all()
+
+    stored = 0
+    for site in sites:
+        rows = []
+        for window, window_scores in scores.items():
+            best = heapq.nlargest(top_k, (
+                (score, bookmark_id)
+                for bookmark_id, score in window_scores.items()
+                if site.pk in bookmark_sites[bookmark_id]
+            ))
+            rows.extend(
+                TrendingBookmark(
+                    site=site,
+                    window=window,
+                    bookmark_id=bookmark_id,
+                    score=score,
+                    computed=now,
+                )
+                for score, bookmark_id in best
+            )
+        with transaction.atomic():
+            TrendingBookmark.objects.filter(site=site).delete()
+            TrendingBookmark.objects.bulk_create(rows)
+        stored += len(rows)
+    return stored
+
+
+def compact_buckets(now=None, batch_size=BATCH_SIZE):
+    """
+    Merge the hourly buckets of the days before the day window into daily
+    buckets and delete the expired buckets. Returns the numbers of hourly
+    buckets merged and of buckets deleted.
+    """
+    now = now or timezone.now()
+    hourly = SaveBucket.objects.filter(hours=1, start__lt=truncate_day(now - SaveBucket.HOURLY))
+    hourly = hourly.order_by('pk').values_list('pk', 'bookmark_id', 'start', 'count')
+
+    merged = 0
+    while True:
+        # Merged buckets are deleted, so always take the first batch.
+        batch = list(hourly[:batch_size])
+        if not batch:
+            break
+        counts = Counter()
+        for pk, bookmark_id, start, count in batch:
+            counts[bookmark_id, truncate_day(start)] += count
+        with transaction.atomic():
+            SaveBucket.objects.add_many(counts, hours=24)
+            SaveBucket.objects.filter(pk__in=[pk for pk, bookmark_id, start, count in batch]).delete()
+        merged += len(batch)
+
+    stale = SaveBucket.objects.filter(Q(start__lt=now - SaveBucket.RETENTION) | Q(count__lte=0))
+    deleted = stale.count()
+    stale.delete()
+    return merged, deleted
@@ -9,7 +9,29 @@ from bookmarks import views
 urlpatterns = [
     url(r'^$', views.bookmarks, name="all_bookmarks"),
     url(r'^your_bookmarks/$', views.your_bookmarks, name="your_bookmarks"),
+    url(r'^tags/(?P<tags>[^/]+)/$', views.tagged, name="tagged_bookmarks"),
+    url(r'^search/$', views.search, name="search_bookmarks"),
+    url(r'^trending/$', views.trending, name="trending_bookmarks"),
+    url(r'^feed/(?P<format>rss|atom)/$', views.feed, name="bookmarks_feed"),
+    url(
+        r'^tags/(?P<tag>[^/+]+)/feed/(?P<format>rss|atom)/$',
+        views.tag_feed,
+        name="tagged_bookmarks_feed",
+    ),
+    url(
+        r'^users/(?P<username>[^/]+)/feed/(?P<format>rss|atom)/$',
+        views.user_feed,
+        name="user_bookmarks_feed",
+    ),
+    url(
+        r'^your_bookmarks/export/(?P<format>html|json|csv)/$',
+        views.export,
+        name="export_bookmarks",
+    ),
     url(r'^add/$', views.add, name="add_bookmark"),
+    url(r'^add/quick/$', views.add_quick, name="add_bookmark_quick"),
+    url(r'^add/batch/$', views.add_batch, name="add_bookmarks_batch"),
+    url(r'^import/$', views.import_file, name="import_bookmarks"),
     url(r'^(\d+)/delete/$', views.delete, name="delete_bookmark_instance"),
 
     # for voting
@@ -0,0 +1,109 @@
+import hashlib
+import urllib
+import urlparse
+
+from django.conf import settings
+from django.utils import timezone
+
+
+DEFAULT_PORTS = {
+    'http': '80',
+    'https': '443',
+}
+
+# Query parameters added by analytics and ad platforms. A trailing `*`
+# matches any parameter starting with the rest.
+DEFAULT_TRACKING_PARAMS = (
+    'utm_*',
+    'fbclid',
+    'gclid',
+    'dclid',
+    'msclkid',
+    'yclid',
+    'mc_cid',
+    'mc_eid',
+    '_ga',
+    'igshid',
+)
+
+
+def is_tracking_param(name, tracking_params):
+    for param in tracking_params:
+        if param.endswith('*'):
+            if name.startswith(param[:-1]):
+                return True
+        elif name == param:
+            return True
+    return False
+
+
+def strip_tracking_params(query, tracking_params):
+    if not query or not tracking_params:
+        return query
+    params = query.split('&')
+    kept = [
+        param for param in params
+        if not is_tracking_param(urllib.unquote_plus(param.partition('=')[0]), tracking_params)
+    ]
+    if len(kept) == len(params):
+        return query
+    return '&'.join(kept)
+
+
+def canonicalize_url(url):
+    """
+    Return a normalised form of `url` so that trivially different spellings
+    of the same address compare equal.
+
+    The scheme and host are lower-cased and the port is dropped when it is
+    the default one for the scheme. Depending on the settings below, HTTP
+    is treated as HTTPS, the trailing slash of the path is dropped and the
+    tracking parameters are removed from the query:
+
+    * `BOOKMARKS_URL_IGNORE_SCHEME` (default True)
+    * `BOOKMARKS_URL_STRIP_TRAILING_SLASH` (default True)
+    * `BOOKMARKS_URL_TRACKING_PARAMS` (default `DEFAULT_TRACKING_PARAMS`)
+
+    Bookmarks are looked up by the hash of this form, so run the
+    `merge_duplicate_bookmarks` command after changing these settings.
+    """
+    scheme, netloc, path, query, fragment = urlparse.urlsplit(url.strip())
+    scheme = scheme.lower()
+
+    userinfo, _, hostport = netloc.rpartition('@')
+    host, _, port = hostport.partition(':')
+    host = host.lower()
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = '%s:%s' % (host, port)
+    netloc = '%s@%s' % (userinfo, host) if userinfo else host
+
+    if scheme == 'http' and getattr(settings, 'BOOKMARKS_URL_IGNORE_SCHEME', True):
+        scheme = 'https'
+
+    if getattr(settings, 'BOOKMARKS_URL_STRIP_TRAILING_SLASH', True):
+        path = path.rstrip('/')
+    if netloc and not path:
+        path = '/'
+
+    tracking_params = getattr(settings, 'BOOKMARKS_URL_TRACKING_PARAMS', DEFAULT_TRACKING_PARAMS)
+    query = strip_tracking_params(query, tracking_params)
+
+    return urlparse.urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def hash_url(url):
+    """Return the fixed-width hash used to index the canonical form of `url`."""
+    canonical_url = canonicalize_url(url)
+    return hashlib.sha1(canonical_url.encode('utf-8')).hexdigest()
+
+
+def truncate_hour(value):
+    """Return the start of the hour of the datetime `value`, in UTC if aware."""
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.utc)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def truncate_day(value):
+    """Return the start of the day of the datetime `value`, in UTC if aware."""
+    return truncate_hour(value).replace(hour=0)
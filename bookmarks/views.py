@@ -1,38 +1,230 @@
+import json
+
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.sites.models import Site
+from django.core import signing
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect
+from django.db import IntegrityError
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render_to_response, get_object_or_404
 from django.template import RequestContext
-from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.utils import six
+from django.utils.html import escapejs
 from django.utils.translation import ugettext_lazy as _
 
-from bookmarks.models import Bookmark, BookmarkInstance
-from bookmarks.forms import BookmarkInstanceForm
+from bookmarks import cache
+from bookmarks.bulk import ADDED, EXISTS, INVALID, add_bookmark, add_bookmarks
+from bookmarks.models import Bookmark, BookmarkInstance, TrendingBookmark
+from bookmarks.exporters import EXPORTERS, iter_instances
+from bookmarks.feeds import BOOKMARK_FEEDS, TAG_FEEDS, USER_FEEDS
+from bookmarks.forms import BookmarkImportForm, BookmarkInstanceForm
+from bookmarks.importers import ImportFormatError, import_bookmarks
+from bookmarks.instrumentation import instrument_view
+from bookmarks.pagination import paginate_request
+from bookmarks.search import search as find_bookmarks
+
+
+PAGINATE_BY = getattr(settings, 'BOOKMARKS_PAGINATE_BY', 20)
+BATCH_LIMIT = getattr(settings, 'BOOKMARKS_BATCH_LIMIT', 500)
+
+
+ORDERINGS = {
+    "recent": "added",
+    "popular": "save_count",
+}
+
 
+def bookmarks_page(request, order, queryset=None):
+    if queryset is None:
+        queryset = Bookmark.on_site.all()
+    page = paginate_request(request, queryset, ORDERINGS[order], PAGINATE_BY)
+    tags = Bookmark.on_site.tags_with_counts(page.object_list)
+    for bookmark in page.object_list:
+        bookmark.tags_with_counts = tags[bookmark.pk]
+    return page
 
+
+def saved_bookmark_ids(user, bookmarks):
+    """Return the set of ids of `bookmarks` saved by `user`."""
+    instances = BookmarkInstance.objects.filter(
+        user=user,
+        bookmark__in=[bookmark.pk for bookmark in bookmarks],
+    )
+    return set(instances.values_list("bookmark_id", flat=True))
+
+
+@instrument_view
 def bookmarks(request, template_name="bookmarks/bookmarks.html"):
-    bookmarks = Bookmark.on_site.all().order_by("-added")
+    order = request.GET.get("order")
+    if order not in ORDERINGS:
+        order = "recent"
+    site = Site.objects.get_current()
+    cursor = request.GET.get("cursor", "")
+    page = cache.cached(
+        ("bookmarks", order, cursor),
+        lambda: bookmarks_page(request, order),
+        site=site,
+    )
     if request.user.is_authenticated():
         user_bookmarks = Bookmark.on_site.filter(saved_instances__user=request.user)
+        saved_ids = cache.cached(
+            ("saved_bookmark_ids", order, cursor),
+            lambda: saved_bookmark_ids(request.user, page.object_list),
+            site=site,
+            user=request.user,
+        )
     else:
         user_bookmarks = []
+        saved_ids = set()
     return render_to_response(template_name, {
-        "bookmarks": bookmarks,
+        "bookmarks": page.object_list,
+        "page": page,
+        "order": order,
         "user_bookmarks": user_bookmarks,
+        "saved_bookmark_ids": saved_ids,
+    }, context_instance=RequestContext(request))
+
+
+@instrument_view
+def tagged(request, tags, template_name="bookmarks/tagged.html"):
+    """
+    Bookmarks tagged with all of the `+` separated `tags`, or with any of
+    them with `?match=any`.
+    """
+    tag_names = sorted(set(name for name in tags.split("+") if name))
+    match_any = request.GET.get("match") == "any"
+    order = request.GET.get("order")
+    if order not in ORDERINGS:
+        order = "recent"
+    site = Site.objects.get_current()
+    cursor = request.GET.get("cursor", "")
+    page = cache.cached(
+        ("tagged", "+".join(tag_names), match_any, order, cursor),
+        lambda: bookmarks_page(request, order, Bookmark.on_site.tagged(tag_names, match_any)),
+        site=site,
+    )
+    if request.user.is_authenticated():
+        saved_ids = saved_bookmark_ids(request.user, page.object_list)
+    else:
+        saved_ids = set()
+    return render_to_response(template_name, {
+        "bookmarks": page.object_list,
+        "page": page,
+        "order": order,
+        "tags": tag_names,
+        "match": "any" if match_any else "all",
+        "saved_bookmark_ids": saved_ids,
+    }, context_instance=RequestContext(request))
+
+
+@instrument_view
+def search(request, template_name="bookmarks/search.html"):
+    """Bookmarks of the current site matching `?q=`, best first."""
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    site = Site.objects.get_current()
+    results = cache.cached(
+        ("search", query, page),
+        lambda: find_bookmarks(query, site, limit=PAGINATE_BY + 1, offset=(page - 1) * PAGINATE_BY),
+        site=site,
+    )
+    return render_to_response(template_name, {
+        "query": query,
+        "bookmarks": results[:PAGINATE_BY],
+        "page": page,
+        "has_next": len(results) > PAGINATE_BY,
     }, context_instance=RequestContext(request))
 
 
+@instrument_view
+def trending(request, template_name="bookmarks/trending.html"):
+    """
+    The bookmarks saved the most over the last `?window=day` (the default)
+    or `?window=week`, as computed by the `refresh_trending_bookmarks`
+    command.
+    """
+    window = request.GET.get("window")
+    if window not in dict(TrendingBookmark.WINDOW_CHOICES):
+        window = TrendingBookmark.DAY
+    bookmarks = TrendingBookmark.objects.for_site(
+        Site.objects.get_current(),
+        window,
+        limit=PAGINATE_BY,
+    )
+    return render_to_response(template_name, {
+        "bookmarks": bookmarks,
+        "window": window,
+        "windows": TrendingBookmark.WINDOW_CHOICES,
+    }, context_instance=RequestContext(request))
+
+
+@instrument_view
+def feed(request, format):
+    """RSS or Atom feed of the latest bookmarks on the current site."""
+    return BOOKMARK_FEEDS[format](request)
+
+
+@instrument_view
+def tag_feed(request, tag, format):
+    return TAG_FEEDS[format](request, tag)
+
+
+@instrument_view
+def user_feed(request, username, format):
+    return USER_FEEDS[format](request, username)
+
+
+def your_bookmarks_page(request):
+    bookmark_instances = BookmarkInstance.on_site.filter(user=request.user)
+    bookmark_instances = bookmark_instances.select_related("bookmark")
+    page = paginate_request(request, bookmark_instances, "saved", PAGINATE_BY)
+    tags = Bookmark.on_site.tags_with_counts(
+        instance.bookmark_id for instance in page.object_list
+    )
+    for instance in page.object_list:
+        instance.bookmark.tags_with_counts = tags[instance.bookmark_id]
+    return page
+
+
+@instrument_view
 @login_required
 def your_bookmarks(request, template_name="bookmarks/your_bookmarks.html"):
-    bookmark_instances = BookmarkInstance.on_site.filter(user=request.user)
-    bookmark_instances = bookmark_instances.order_by("-saved")
+    page = cache.cached(
+        ("your_bookmarks", request.GET.get("cursor", "")),
+        lambda: your_bookmarks_page(request),
+        site=Site.objects.get_current(),
+        user=request.user,
+    )
     return render_to_response(template_name, {
-        "bookmark_instances": bookmark_instances,
+        "bookmark_instances": page.object_list,
+        "page": page,
     }, context_instance=RequestContext(request))
 
 
+@instrument_view
+@login_required
+def export(request, format):
+    exporter, content_type = EXPORTERS[format]
+    bookmark_instances = BookmarkInstance.on_site.filter(user=request.user)
+    response = StreamingHttpResponse(
+        exporter(iter_instances(bookmark_instances)),
+        content_type=content_type,
+    )
+    filename = "bookmarks.{}".format(format)
+    response["Content-Disposition"] = 'attachment; filename="{}"'.format(filename)
+    return response
+
+
+@instrument_view
 @login_required
 def add(request, form_class=BookmarkInstanceForm,
         template_name="bookmarks/add.html"):
@@ -40,18 +232,17 @@ def add(request, form_class=BookmarkInstanceForm,
     if request.method == "POST":
         bookmark_form = form_class(request.user, request.POST)
         if bookmark_form.is_valid():
-            bookmark_instance = bookmark_form.save(commit=False)
-            bookmark_instance.user = request.user
-            bookmark_instance.save()
-            bookmark = bookmark_instance.bookmark
-
-            bookmark.has_favicon = False
-            bookmark.favicon_checked = timezone.now()
-            bookmark.save()
-
-            if bookmark_form.should_redirect():
-                return HttpResponseRedirect(bookmark.url)
+            try:
+                with cache.atomic():
+                    bookmark_instance = bookmark_form.save(commit=False)
+                    bookmark_instance.user = request.user
+                    bookmark_instance.save()
+            except IntegrityError:
+                # Saved by a concurrent request since the form was cleaned.
+                bookmark_form.add_error(None, _("You have already bookmarked this link."))
             else:
+                if bookmark_form.should_redirect():
+                    return HttpResponseRedirect(bookmark_instance.bookmark.url)
                 message = _("You have saved bookmark '{}'")
                 message = message.format(bookmark_instance.description)
                 messages.info(request, message)
@@ -70,19 +261,195 @@ def add(request, form_class=BookmarkInstanceForm,
         else:
             bookmark_form = form_class()
 
-    bookmarks_add_url = "http://" + Site.objects.get_current().domain + reverse(add)
+    domain = Site.objects.get_current().domain
+    bookmarks_add_url = "http://" + domain + reverse(add)
     bookmarklet = ';'.join((
         "javascript:location.href='{}?url='+encodeURIComponent(location.href)+'",
         "description='+encodeURIComponent(document.title)+'",
         "redirect=on'",
     )).format(bookmarks_add_url)
+    # Always https: the bookmarklet posts the token from any page, and an
+    # http URL would be blocked as mixed content on https pages.
+    quick_bookmarklet = QUICK_BOOKMARKLET.format(
+        url="https://" + domain + reverse(add_quick),
+        token=bookmarklet_token(request.user),
+        error=escapejs(six.text_type(QUICK_ERROR)),
+    )
+
+    return render_to_response(
+        template_name,
+        {
+            "bookmarklet": bookmarklet,
+            "quick_bookmarklet": quick_bookmarklet,
+            "bookmark_form": bookmark_form,
+        },
+        context_instance=RequestContext(request))
+
+
+BOOKMARKLET_SALT = "bookmarks.bookmarklet"
+# The token runs in the pages being bookmarked, which can read it, so it
+# expires and the add page hands out a fresh one.
+BOOKMARKLET_MAX_AGE = getattr(settings, "BOOKMARKS_BOOKMARKLET_MAX_AGE", 30 * 24 * 60 * 60)
+
+# Posts the current page without leaving it and shows the outcome.
+QUICK_BOOKMARKLET = "".join((
+    "javascript:(function(){{",
+    "var x=new XMLHttpRequest();",
+    "x.open('POST','{url}');",
+    "x.setRequestHeader('Content-Type','application/x-www-form-urlencoded');",
+    "x.onload=function(){{alert(JSON.parse(x.responseText).message)}};",
+    "x.onerror=function(){{alert('{error}')}};",
+    "x.send('token={token}&url='+encodeURIComponent(location.href)",
+    "+'&description='+encodeURIComponent(document.title))",
+    "}})()",
+))
+
+QUICK_MESSAGES = {
+    ADDED: _("Bookmark saved."),
+    EXISTS: _("You have already bookmarked this link."),
+    INVALID: _("This page cannot be bookmarked."),
+}
+QUICK_INVALID_TOKEN = _("This bookmarklet is no longer valid, please add it again.")
+QUICK_ERROR = _("The bookmark could not be saved.")
+
+
+def bookmarklet_signer(user):
+    # Changing the password invalidates the bookmarklets of the user.
+    return signing.TimestampSigner(salt=BOOKMARKLET_SALT + user.password)
+
+
+def bookmarklet_token(user):
+    """Return the token authenticating the quick bookmarklet of `user`."""
+    return bookmarklet_signer(user).sign(str(user.pk))
+
+
+def bookmarklet_user(token):
+    """Return the active user of a bookmarklet `token`, or None."""
+    user_id = token.partition(":")[0]
+    try:
+        user = get_user_model().objects.get(pk=user_id, is_active=True)
+    except (ObjectDoesNotExist, ValueError):
+        return None
+    try:
+        bookmarklet_signer(user).unsign(token, max_age=BOOKMARKLET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return user
+
+
+def quick_response(data, status=200):
+    response = JsonResponse(data, status=status)
+    # The bookmarklet posts from the page being bookmarked.
+    response["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+@instrument_view
+@csrf_exempt
+@require_POST
+def add_quick(request):
+    """
+    Save the page posted by the quick bookmarklet and respond with JSON,
+    without rendering any page.
+
+    The user is authenticated by the signed `token` of their bookmarklet
+    instead of the session, as the request comes from another site.
+    """
+    user = bookmarklet_user(request.POST.get("token", ""))
+    if user is None:
+        return quick_response({
+            "error": "Invalid token.",
+            "message": six.text_type(QUICK_INVALID_TOKEN),
+        }, status=403)
+    result = add_bookmark(user, {
+        "url": request.POST.get("url"),
+        "description": request.POST.get("description"),
+        "tags": request.POST.get("tags"),
+    })
+    result["message"] = six.text_type(QUICK_MESSAGES[result["status"]])
+    return quick_response(result, status=400 if result["status"] == INVALID else 200)
+
+
+BATCH_FIELDS = ("url", "description", "note", "tags")
+
+
+def batch_entries(body):
+    """
+    Return the entries of a JSON batch: a list of objects, or an object with
+    a `bookmarks` list. Raises ValueError if the body is malformed.
+    """
+    try:
+        items = json.loads(body.decode("utf-8"))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid JSON.")
+    if isinstance(items, dict):
+        items = items.get("bookmarks")
+    if not isinstance(items, list):
+        raise ValueError("Expected a list of bookmarks.")
+    if len(items) > BATCH_LIMIT:
+        raise ValueError("At most {} bookmarks can be added at once.".format(BATCH_LIMIT))
+
+    entries = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError("Bookmark {} is not an object.".format(index))
+        entry = dict((field, item.get(field)) for field in BATCH_FIELDS)
+        tags = entry["tags"]
+        valid = all(
+            entry[field] is None or isinstance(entry[field], six.string_types)
+            for field in ("url", "description", "note")
+        ) and (
+            tags is None or isinstance(tags, six.string_types) or
+            isinstance(tags, list) and all(isinstance(tag, six.string_types) for tag in tags)
+        )
+        if not valid:
+            raise ValueError("Bookmark {} has fields of the wrong type.".format(index))
+        entries.append(entry)
+    return entries
+
+
+@instrument_view
+@login_required
+@require_POST
+def add_batch(request):
+    """
+    Add a JSON list of bookmarks, each with a `url` and optionally a
+    `description`, `note` and `tags`, in one transaction. Responds with a
+    `status` (and the new `instance` id) for each bookmark, in order.
+    """
+    try:
+        entries = batch_entries(request.body)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"results": add_bookmarks(request.user, entries)})
+
+
+@instrument_view
+@login_required
+def import_file(request, form_class=BookmarkImportForm,
+                template_name="bookmarks/import.html"):
+    if request.method == "POST":
+        import_form = form_class(request.POST, request.FILES)
+        if import_form.is_valid():
+            try:
+                summary = import_bookmarks(request.user, import_form.entries())
+            except ImportFormatError:
+                import_form.add_error("file", _("This file could not be read."))
+            else:
+                message = _("You have imported {} bookmarks")
+                message = message.format(summary.get("added", 0))
+                messages.info(request, message)
+                return HttpResponseRedirect(reverse("bookmarks.views.your_bookmarks"))
+    else:
+        import_form = form_class()
 
     return render_to_response(
         template_name,
-        {"bookmarklet": bookmarklet, "bookmark_form": bookmark_form},
+        {"import_form": import_form},
         context_instance=RequestContext(request))
 
 
+@instrument_view
 @login_required
 def delete(request, bookmark_instance_id):
     bookmark_instance = get_object_or_404(
@@ -90,7 +457,8 @@ def delete(request, bookmark_instance_id):
         id=bookmark_instance_id,
     )
     if request.user == bookmark_instance.user:
-        bookmark_instance.delete()
+        with cache.atomic():
+            bookmark_instance.delete()
         message = _("You have deleted bookmark '{}'")
         message = message.format(bookmark_instance.description)
         messages.info(request, message)